@@ -3,7 +3,10 @@
 start bluesky in IPython session for APS-U Polar 4-ID
 """
 
+# Set POLAR_STARTUP_PROFILE=1 to profile the startup.
+from instrument.startup_profiler import startup_profiler
 from instrument.collection import *
+startup_profiler.stop()
 
 # show_ophyd_symbols()
 # print_RE_md(printing=False)
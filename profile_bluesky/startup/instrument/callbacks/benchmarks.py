@@ -0,0 +1,169 @@
+"""
+Benchmarks of the dichro callbacks and plots.
+
+Not imported into the session, use for instance:
+`from instrument.callbacks.benchmarks import dichro_stream_benchmark`
+"""
+
+__all__ = ['dichro_plot_benchmark', 'dichro_stream_benchmark']
+
+from event_model import compose_run, pack_event_page, unpack_event_page
+from numpy import ones
+from time import monotonic, perf_counter
+from .dichro_plot import _DichroModel, downsampled, xanes, xmcd
+from .dichro_stream import DichroStream, Settings
+
+from ..session_logs import logger
+logger.info(__file__)
+
+
+def dichro_stream_benchmark(num=10000, documents=None, page_size=None,
+                            burst=False):
+    """
+    Time the processing of a dichro run, event by event and as event pages.
+
+    Parameters
+    ----------
+    num : int, optional
+        Number of events of the simulated run, used if `documents` is None.
+    documents : iterable, optional
+        (name, doc) pairs of a saved run to replay instead, for instance
+        `cat[-1].documents()`. The stream settings must match the run.
+    page_size : int, optional
+        Events per event_page. Defaults to all the events in one page.
+    burst : boolean, optional
+        If True, the simulated events are burst dichro events, each with the
+        energy and the monitor and detector arrays of the 4 polarizations.
+
+    Returns
+    -------
+    result : dict
+        Seconds per event processed one by one ("event") and in pages
+        ("event_page").
+    """
+    if documents is None:
+        settings = Settings()
+        keys = (settings.positioner, settings.monitor, settings.detector)
+        shape = [4] if burst else []
+        run = compose_run()
+        descriptor = run.compose_descriptor(
+            name="primary",
+            data_keys={
+                key: dict(source="sim", dtype="array" if shape else "number",
+                          shape=shape if key != settings.positioner else [])
+                for key in keys
+            }
+        )
+        documents = [("start", run.start_doc),
+                     ("descriptor", descriptor.descriptor_doc)]
+        for i in range(num):
+            if burst:
+                data = {settings.positioner: 7.7 + i*1e-4,
+                        settings.monitor: [1e5]*4,
+                        settings.detector: [5e4*1.01, 5e4, 5e4, 5e4*1.01]}
+            else:
+                data = {settings.positioner: 7.7 + i//4*1e-4,
+                        settings.monitor: 1e5,
+                        settings.detector: (
+                            5e4*(1.01 if i % 4 in (0, 3) else 1))}
+            documents.append(("event", descriptor.compose_event(
+                data=data, timestamps={key: 0 for key in keys}, seq_num=i+1
+            )))
+        documents.append(("stop", run.compose_stop()))
+    else:
+        # Saved runs may hold event pages.
+        replay = []
+        for name, doc in documents:
+            if name == "event_page":
+                replay.extend(("event", evt) for evt in unpack_event_page(doc))
+            else:
+                replay.append((name, doc))
+        documents = replay
+
+    events = [doc for name, doc in documents if name == "event"]
+    if page_size is None:
+        page_size = max(len(events), 1)
+
+    # Only the events of the same descriptor can go in one page.
+    pages = []
+    for index in range(0, len(events), page_size):
+        chunk = events[index:index+page_size]
+        for desc_id in dict.fromkeys(evt["descriptor"] for evt in chunk):
+            pages.append(pack_event_page(
+                *[evt for evt in chunk if evt["descriptor"] == desc_id]
+            ))
+
+    def _time(use_pages):
+        stream = DichroStream()
+        elapsed = 0.0
+        for name, doc in documents:
+            if name == "event" and use_pages:
+                continue
+            if name == "stop" and use_pages:
+                t0 = monotonic()
+                for page in pages:
+                    stream("event_page", page)
+                elapsed += monotonic() - t0
+            t0 = monotonic()
+            stream(name, doc)
+            if name == "event":
+                elapsed += monotonic() - t0
+        return elapsed/max(len(events), 1)
+
+    result = dict(event=_time(False), event_page=_time(True))
+    print(f"{len(events)} {'burst ' if burst else ''}events: "
+          f"{result['event']*1e6:0.1f} us per event, "
+          f"{result['event_page']*1e6:0.1f} us per event in pages.")
+    return result
+
+
+def dichro_plot_benchmark(num=10000, every=400):
+    """
+    Time one plot update as a dichro run grows, full and incremental.
+
+    A run is simulated by adding one event at a time. The full update
+    processes the whole columns, as done before, and the incremental one
+    uses `_DichroModel`.
+
+    Parameters
+    ----------
+    num : int, optional
+        Number of events of the simulated run.
+    every : int, optional
+        Number of events between the reported updates.
+
+    Returns
+    -------
+    result : dict
+        Maps "events", "full" and "incremental" to lists, with the number of
+        events and the seconds taken by the update at that point.
+    """
+    columns = {
+        "energy": 7.7 + (ones(num).cumsum()//4)*1e-4,
+        "Ion Ch 4": ones(num)*1e5,
+        "Ion Ch 5": ones(num)*5e4,
+    }
+    model = _DichroModel("energy", "Ion Ch 4", "Ion Ch 5", True)
+
+    result = dict(events=[], full=[], incremental=[])
+    for events in range(1, num + 1):
+        primary = {name: value[:events] for name, value in columns.items()}
+
+        t0 = perf_counter()
+        model.update(primary)
+        incremental = perf_counter() - t0
+
+        if events % every == 0:
+            t0 = perf_counter()
+            downsampled(primary["energy"], primary["Ion Ch 5"])
+            xanes(primary["Ion Ch 4"], primary["Ion Ch 5"], True)
+            xmcd(primary["Ion Ch 4"], primary["Ion Ch 5"], True)
+            result["full"].append(perf_counter() - t0)
+            result["incremental"].append(incremental)
+            result["events"].append(events)
+
+    print("events  full (us)  incremental (us)")
+    for events, full, incremental in zip(*result.values()):
+        print(f"{events:6d}  {full*1e6:9.1f}  {incremental*1e6:16.1f}")
+
+    return result
@@ -9,60 +9,122 @@ from bluesky_widgets.models.plot_builders import Lines
 # Axes and Figure will be renamed to AxesSpec, FigureSpec?
 # from bluesky_widgets.models.plot_specs import AxesSpec, FigureSpec
 from bluesky_widgets.models.plot_specs import Axes, Figure
-from numpy import log, array
+from numpy import log, array, empty
 
 from ..session_logs import logger
 logger.info(__file__)
 
+# Points allocated for each run, doubled when needed.
+INITIAL_SIZE = 1024
 
-def xanes(monitor, detector, fluo):
-    if array(detector).size < 4:
-        return array(detector).mean()
 
-    rng = 4*(array(detector).size//4)
+def _group(values):
+    """
+    Arrange the readings with one row per point and one column per state.
+
+    Step dichro scans save one reading per event, which are grouped in sets of
+    4, while burst dichro scans already save the 4 readings in each event.
+    """
+    values = array(values)
+    if values.ndim == 2:
+        return values
+    rng = 4*(values.size//4)
+    return values[:rng].reshape(-1, 4)
 
+
+def _absorption(monitor, detector, fluo):
     if fluo:
-        absorption = (
-            (array(detector)[:rng] / array(monitor)[:rng]).reshape(-1, 4)
-        )
+        return _group(detector) / _group(monitor)
     else:
-        absorption = (
-            log(array(monitor)[:rng] / array(detector)[:rng]).reshape(-1, 4)
-        )
+        return log(_group(monitor) / _group(detector))
 
-    return absorption.mean(axis=1)
 
+def xanes(monitor, detector, fluo):
+    if array(detector).ndim == 1 and array(detector).size < 4:
+        return array(detector).mean()
 
-def xmcd(monitor, detector, fluo):
-    if array(detector).size < 4:
-        return 0
+    return _absorption(monitor, detector, fluo).mean(axis=1)
 
-    rng = 4*(array(detector).size//4)
 
-    if fluo:
-        absorption = (
-            (array(detector)[:rng] / array(monitor)[:rng]).reshape(-1, 4)
-        )
-    else:
-        absorption = (
-            log(array(monitor)[:rng] / array(detector)[:rng]).reshape(-1, 4)
-        )
+def xmcd(monitor, detector, fluo):
+    if array(detector).ndim == 1 and array(detector).size < 4:
+        return 0
 
+    absorption = _absorption(monitor, detector, fluo)
     return (absorption[:, [0, 3]].mean(axis=1) -
             absorption[:, [1, 2]].mean(axis=1))
 
 
-def downsampled(x):
+def downsampled(x, detector=None):
+    # In burst dichro scans x has one reading per point already.
+    if detector is not None and array(detector).ndim == 2:
+        return array(x) if array(x).ndim == 1 else _group(x).mean(axis=1)
     if array(x).size < 4:
         return array(x).mean()
-    rng = 4*(array(x).size//4)
-    return array(x[:rng]).reshape(-1, 4).mean(axis=1)
+    return _group(x).mean(axis=1)
+
+
+class _DichroModel:
+    """
+    XANES and XMCD of one run, updated with the new points only.
+
+    Each update only reads and processes the events that completed a group
+    of 4 polarization states since the last one (or the new burst events),
+    and appends the results to arrays that grow by doubling. The work per
+    update does not depend on how many points the run already has.
+    """
+
+    def __init__(self, x, monitor, detector, fluo):
+        self.key = (x, monitor, detector, fluo)
+        self._read = 0
+        self._count = 0
+        self._arrays = {
+            name: empty(INITIAL_SIZE) for name in ("x", "xanes", "xmcd")
+        }
+
+    def __getitem__(self, name):
+        # A view, no copy.
+        return self._arrays[name][:self._count]
+
+    def update(self, primary):
+        """ Processes the events added to `primary` since the last call. """
+        x, monitor, detector, fluo = self.key
+        total = primary[detector].shape[0]
+        if primary[detector].ndim == 1:
+            # Only complete groups.
+            total -= total % 4
+        if total <= self._read:
+            return
+
+        new = {
+            name: array(primary[name][self._read:total])
+            for name in (x, monitor, detector)
+        }
+        self._append(
+            x=downsampled(new[x], new[detector]),
+            xanes=xanes(new[monitor], new[detector], fluo),
+            xmcd=xmcd(new[monitor], new[detector], fluo),
+        )
+        self._read = total
+
+    def _append(self, **values):
+        size = len(values["x"])
+        capacity = len(self._arrays["x"])
+        if self._count + size > capacity:
+            capacity = max(2*capacity, self._count + size)
+            for name, old in self._arrays.items():
+                self._arrays[name] = empty(capacity)
+                self._arrays[name][:self._count] = old[:self._count]
+        for name, value in values.items():
+            self._arrays[name][self._count:self._count+size] = value
+        self._count += size
 
 
 class AutoDichroPlot(AutoPlotter):
     def __init__(self, monitor='Ion Ch 4', detector='Ion Ch 5', fluo=True):
         super().__init__()
         self._x_to_lines = {}  # map x variable to (xanes_lines, xmcd_lines)
+        self._models = {}  # map run uid to its _DichroModel
         self._monitor = monitor
         self._detector = detector
         self._fluo = fluo
@@ -83,15 +145,39 @@ class AutoDichroPlot(AutoPlotter):
     def fluo(self, value):
         self._fluo = bool(value)
 
+    def _model(self, run, primary, x):
+        """ Processed data of the run, up to date with `primary`. """
+        uid = run.metadata["start"]["uid"]
+        key = (x, self._monitor, self._detector, self._fluo)
+        # The settings may have changed since the last update.
+        if uid not in self._models or self._models[uid].key != key:
+            self._models[uid] = _DichroModel(*key)
+        self._models[uid].update(primary)
+        return self._models[uid]
+
+    def _prune_models(self):
+        """ Drops the models of the runs that no plot shows anymore. """
+        # Lines only keeps its last max_runs runs.
+        shown = {
+            run.metadata["start"]["uid"]
+            for lines in self._x_to_lines.values()
+            for builder in lines
+            for run in builder.runs
+        }
+        for uid in set(self._models) - shown:
+            del self._models[uid]
+
     def new_plot(self, x_name=None):
         # New plots for all types.
         if x_name is None:
             self._x_to_lines = {}
+            self._models = {}
         else:
             try:
                 del self._x_to_lines[x_name]
             except KeyError:
                 raise KeyError(f"There is no plot with {x_name}.")
+            self._prune_models()
 
     def handle_new_stream(self, run, stream_name):
         if stream_name != "primary":
@@ -126,18 +212,20 @@ class AutoDichroPlot(AutoPlotter):
             figure = Figure((xanes_axes, xmcd_axes), title="XANES and XMCD")
             # Set up objects that will select the approriate data and do the
             # desired transformation for plotting.
+            # The lines of each run are computed by its _DichroModel, which
+            # only processes the new points at every update.
             xanes_lines = Lines(
-                x=lambda primary: downsampled(primary[x]),
-                ys=[lambda primary: xanes(primary[self._monitor],
-                                          primary[self._detector],
-                                          self.fluo)],
+                x=lambda run, primary: self._model(run, primary, x)["x"],
+                ys=[lambda run, primary: (
+                    self._model(run, primary, x)["xanes"]
+                )],
                 axes=xanes_axes,
             )
             xmcd_lines = Lines(
-                x=lambda primary: downsampled(primary[x]),
-                ys=[lambda primary: xmcd(primary[self._monitor],
-                                         primary[self._detector],
-                                         self.fluo)],
+                x=lambda run, primary: self._model(run, primary, x)["x"],
+                ys=[lambda run, primary: (
+                    self._model(run, primary, x)["xmcd"]
+                )],
                 axes=xmcd_axes,
             )
             self._x_to_lines[x] = (xanes_lines, xmcd_lines)
@@ -151,3 +239,4 @@ class AutoDichroPlot(AutoPlotter):
         # Add this Run to the figure.
         xanes_lines.add_run(run)
         xmcd_lines.add_run(run)
+        self._prune_models()
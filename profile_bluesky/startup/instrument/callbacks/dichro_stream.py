@@ -8,11 +8,16 @@ __all__ = ["dichro", "plot_dichro_settings", "dichro_bec"]
 from bluesky.callbacks.stream import LiveDispatcher
 from bluesky.callbacks.mpl_plotting import LivePlot
 from bluesky.callbacks.best_effort import BestEffortCallback
+from bluesky.utils import new_uid
 from ..framework import sd
-from streamz import Source
-from numpy import mean, log, array
+from collections import ChainMap
+from event_model import DocumentNames
+from numpy import asarray, broadcast_to, concatenate, empty, log, stack
+from time import time as ttime
 from ophyd import Signal, Device, Component
 
+from ..session_logs import logger
+
 
 class DichroDevice(Device):
     positioner = Component(Signal, value=0)
@@ -31,108 +36,323 @@ class Settings():
     positioner = "energy"
     monitor = "Ion Ch 4"
     detector = "Ion Ch 5"
+    # If None, uses all the detectors hinted in the start document.
+    detectors = None
     transmission = True
 
 
+def _is_numeric(data_key):
+    """ If the field holds numbers, or one array of numbers per event. """
+    if data_key is None:
+        return False
+    shape = data_key.get("shape", [])
+    if len(shape) == 0:
+        return data_key.get("dtype") in ("number", "integer")
+    return len(shape) == 1
+
+
 # TODO: Should this go in the pr_setup?
 class DichroStream(LiveDispatcher):
-    """Stream that processes XMCD and XANES"""
+    """
+    Stream that processes XMCD and XANES
+
+    The readings of the `primary` events are copied into a buffer that holds
+    one group of `n` polarization states, and each complete group is
+    processed with array operations. An `event_page` is processed in one
+    pass, including the group left incomplete by the previous events. The
+    points processed together are emitted as one `event_page`, and only the
+    last one is put into `dichro`.
+
+    XANES and XMCD are computed for every detector field hinted in the start
+    document (or `settings.detectors`), all normalized by the monitor. The
+    `settings.detector` results are saved as "xas" and "xmcd", and the other
+    detectors as "<field>_xas" and "<field>_xmcd". All the motors of the
+    scan are averaged over the polarization states.
+    """
     def __init__(self, n=4):
         self.n = n
-        self.in_node = None
-        self.out_node = None
-        self.processor = None
         self.data_keys = None
         self.settings = Settings()
+        self._positioners = None
+        self._detectors = None
+        self._output_keys = None
         self._trigger = False
+        self._buffer = None
+        self._filled = 0
+        self._buffer_descriptor = None
+        self._checked = set()
         super().__init__()
 
     def start(self, doc):
         """
-        Create the stream after seeing the start document
-
-        The callback looks for the 'average' key in the start document to
-        configure itself.
+        Prepare the buffer after seeing the start document
         """
 
-        # Define our nodes
-        if not self.in_node:
-            self.in_node = Source(stream_name='dichro_xmcd')
+        hints = doc.get("hints", {})
 
-        self.processor = self.in_node.partition(self.n)
+        # The settings positioner goes first, it is the x axis of the plots.
+        self._positioners = [self.settings.positioner] if (
+            self.settings.positioner is not None) else []
+        for fields, stream in hints.get("dimensions", []):
+            if stream == "primary":
+                self._positioners.extend(
+                    field for field in fields
+                    if field != "time" and field not in self._positioners
+                )
 
-        self.data_keys = [
-            self.settings.positioner,
-            self.settings.monitor,
-            self.settings.detector,
+        detectors = self.settings.detectors
+        if detectors is None:
+            detectors = hints.get("detectors") or [self.settings.detector]
+        self._detectors = [
+            det for det in dict.fromkeys(detectors)
+            if det != self.settings.monitor and det not in self._positioners
         ]
 
-        def process_xmcd(cache):
-            processed_evt = dict()
-            desc_id = cache[0]['descriptor']
-
-            # Check that all of our events came from the same configuration
-            if not all([desc_id == evt['descriptor'] for evt in cache]):
-                raise Exception(
-                    'The events in this bundle are from different'
-                    'configurations!'
-                )
+        # Only set by the first descriptor.
+        self.data_keys = None
+        self._output_keys = None
+        self._buffer = None
+        self._filled = 0
+        self._buffer_descriptor = None
+        self._checked = set()
 
-            # Use the last descriptor to avoid strings and objects
-            if all([key in self.raw_descriptors[desc_id]['data_keys'] for key
-                    in self.data_keys]):
-                processed_evt[self.data_keys[0]] = mean(
-                    [evt['data'][self.data_keys[0]] for evt in cache], axis=0
-                )
+        _start_doc = doc
+        _start_doc["motors"] = self._positioners[:1]
+        super().start(_start_doc)
 
-                _mon = array(
-                    [evt['data'][self.data_keys[1]] for evt in cache]
-                )
+    def _select_data_keys(self, data_keys):
+        """
+        Sets the fields to process, from the first primary descriptor.
 
-                _det = array(
-                    [evt['data'][self.data_keys[2]] for evt in cache]
+        Hinted detector fields that are not numbers (like image references)
+        are skipped.
+        """
+        detectors = [
+            det for det in self._detectors if _is_numeric(data_keys.get(det))
+        ]
+        if len(detectors) == 0:
+            raise Exception(
+                'None of the detectors {} are in the database.'.format(
+                    self._detectors
                 )
+            )
+        if len(detectors) < len(self._detectors):
+            logger.info("Dichro stream is not processing: {}".format(
+                [det for det in self._detectors if det not in detectors]
+            ))
 
-                _xas = (
-                    log(_mon/_det) if self.settings.transmission else _det/_mon
-                )
+        # The settings detector goes first, it is saved as xas and xmcd.
+        if self.settings.detector in detectors:
+            detectors.remove(self.settings.detector)
+            detectors.insert(0, self.settings.detector)
+        self._detectors = detectors
+
+        # The column order of the buffer and of the readings in `_process`.
+        self.data_keys = (
+            self._positioners + [self.settings.monitor] + self._detectors
+        )
+        names = ["xas"] + [f"{det}_xas" for det in self._detectors[1:]]
+        self._output_keys = (
+            self._positioners + names +
+            [name.replace("xas", "xmcd") for name in names]
+        )
+
+        # One row per polarization state, one column per data key.
+        self._buffer = empty((self.n, len(self.data_keys)))
+
+    def _check_data_keys(self, desc_id):
+        if desc_id in self._checked:
+            return
+        data_keys = self.raw_descriptors[desc_id]['data_keys']
+        if self.data_keys is None:
+            self._select_data_keys(data_keys)
+        # Use the last descriptor to avoid strings and objects
+        if not all([key in data_keys for key in self.data_keys]):
+            raise Exception(
+                'The input data keys do not match entries in the database.'
+            )
+        self._checked.add(desc_id)
+
+    def _process(self, desc_id, readings):
+        """
+        Computes XANES and XMCD from the readings of all polarizations.
 
-                processed_evt["xas"] = mean(_xas)
-                processed_evt["xmcd"] = (
-                    (_xas[0] + _xas[3])/2 - (_xas[1] + _xas[2])/2
-                )
-            else:
-                raise Exception(
-                    'The input data keys do not match entries in the database.'
-                )
+        `readings` has shape (groups, n, data keys), with the polarization
+        states in the +, -, -, + sequence, and the data keys in the order
+        of `self.data_keys` (positioners, monitor, detectors).
+        """
+        npos = len(self._positioners)
+        positioners = readings[:, :, :npos].mean(axis=1)
+        _mon = readings[:, :, npos:npos+1]
+        _det = readings[:, :, npos+1:]
+
+        # Shape (groups, n, detectors)
+        _xas = (
+            log(_mon/_det) if self.settings.transmission else _det/_mon
+        )
+
+        xas = _xas.mean(axis=1)
+        xmcd = (_xas[:, 0] + _xas[:, 3])/2 - (_xas[:, 1] + _xas[:, 2])/2
+
+        points = concatenate([positioners, xas, xmcd], axis=1)
+
+        # The first positioner and detector of the last point.
+        last = points[-1]
+        dichro.put((
+            last[0] if npos > 0 else 0, last[npos],
+            last[npos + len(self._detectors)]
+        ))
+        self._emit_page(desc_id, points)
+
+    def _output_descriptor(self, desc_id):
+        """
+        Uid of the descriptor of the processed points.
 
-            dichro.put((
-                processed_evt[self.data_keys[0]],
-                processed_evt["xas"],
-                processed_evt["xmcd"]
+        The descriptor is emitted the first time, like `process_event` does.
+        """
+        key = frozenset((tuple(self._output_keys), "primary", (desc_id,)))
+        descriptors = self._descriptors.setdefault("primary", {})
+        if key not in descriptors:
+            raw_desc = self.raw_descriptors[desc_id]
+            data_keys = {
+                name: dict(raw_desc["data_keys"].get(name, {}),
+                           dtype="number", shape=[], source="Stream")
+                for name in self._output_keys
+            }
+            descriptors[key] = dict(ChainMap(
+                {"uid": new_uid(), "time": ttime(),
+                 "run_start": self._stream_start_uid,
+                 "data_keys": data_keys, "configuration": {},
+                 "object_keys": {"stream": list(data_keys.keys())}},
+                raw_desc
             ))
+            self.emit(DocumentNames.descriptor, descriptors[key])
+        return descriptors[key]["uid"]
+
+    def _emit_page(self, desc_id, points):
+        """ Emits the processed points, shape (points, keys), in one page. """
+        num = len(points)
+        now = ttime()
+        data = dict(zip(self._output_keys, points.T.tolist()))
+        page = {
+            "descriptor": self._output_descriptor(desc_id),
+            "uid": [new_uid() for _ in range(num)],
+            "seq_num": list(range(self.seq_count + 1,
+                                  self.seq_count + num + 1)),
+            "time": [now]*num,
+            "data": data,
+            "timestamps": {key: [now]*num for key in data.keys()},
+            "filled": {},
+        }
+        self.seq_count += num
+        self.emit(DocumentNames.event_page, page)
+
+    def _add(self, desc_id, rows):
+        """ Adds readings, one row per event, and processes full groups. """
+        # Check that all of our events came from the same configuration
+        if self._filled > 0 and desc_id != self._buffer_descriptor:
+            raise Exception(
+                'The events in this bundle are from different'
+                'configurations!'
+            )
+        self._buffer_descriptor = desc_id
+
+        # Completes the group started by the previous events.
+        start = min(self.n - self._filled, len(rows))
+        self._buffer[self._filled:self._filled+start] = rows[:start]
+        self._filled += start
+        groups = []
+        if self._filled == self.n:
+            groups.append(self._buffer[None].copy())
+            self._filled = 0
+
+        # Only left if the buffer was completed, so it is empty.
+        rows = rows[start:]
+        end = len(rows) - len(rows) % self.n
+        if end > 0:
+            groups.append(rows[:end].reshape(-1, self.n, rows.shape[-1]))
+        if end < len(rows):
+            self._filled = len(rows) - end
+            self._buffer[:self._filled] = rows[end:]
+
+        # All the complete groups are processed together.
+        if len(groups) > 0:
+            self._process(desc_id, concatenate(groups))
+
+    def _is_burst(self, descriptor):
+        """ Burst dichro events hold all polarizations in array fields. """
+        data_key = descriptor['data_keys'].get(self._detectors[0], {})
+        return len(data_key.get('shape', [])) == 1
+
+    def _primary(self, desc_id):
+        """ Returns the descriptor if it is from the primary stream. """
+        descriptor = self.raw_descriptors[desc_id]
+        if descriptor.get("name") == "primary":
+            self._check_data_keys(desc_id)
+            return descriptor
+        return None
 
-            return {'data': processed_evt, 'descriptor': desc_id}
-
-        self.out_node = self.processor.map(process_xmcd)
-        self.out_node.sink(self.process_event)
+    def _readings(self, data, burst):
+        """
+        Readings of the event page `data`, with shape (events, data keys),
+        or (events, n, data keys) for burst events.
 
-        _start_doc = doc
-        _start_doc["motors"] = [self.settings.positioner]
-        super().start(_start_doc)
+        In burst events the positioners are saved once per event, and the
+        monitor and detectors once per polarization state, so each position
+        is repeated for all the states.
+        """
+        npos = len(self._positioners)
+        columns = [asarray(data[key], dtype=float) for key in self.data_keys]
+        if burst:
+            shape = columns[npos].shape
+            columns[:npos] = [
+                broadcast_to(column.reshape(shape[0], -1), shape)
+                for column in columns[:npos]
+            ]
+        return stack(columns, axis=-1)
 
     def event(self, doc):
         """Send an Event through the stream"""
-        descriptor = self.raw_descriptors[doc["descriptor"]]
-        if descriptor.get("name") == "primary":
-            self.in_node.emit(doc)
+        descriptor = self._primary(doc["descriptor"])
+        if descriptor is None:
+            return
+
+        data = {key: [doc["data"][key]] for key in self.data_keys}
+        if self._is_burst(descriptor):
+            self._process(doc["descriptor"], self._readings(data, True))
+        else:
+            self._add(doc["descriptor"], self._readings(data, False))
+
+    def event_page(self, doc):
+        """Send an EventPage through the stream"""
+        descriptor = self._primary(doc["descriptor"])
+        if descriptor is None:
+            return
+
+        if self._is_burst(descriptor):
+            self._process(doc["descriptor"],
+                          self._readings(doc["data"], True))
+        else:
+            self._add(doc["descriptor"], self._readings(doc["data"], False))
+
+    def emit(self, name, doc):
+        """Send to the dispatcher, only validating the non-event documents"""
+        # The event pages are built here, validating each of them takes
+        # longer than computing it.
+        if name in (DocumentNames.event, DocumentNames.event_page):
+            self.dispatcher.process(name, doc)
+        else:
+            super().emit(name, doc)
 
     def stop(self, doc):
-        """Delete the stream when run stops"""
-        self.in_node = None
-        self.out_node = None
-        self.processor = None
+        """Clear the buffer when run stops"""
+        self._buffer = None
+        self._filled = 0
+        self._buffer_descriptor = None
         self.data_keys = None
+        self._positioners = None
+        self._detectors = None
+        self._output_keys = None
         self._trigger = False
         super().stop(doc)
 
@@ -4,20 +4,28 @@ configure for data collection in a console session
 """
 
 from .session_logs import logger
+from .startup_profiler import startup_profiler
 logger.info(__file__)
 
 # from . import mpl
 
 logger.info("bluesky framework")
 
-from .framework import *
-from .devices import *
-from .callbacks import *
-from .plans import *
-from .utils import *
-from .mpl import *
-
-from apstools.utils import *
+with startup_profiler.stage("instrument.framework"):
+    from .framework import *
+with startup_profiler.stage("instrument.devices"):
+    from .devices import *
+with startup_profiler.stage("instrument.callbacks"):
+    from .callbacks import *
+with startup_profiler.stage("instrument.plans"):
+    from .plans import *
+with startup_profiler.stage("instrument.utils"):
+    from .utils import *
+with startup_profiler.stage("instrument.mpl"):
+    from .mpl import *
+
+with startup_profiler.stage("apstools.utils"):
+    from apstools.utils import *
 
 from hkl.user import (
     cahkl,
@@ -94,7 +102,15 @@ from IPython import get_ipython
 from .utils.local_magics import LocalMagics
 get_ipython().register_magics(LocalMagics)
 
-qxscan_params.load_from_scan(-1)
+# Connect all baseline devices together, and report the slow/missing ones.
+# A short budget, so that one IOC that is down does not hold the startup, the
+# missing devices connect later on their own.
+with startup_profiler.stage("connect_devices"):
+    connect_devices(sd.baseline, timeout=3)
+
+# Only reads the local cache, see qxscan_params.load_from_catalog.
+with startup_profiler.stage("qxscan_params.restore_params"):
+    qxscan_params.restore_params()
 
 # This is a workaround to ensure that we preserve the beamline energy and
 # the previously defined UB matrix.
@@ -0,0 +1,138 @@
+"""
+Status that finishes when conditions on several signals hold.
+"""
+
+__all__ = ['ConditionStatus', 'condition_waits']
+
+from collections import deque
+from functools import partial
+from threading import RLock, Timer
+from time import monotonic
+from ophyd.status import StatusBase
+from ..session_logs import logger
+logger.info(__file__)
+
+# Duration of the last condition waits, the newest at the end.
+condition_waits = deque(maxlen=100)
+
+
+class ConditionStatus(StatusBase):
+    """
+    Finishes as soon as all the conditions hold at the same time.
+
+    Each condition is a (signal, check) pair. The check is called like a
+    `SubscriptionStatus` callback, `check(value=..., old_value=..., ...)`,
+    every time the signal updates, and returns True if the condition holds.
+    A check that is not callable means that the signal must be equal to it.
+
+    With `debounce`, all the conditions have to keep holding for that many
+    seconds, so that a value that only crosses the target does not count.
+
+    The time the wait took is kept in `elapsed`, and added to
+    `condition_waits` together with the `name` and whether it succeeded.
+
+    Parameters
+    ----------
+    conditions : iterable
+        (signal, check) pairs.
+    debounce : float, optional
+        Seconds that the conditions must hold, defaults to 0.
+    timeout : float, optional
+        Seconds until the status fails, defaults to no timeout.
+    settle_time : float, optional
+        Seconds to wait after the conditions hold, defaults to 0.
+    name : str, optional
+        Used in `condition_waits`, defaults to the signal names.
+    """
+
+    def __init__(self, conditions, *, debounce=0, timeout=None,
+                 settle_time=0, name=None):
+        self.conditions = [
+            (signal, check if callable(check) else _equal_to(check))
+            for signal, check in conditions
+        ]
+        if len(self.conditions) == 0:
+            raise ValueError("At least one condition is needed.")
+
+        self.debounce = debounce
+        self.name = name or ", ".join(
+            signal.name for signal, _ in self.conditions
+        )
+        self.elapsed = None
+
+        self._start = monotonic()
+        self._met = [False]*len(self.conditions)
+        self._lock = RLock()
+        self._timer = None
+        self._finishing = False
+
+        super().__init__(timeout=timeout, settle_time=settle_time)
+
+        self._subscriptions = []
+        self.add_callback(self._record)
+        for index, (signal, check) in enumerate(self.conditions):
+            cid = signal.subscribe(partial(self._check, index, check),
+                                   run=True)
+            self._subscriptions.append((signal, cid))
+
+        # It may have finished while subscribing.
+        if self.done:
+            self._unsubscribe()
+
+    def _unsubscribe(self):
+        with self._lock:
+            while len(self._subscriptions) > 0:
+                signal, cid = self._subscriptions.pop()
+                signal.unsubscribe(cid)
+
+    def _check(self, index, check, *args, **kwargs):
+        try:
+            met = bool(check(*args, **kwargs))
+        except Exception as exc:
+            logger.warning(f"Condition check of {self.name} failed: {exc}")
+            met = False
+
+        with self._lock:
+            self._met[index] = met
+            if self._finishing or self.done:
+                return
+            if not all(self._met):
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            elif self.debounce <= 0:
+                self._finish()
+            elif self._timer is None:
+                self._timer = Timer(self.debounce, self._debounced)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _debounced(self):
+        with self._lock:
+            self._timer = None
+            if all(self._met) and not (self._finishing or self.done):
+                self._finish()
+
+    def _finish(self):
+        self._finishing = True
+        self.set_finished()
+
+    def _record(self, status):
+        self._unsubscribe()
+        if self._timer is not None:
+            self._timer.cancel()
+
+        self.elapsed = monotonic() - self._start
+        condition_waits.append(
+            dict(name=self.name, elapsed=self.elapsed, success=self.success)
+        )
+        logger.info(
+            f"Waited {self.elapsed:0.2f} s for {self.name} "
+            f"({'done' if self.success else 'failed'})."
+        )
+
+
+def _equal_to(target):
+    def check(value=None, **kwargs):
+        return value == target
+    return check
@@ -0,0 +1,149 @@
+"""
+Lookup tables for the Lakeshore heater ranges and vaporizer offsets.
+"""
+
+__all__ = ['HeaterRangeTable', 'OffsetTable', 'AutoHeaterMixin']
+
+from bisect import bisect_left
+from ..session_logs import logger
+logger.info(__file__)
+
+
+class HeaterRangeTable:
+    """
+    Heater range to use at each temperature.
+
+    Built once from an `auto_ranges` dictionary, which maps the heater range
+    name to a (low, high] temperature interval, or None if that range is not
+    used. The intervals are sorted so that the lookup is a bisection.
+
+    Parameters
+    ----------
+    auto_ranges : dict
+        For instance {'LOW': (0, 6), 'MEDIUM': (6, 20), 'HIGH': (20, 305)}.
+    """
+
+    def __init__(self, auto_ranges):
+        intervals = sorted(
+            (float(_temp_range[0]), float(_temp_range[1]), _heater_range)
+            for _heater_range, _temp_range in auto_ranges.items()
+            if _temp_range
+        )
+        for previous, current in zip(intervals[:-1], intervals[1:]):
+            if current[0] < previous[1]:
+                raise ValueError(f"The ranges {previous[2]} and {current[2]} "
+                                 "overlap.")
+
+        self._lows = [low for low, _, _ in intervals]
+        self._highs = [high for _, high, _ in intervals]
+        self._names = [name for _, _, name in intervals]
+
+    def __call__(self, value):
+        """ Returns the heater range name, or None if out of all ranges. """
+        # Last interval with low < value.
+        index = bisect_left(self._lows, value) - 1
+        if index >= 0 and value <= self._highs[index]:
+            return self._names[index]
+        return None
+
+
+class OffsetTable:
+    """
+    Offset to use below each temperature limit.
+
+    Parameters
+    ----------
+    limits : iterable
+        Temperature limits, in any order.
+    offsets : iterable
+        Offset used up to (and including) each limit.
+    """
+
+    def __init__(self, limits, offsets):
+        limits, offsets = list(limits), list(offsets)
+        if len(limits) != len(offsets):
+            raise ValueError("limits and offsets must have the same length.")
+        pairs = sorted(zip(limits, offsets))
+        self._limits = [limit for limit, _ in pairs]
+        self._offsets = [offset for _, offset in pairs]
+
+    def __call__(self, value):
+        """ Returns the offset of the first limit >= value, or None. """
+        index = bisect_left(self._limits, value)
+        if index < len(self._limits):
+            return self._offsets[index]
+        return None
+
+
+class AutoHeaterMixin:
+    """
+    Switches `heater_range` following the temperature.
+
+    The `_auto_ranges` dictionary is compiled into a `HeaterRangeTable` the
+    first time it is used after being assigned, and `heater_range` is only
+    written when it differs from the last range written. The `heater_range`
+    signal is not read, since it is not monitored on every controller and a
+    read from the setpoint callback would block. A range changed by hand is
+    therefore kept until the temperature moves into another range, or until
+    `auto_heater` is enabled again. Requires a `heater_range` signal.
+    """
+
+    # This must be modified either here, or before using auto_heater.
+    _auto_ranges = None
+
+    _heater_table = None
+    _heater_table_source = None
+    _heater_range_last = None
+
+    @property
+    def heater_table(self):
+        """ `HeaterRangeTable` of the current `_auto_ranges`, or None. """
+        # _auto_ranges may be assigned directly, so check if it changed.
+        if self._auto_ranges is not self._heater_table_source:
+            self._heater_table = (
+                HeaterRangeTable(self._auto_ranges) if self._auto_ranges
+                else None
+            )
+            self._heater_table_source = self._auto_ranges
+            self._heater_range_last = None
+        return self._heater_table
+
+    def _switch_heater(self, value=None, **kwargs):
+        table = self.heater_table
+        if table is None:
+            return
+        _heater_range = table(value)
+        if _heater_range is not None and (
+                _heater_range != self._heater_range_last):
+            self.heater_range.put(_heater_range)
+            self._heater_range_last = _heater_range
+
+    @property
+    def auto_ranges(self):
+        """
+        Temperature interval of each heater range.
+
+        Assign a new dictionary to change it, editing it in place is not
+        seen by the lookup table.
+        """
+        return self._auto_ranges
+
+    @auto_ranges.setter
+    def auto_ranges(self, value):
+        if not isinstance(value, dict):
+            raise TypeError('auto_ranges must be a dictionary.')
+
+        for _heater_range, _temp_range in value.items():
+            if _heater_range not in self.heater_range.enum_strs:
+                raise ValueError("The input dictionary keys must be one of "
+                                 f"these: {self.heater_range.enum_strs}, but "
+                                 f"{_heater_range} was entered.")
+
+            if _temp_range is not None and len(_temp_range) != 2:
+                raise ValueError(f"The value {_temp_range} is invalid! It "
+                                 "must be either None or an iterable with two "
+                                 "items.")
+
+        # Validates the intervals.
+        HeaterRangeTable(value)
+        self._auto_ranges = value
@@ -0,0 +1,221 @@
+"""
+Lazy device instantiation.
+
+Devices registered with `LazyDevice` are only built, and connected, the first
+time one of their attributes is used. The ipython session does not need to
+wait for (or hang on) IOCs that are not being used in the experiment.
+
+The devices that go in the baseline are all built, together, before the
+first plan runs (see `lazy_baseline_wrapper`), so that every run has the
+same baseline.
+"""
+
+__all__ = ['LazyDevice', 'lazy_devices', 'is_built', 'resolve_device',
+           'retry_device', 'build_lazy_devices', 'lazy_baseline_wrapper']
+
+from bluesky.plan_stubs import null
+from concurrent.futures import ThreadPoolExecutor
+from threading import RLock
+from time import monotonic
+from ..framework import RE, sd
+from ..session_logs import logger
+from ..startup_profiler import startup_profiler
+logger.info(__file__)
+
+# Holds all the LazyDevice instances, keyed by the device name.
+lazy_devices = {}
+
+
+class LazyDevice:
+    """
+    Proxy that builds an ophyd device the first time it is used.
+
+    Any attribute access (other than the proxy internals) builds the device,
+    waits for it to connect, and is then forwarded to it.
+
+    If the build fails, the error is kept and raised again by the following
+    accesses, without trying to connect each time. Use `retry_device` to try
+    again, for instance once the IOC is running.
+
+    Parameters
+    ----------
+    cls : type
+        Device class to be instantiated.
+    *args :
+        Passed to `cls`.
+    setup : callable, optional
+        Called with the new device right after it connects. Use it for any
+        configuration that used to be done at import time. It runs again on
+        a new device after `retry_device`, so it must undo what a previous
+        call did (subscriptions, suspenders, ...).
+    baseline : boolean, optional
+        If True, the device is built before the first plan runs (if it was
+        not used before), and appended to `sd.baseline`. Defaults to True.
+    connection_timeout : float, optional
+        Maximum time in seconds to wait for the device to connect.
+    **kwargs :
+        Passed to `cls`. Must include `name`.
+    """
+
+    def __init__(self, cls, *args, setup=None, baseline=True,
+                 connection_timeout=10, **kwargs):
+        if "name" not in kwargs:
+            raise TypeError("LazyDevice requires a 'name' keyword argument.")
+
+        _set = super().__setattr__
+        _set("_lazy_spec", (cls, args, kwargs))
+        _set("_lazy_setup", setup)
+        _set("_lazy_baseline", baseline)
+        _set("_lazy_timeout", connection_timeout)
+        _set("_lazy_device", None)
+        _set("_lazy_build_time", None)
+        _set("_lazy_error", None)
+        _set("_lazy_lock", RLock())
+
+        lazy_devices[kwargs["name"]] = self
+
+    def _lazy_build(self):
+        """ Builds and connects the device, only done once. """
+        with self._lazy_lock:
+            if self._lazy_device is None:
+                cls, args, kwargs = self._lazy_spec
+                if self._lazy_error is not None:
+                    raise RuntimeError(
+                        f"{kwargs['name']} failed to build "
+                        f"({self._lazy_error!r}), use "
+                        f"retry_device({kwargs['name']}) to try again."
+                    ) from self._lazy_error
+                logger.info(f"Building lazy device: {kwargs['name']}")
+                t0 = monotonic()
+                try:
+                    device = cls(*args, **kwargs)
+                    device.wait_for_connection(timeout=self._lazy_timeout)
+                    if self._lazy_setup is not None:
+                        self._lazy_setup(device)
+                except Exception as exc:
+                    super().__setattr__("_lazy_error", exc)
+                    logger.error(f"Could not build {kwargs['name']}: {exc}")
+                    raise
+                if self._lazy_baseline:
+                    sd.baseline.append(device)
+                super().__setattr__("_lazy_build_time", monotonic() - t0)
+                super().__setattr__("_lazy_device", device)
+                startup_profiler.record_connection(
+                    kwargs['name'], self._lazy_build_time
+                )
+                logger.info(
+                    f"{kwargs['name']} connected in "
+                    f"{self._lazy_build_time:0.3f} s"
+                )
+        return self._lazy_device
+
+    def __getattr__(self, attr):
+        # Only called if `attr` is not a proxy attribute.
+        if attr.startswith("_lazy"):
+            raise AttributeError(attr)
+        return getattr(self._lazy_build(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._lazy_build(), attr, value)
+
+    def __dir__(self):
+        return dir(self._lazy_build())
+
+    def __repr__(self):
+        if self._lazy_device is None:
+            cls, _, kwargs = self._lazy_spec
+            state = "failed" if self._lazy_error is not None else (
+                "not connected"
+            )
+            return (f"LazyDevice({cls.__name__}, name='{kwargs['name']}', "
+                    f"{state})")
+        return repr(self._lazy_device)
+
+    def __str__(self):
+        return self.__repr__()
+
+
+def is_built(obj):
+    """
+    Check if a device was instantiated.
+
+    Regular (non-lazy) objects are always considered built.
+    """
+    if isinstance(obj, LazyDevice):
+        return obj._lazy_device is not None
+    return True
+
+
+def resolve_device(obj):
+    """
+    Returns the actual ophyd device behind `obj`.
+
+    Builds the device if needed. Non-lazy objects are returned unchanged. Use
+    this when the device identity matters, for instance when it is passed to
+    the RunEngine together with some of its components.
+    """
+    if isinstance(obj, LazyDevice):
+        return obj._lazy_build()
+    return obj
+
+
+def retry_device(obj):
+    """
+    Builds again a lazy device that failed to build.
+
+    Returns the ophyd device, see `resolve_device`.
+    """
+    if isinstance(obj, LazyDevice):
+        with obj._lazy_lock:
+            super(LazyDevice, obj).__setattr__("_lazy_error", None)
+    return resolve_device(obj)
+
+
+def build_lazy_devices(devices, max_workers=8):
+    """
+    Builds the lazy devices concurrently.
+
+    The errors are logged (see `LazyDevice`), not raised.
+
+    Returns
+    -------
+    built : list
+        The lazy devices that are built.
+    """
+    def _build(device):
+        try:
+            device._lazy_build()
+        except Exception:
+            pass
+
+    pending = [
+        device for device in devices
+        if not is_built(device) and device._lazy_error is None
+    ]
+    if len(pending) > 0:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_build, pending))
+    return [device for device in devices if is_built(device)]
+
+
+def lazy_baseline_wrapper(plan):
+    """
+    Builds the lazy devices of the baseline before the plan.
+
+    Installed as a RunEngine preprocessor, so it runs before the baseline
+    is read. It only takes time for the first plan, and for the devices that
+    failed before it is a no-op (use `retry_device`).
+    """
+    def _build():
+        build_lazy_devices([
+            device for device in lazy_devices.values()
+            if device._lazy_baseline
+        ])
+        yield from null()
+
+    yield from _build()
+    return (yield from plan)
+
+
+# Runs outside of `sd`, so the baseline is complete when `sd` reads it.
+RE.preprocessors.append(lazy_baseline_wrapper)
@@ -0,0 +1,80 @@
+"""
+Per-point count time schedule applied by the detector itself.
+"""
+
+__all__ = ['PresetScheduleMixin']
+
+from ..session_logs import logger
+logger.info(__file__)
+
+
+class PresetScheduleMixin:
+    """
+    Applies a list of `preset_monitor` values inside `trigger()`.
+
+    A scan that changes the count time at every point (like `qxscan`) can
+    hand the whole schedule to the detector once, instead of adding the
+    `preset_monitor` as an extra scan axis. The plan selects the point with
+    `select_preset_point` before triggering, and the preset is only written
+    when it differs from the last value written, so consecutive points with
+    the same count time cost nothing.
+
+    The schedule is keyed on the point, not on the number of triggers, so a
+    point that is triggered again after a pause or a suspender still uses
+    its own preset.
+
+    It must come before the ophyd device class in the bases, and requires a
+    `preset_monitor` signal.
+    """
+
+    _preset_schedule = None
+    _preset_point = 0
+    _preset_last = None
+
+    def set_preset_schedule(self, presets):
+        """
+        Loads a count time schedule.
+
+        Parameters
+        ----------
+        presets : iterable
+            Values of `preset_monitor`, one per scan point.
+        """
+        self._preset_schedule = [float(value) for value in presets]
+        self._preset_point = 0
+        self._preset_last = None
+
+    def clear_preset_schedule(self):
+        """ Removes the count time schedule. """
+        self._preset_schedule = None
+        self._preset_point = 0
+        self._preset_last = None
+
+    def select_preset_point(self, point):
+        """
+        Selects the scan point whose preset the next triggers use.
+
+        Parameters
+        ----------
+        point : int
+            Index of the point in the schedule.
+        """
+        self._preset_point = int(point)
+
+    @property
+    def preset_schedule_active(self):
+        return self._preset_schedule is not None
+
+    def _apply_preset_schedule(self):
+        """ Writes the preset of the current point if it changed. """
+        # Past the end of the schedule the last value is kept.
+        point = min(self._preset_point, len(self._preset_schedule) - 1)
+        value = self._preset_schedule[point]
+        if value != self._preset_last:
+            self.preset_monitor.put(value)
+            self._preset_last = value
+
+    def trigger(self):
+        if self._preset_schedule:
+            self._apply_preset_schedule()
+        return super().trigger()
@@ -8,11 +8,12 @@ from ophyd import (Component, ADComponent, EigerDetectorCam, DetectorBase,
                    Staged, EpicsSignal, Signal, Kind, Device)
 from ophyd.areadetector.base import EpicsSignalWithRBV
 from ophyd.signal import EpicsSignalRO
-from ophyd.status import wait as status_wait, SubscriptionStatus
+from ophyd.status import wait as status_wait, SubscriptionStatus, Status
 from ophyd.areadetector.plugins import ROIPlugin_V34, StatsPlugin_V34
 from ophyd.areadetector.trigger_mixins import TriggerBase, ADTriggerStatus
 from ophyd.areadetector.filestore_mixins import FileStoreBase
 from apstools.utils import run_in_thread
+from ._conditions import ConditionStatus
 from time import sleep
 from os.path import join, isdir
 from ..session_logs import logger
@@ -109,6 +110,10 @@ class TriggerTime(TriggerBase):
     """
     _status_type = ADTriggerStatus
 
+    # Finishes after the exposure, before the `delay` given to the file
+    # writer. Used by pipelined step scans (see `PipelinedStep`).
+    acquisition_status = None
+
     def __init__(self, *args, image_name=None, delay=0.1, **kwargs):
         super().__init__(*args, **kwargs)
         if image_name is None:
@@ -168,15 +173,17 @@ class TriggerTime(TriggerBase):
                                "Call the stage() method before triggering.")
 
         @run_in_thread
-        def add_delay(status_obj, delay):
-            total_sleep = self.cam.trigger_exposure.get() + delay
-            sleep(total_sleep)
+        def add_delay(acquisition_status, status_obj, delay):
+            sleep(self.cam.trigger_exposure.get())
+            acquisition_status.set_finished()
+            sleep(delay)
             status_obj.set_finished()
 
         self._status = self._status_type(self)
+        self.acquisition_status = Status(self)
         self._acquisition_signal.put(1, wait=False)
         self.dispatch(self._image_name, ttime())
-        add_delay(self._status, self._delay)
+        add_delay(self.acquisition_status, self._status, self._delay)
         return self._status
 
 
@@ -369,24 +376,21 @@ class LocalEigerDetectorBase(DetectorBase):
                 comp.read_attrs += ["max_value", "min_value"]
 
     def save_images_on(self):
-        def check_value(*, old_value, value, **kwargs):
-            "Return True when file writter is enabled"
-            return value == "ready"
-
-        self.cam.fw_enable.put("Enable")
-        status_wait(
-            SubscriptionStatus(self.cam.fw_state, check_value, timeout=10)
+        # Watch fw_state before the put, so the change is not missed.
+        status = ConditionStatus(
+            [(self.cam.fw_state, "ready")], timeout=10,
+            name=f"{self.name} file writer enabled"
         )
+        self.cam.fw_enable.put("Enable")
+        status_wait(status)
 
     def save_images_off(self):
-        def check_value(*, old_value, value, **kwargs):
-            "Return True when file writter is enabled"
-            return value == "disabled"
-
-        self.cam.fw_enable.put("Disable")
-        status_wait(
-            SubscriptionStatus(self.cam.fw_state, check_value, timeout=10)
+        status = ConditionStatus(
+            [(self.cam.fw_state, "disabled")], timeout=10,
+            name=f"{self.name} file writer disabled"
         )
+        self.cam.fw_enable.put("Disable")
+        status_wait(status)
 
     def default_settings(self):
         self.cam.num_triggers.put(1)
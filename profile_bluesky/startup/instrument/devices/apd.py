@@ -5,7 +5,7 @@ APD detector parameters
 __all__ = ['apd_parameters']
 
 from ophyd import Component, Device, EpicsSignal
-from ..framework import sd
+from ._lazy import LazyDevice
 from ..session_logs import logger
 logger.info(__file__)
 
@@ -27,6 +27,5 @@ class APDDevice(Device):
                            write_pv='SetSCALevel.B', kind='config')
 
 
-apd_parameters = APDDevice('4idd:apd:1:', name='apd',
-                           labels=('apd', 'detectors'))
-sd.baseline.append(apd_parameters)
+apd_parameters = LazyDevice(APDDevice, '4idd:apd:1:', name='apd',
+                            labels=('apd', 'detectors'))
@@ -0,0 +1,311 @@
+"""
+Benchmarks of the device helpers.
+
+Not imported into the session, use for instance:
+`from instrument.devices.benchmarks import lazy_device_benchmark`
+"""
+
+__all__ = ['energy_grid_benchmark', 'lazy_device_benchmark',
+           'preset_schedule_benchmark']
+
+from bluesky import RunEngine
+from bluesky.plan_stubs import checkpoint, one_nd_step
+from bluesky.plans import list_scan
+from itertools import count as count_from
+from numpy import abs as np_abs, arange, array, sqrt
+from ophyd import Component, Device, Signal
+from ophyd.sim import SynAxis
+from ophyd.status import DeviceStatus
+from time import monotonic, sleep
+from pyRestTable import Table
+from ._lazy import LazyDevice, build_lazy_devices, lazy_devices
+from ._preset_schedule import PresetScheduleMixin
+from .qxscan_setup import constant, energy_grid
+
+from ..session_logs import logger
+logger.info(__file__)
+
+
+class _SimConnection:
+    """ Stands in for a device that takes `connect_time` to connect. """
+
+    def __init__(self, *, name, connect_time, fails=False):
+        self.name = name
+        self.connect_time = connect_time
+        self.fails = fails
+
+    def wait_for_connection(self, timeout=None):
+        sleep(min(self.connect_time, timeout or self.connect_time))
+        if self.fails:
+            raise TimeoutError(f"{self.name} did not connect.")
+
+
+def lazy_device_benchmark(num=20, connect_time=0.1, failing=2, timeout=1):
+    """
+    Time building the devices at import and with `LazyDevice`.
+
+    Parameters
+    ----------
+    num : int, optional
+        Number of simulated devices.
+    connect_time : float, optional
+        Seconds that each device takes to connect.
+    failing : int, optional
+        Number of devices that never connect (IOC down), they take
+        `timeout` seconds to fail.
+    timeout : float, optional
+        Connection timeout in seconds.
+
+    Returns
+    -------
+    result : dict
+        Seconds taken to build all the devices one after the other, as done
+        at import ("eager"), to create the lazy proxies at startup
+        ("lazy_startup"), to build them together before the first plan
+        ("first_plan"), and to touch the failed ones again ("failed_again").
+    """
+    specs = [
+        dict(name=f"lazy_benchmark{i}",
+             connect_time=timeout if i < failing else connect_time,
+             fails=i < failing)
+        for i in range(num)
+    ]
+
+    t0 = monotonic()
+    for spec in specs:
+        try:
+            _SimConnection(**spec).wait_for_connection(timeout)
+        except TimeoutError:
+            pass
+    result = dict(eager=monotonic() - t0)
+
+    t0 = monotonic()
+    proxies = [
+        LazyDevice(_SimConnection, baseline=False, connection_timeout=timeout,
+                   **spec)
+        for spec in specs
+    ]
+    result['lazy_startup'] = monotonic() - t0
+
+    try:
+        t0 = monotonic()
+        build_lazy_devices(proxies)
+        result['first_plan'] = monotonic() - t0
+
+        t0 = monotonic()
+        for proxy in proxies[:failing]:
+            try:
+                proxy.name
+            except RuntimeError:
+                pass
+        result['failed_again'] = monotonic() - t0
+    finally:
+        for spec in specs:
+            lazy_devices.pop(spec['name'], None)
+
+    table = Table()
+    table.labels = ("devices", "time (s)")
+    table.addRow(("built at import", f"{result['eager']:0.3f}"))
+    table.addRow(("lazy, at startup", f"{result['lazy_startup']:0.3f}"))
+    table.addRow(("lazy, before the first plan",
+                  f"{result['first_plan']:0.3f}"))
+    table.addRow(("failed ones, used again", f"{result['failed_again']:0.3f}"))
+    print(table)
+    print(f"{num} devices, {failing} not connecting.")
+
+    return result
+
+
+def _energy_grid_loop(pre_edge, edge, post_edge):
+    """ `energy_grid` as it was computed before, one region at a time. """
+    elist = []
+    factorlist = []
+    edge_start, edge_end, edge_step, edge_factor = edge
+
+    for i, (start, step, factor) in enumerate(pre_edge):
+        end = pre_edge[i+1][0] if i < len(pre_edge) - 1 else edge_start
+        energies = arange(start, end, step)/1000.
+        factorlist += [factor for j in range(energies.size)]
+        elist += list(energies)
+
+    energies = arange(edge_start, edge_end, edge_step)/1000.
+    factorlist += [edge_factor for j in range(energies.size)]
+    elist += list(energies)
+
+    for i, (end, step, factor) in enumerate(post_edge):
+        start = sqrt(constant*edge_end) if i == 0 else post_edge[i-1][0]
+        energies = arange(start, end, step)**2/constant/1000.
+        factorlist += [factor for j in range(energies.size)]
+        elist += list(energies)
+
+    elist += [end**2/constant/1000.]
+    factorlist += [factorlist[-1]]
+    elist.reverse()
+    factorlist.reverse()
+    return elist, factorlist
+
+
+def energy_grid_benchmark(pre_edge=((-200, 5, 1), (-30, 1, 1)),
+                          edge=(-10, 20, 0.25, 1),
+                          post_edge=((8, 0.02, 1), (16, 0.01, 2)),
+                          repeat=5):
+    """
+    Time the qxscan energy list, with the old loop and with `energy_grid`.
+
+    Parameters
+    ----------
+    pre_edge, edge, post_edge : tuple
+        Region parameters, as in `energy_grid`.
+    repeat : int, optional
+        Number of times each method is timed, the fastest is kept.
+
+    Returns
+    -------
+    result : dict
+        Seconds taken by the "loop", by `energy_grid` the first time
+        ("numpy") and when cached ("cached"), the number of points
+        ("points") and the largest energy difference in keV ("max_diff").
+        Raises ValueError if the time factors are different.
+    """
+    def _best(func):
+        times = []
+        for _ in range(repeat):
+            t0 = monotonic()
+            output = func(pre_edge, edge, post_edge)
+            times.append(monotonic() - t0)
+        return min(times), output
+
+    loop_time, (old_energies, old_factors) = _best(_energy_grid_loop)
+    numpy_time, (energies, factors) = _best(energy_grid.__wrapped__)
+    energy_grid(pre_edge, edge, post_edge)
+    cached_time, _ = _best(energy_grid)
+
+    if len(old_factors) != len(factors) or any(array(old_factors) != factors):
+        raise ValueError("energy_grid and the loop give different factors.")
+    result = dict(
+        loop=loop_time, numpy=numpy_time, cached=cached_time,
+        points=len(energies),
+        max_diff=float(np_abs(array(old_energies) - energies).max())
+    )
+
+    table = Table()
+    table.labels = ("energy list", "time (ms)")
+    table.addRow(("loop", f"{loop_time*1e3:0.3f}"))
+    table.addRow(("energy_grid", f"{numpy_time*1e3:0.3f}"))
+    table.addRow(("energy_grid, cached", f"{cached_time*1e3:0.3f}"))
+    print(table)
+    print(f"{result['points']} points, largest difference "
+          f"{result['max_diff']:0.2g} keV.")
+
+    return result
+
+
+class _SimPresetSignal(Signal):
+    """ Preset whose writes take `put_time`, like a CA put with callback. """
+
+    put_time = 0
+    writes = 0
+
+    def put(self, value, **kwargs):
+        sleep(self.put_time)
+        self.writes += 1
+        super().put(value, **kwargs)
+
+
+class _SimScaler(Device):
+    """ Scaler that counts for `count_time` seconds, whatever the preset. """
+
+    preset_monitor = Component(_SimPresetSignal, value=1, kind='config')
+    counts = Component(Signal, value=0, kind='hinted')
+    count_time = 0
+
+    def trigger(self):
+        status = DeviceStatus(self)
+        sleep(self.count_time)
+        self.counts.put(self.counts.get() + 1)
+        status.set_finished()
+        return status
+
+
+class _SimScheduledScaler(PresetScheduleMixin, _SimScaler):
+    pass
+
+
+def preset_schedule_benchmark(factors=None, put_time=0.01, count_time=0.001):
+    """
+    Time a qxscan-like scan, with the count time as a scan axis and with a
+    preset schedule applied by the simulated scaler.
+
+    Parameters
+    ----------
+    factors : iterable, optional
+        Count time factor of each point, defaults to the factors of
+        `energy_grid_benchmark` (1261 points).
+    put_time : float, optional
+        Seconds taken by each write of the preset.
+    count_time : float, optional
+        Seconds taken by each count.
+
+    Returns
+    -------
+    result : dict
+        Seconds taken by the "axis" and "schedule" scans, and the number of
+        preset writes of each ("axis_writes", "schedule_writes").
+    """
+    if factors is None:
+        factors = energy_grid(
+            ((-200, 5, 1), (-30, 1, 1)), (-10, 20, 0.25, 1),
+            ((8, 0.02, 1), (16, 0.01, 2))
+        )[1]
+    presets = [float(factor) for factor in factors]
+    positions = list(range(len(presets)))
+
+    RE = RunEngine({})
+    motor = SynAxis(name='preset_benchmark_motor')
+    result = {}
+
+    def _run(name, detector, plan):
+        detector.preset_monitor.put_time = put_time
+        detector.preset_monitor.writes = 0
+        detector.count_time = count_time
+        t0 = monotonic()
+        RE(plan)
+        result[name] = monotonic() - t0
+        result[f"{name}_writes"] = detector.preset_monitor.writes
+
+    # As qxscan does for the detectors without a schedule.
+    scaler = _SimScaler(name='preset_benchmark_scaler')
+    _run('axis', scaler, list_scan(
+        [scaler], motor, positions, scaler.preset_monitor, presets
+    ))
+
+    # As qxscan does for the PresetScheduleMixin detectors.
+    scheduled = _SimScheduledScaler(name='preset_benchmark_scaler')
+    points = count_from(0)
+
+    def _scheduled_step(detectors, step, pos_cache):
+        point = next(points)
+        yield from checkpoint()
+        scheduled.select_preset_point(point)
+        return (yield from one_nd_step(detectors, step, pos_cache))
+
+    def _scheduled_scan():
+        scheduled.set_preset_schedule(presets)
+        try:
+            yield from list_scan([scheduled], motor, positions,
+                                 per_step=_scheduled_step)
+        finally:
+            scheduled.clear_preset_schedule()
+
+    _run('schedule', scheduled, _scheduled_scan())
+
+    table = Table()
+    table.labels = ("count time", "time (s)", "preset writes")
+    table.addRow(("scan axis", f"{result['axis']:0.3f}",
+                  result['axis_writes']))
+    table.addRow(("schedule", f"{result['schedule']:0.3f}",
+                  result['schedule_writes']))
+    print(table)
+    print(f"{len(presets)} points.")
+
+    return result
@@ -5,7 +5,7 @@ LM 510 Level Monitor
 __all__ = ['cryolevels']
 from ..session_logs import logger
 from ophyd import Component, Device, EpicsSignal, EpicsSignalRO
-from ..framework import sd
+from ._lazy import LazyDevice
 
 logger.info(__file__)
 
@@ -50,7 +50,6 @@ class CryoLevelMonitor(Device):
     )
 
 
-cryolevels = CryoLevelMonitor(
-    '4idd:', name='cryolevels', labels=("cryolevels")
+cryolevels = LazyDevice(
+    CryoLevelMonitor, '4idd:', name='cryolevels', labels=("cryolevels")
 )
-sd.baseline.append(cryolevels)
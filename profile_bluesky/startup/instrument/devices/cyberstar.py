@@ -4,7 +4,7 @@ Cyberstar detector parameters
 __all__ = ['cyberstar_mag_parameters', 'cyberstar_8c_parameters']
 
 from ophyd import Component, Device, EpicsSignal
-from ..framework import sd
+from ._lazy import LazyDevice
 from ..session_logs import logger
 logger.info(__file__)
 
@@ -29,11 +29,11 @@ class CyberstarDevice(Device):
                            kind='config')
 
 
-cyberstar_mag_parameters = CyberstarDevice(
-    '4idd:x1k:2:', name='cyberstar_mag', labels=('cyberstar',)
+cyberstar_mag_parameters = LazyDevice(
+    CyberstarDevice, '4idd:x1k:2:', name='cyberstar_mag',
+    labels=('cyberstar',)
     )
-cyberstar_8c_parameters = CyberstarDevice(
-    '4idd:x1k:1:', name='cyberstar_8c', labels=('cyberstar',)
+cyberstar_8c_parameters = LazyDevice(
+    CyberstarDevice, '4idd:x1k:1:', name='cyberstar_8c',
+    labels=('cyberstar',)
     )
-sd.baseline.append(cyberstar_8c_parameters)
-sd.baseline.append(cyberstar_mag_parameters)
@@ -6,7 +6,7 @@ __all__ = ['ge_apply', 'ge_release']
 
 from ophyd import Component, EpicsSignalRO, EpicsSignalWithRBV
 from apstools.devices import PVPositionerSoftDoneWithStop
-from ..framework import sd
+from ._lazy import LazyDevice
 from ..session_logs import logger
 logger.info(__file__)
 
@@ -49,14 +49,11 @@ class GEController(PVPositionerSoftDoneWithStop):
         super().stop(success=success)
 
 
-ge_apply = GEController(
-    "4idd:PC1:", name="ge_apply", readback_pv="Pressure_RBV",
+ge_apply = LazyDevice(
+    GEController, "4idd:PC1:", name="ge_apply", readback_pv="Pressure_RBV",
     setpoint_pv="Setpoint", tolerance=0.01, labels=('ge_controller',)
 )
-ge_release = GEController(
-    "4idd:PC2:", name="ge_release", readback_pv="Pressure_RBV",
+ge_release = LazyDevice(
+    GEController, "4idd:PC2:", name="ge_release", readback_pv="Pressure_RBV",
     setpoint_pv="Setpoint", tolerance=0.01, labels=('ge_controller',)
 )
-
-sd.baseline.append(ge_apply)
-sd.baseline.append(ge_release)
@@ -10,7 +10,7 @@ from ophyd import (
 from apstools.devices import PVPositionerSoftDoneWithStop
 from ophyd.status import Status
 from numpy import allclose
-from ..framework import sd
+from ._lazy import LazyDevice
 from ..session_logs import logger
 logger.info(__file__)
 
@@ -129,5 +129,4 @@ class Magnet6T(Device):
     )
 
 
-mag6t = Magnet6T('4iddx:', name='mag6t')
-sd.baseline.append(mag6t)
+mag6t = LazyDevice(Magnet6T, '4iddx:', name='mag6t')
@@ -9,7 +9,7 @@ from ophyd import (Component, FormattedComponent, PseudoSingle, Kind,
                    EpicsSignal, EpicsMotor, Signal)
 from bluesky.suspenders import SuspendBoolLow
 from ..framework import RE
-from ..framework import sd
+from ._lazy import LazyDevice
 from .energy import energy as bl_energy
 import gi
 gi.require_version('Hkl', '5.0')
@@ -85,25 +85,41 @@ class FourCircleDiffractometer(E4CV):
         return {'fields': fields}
 
 
-def update_energy(value=None, **kwargs):
-    fourc.energy.put(value)
+# Energy subscription and suspender of the fourc setup, replaced if it runs
+# again (see `retry_device`).
+_fourc_setup = {}
 
 
-bl_energy.wait_for_connection(timeout=10)
-bl_energy.subscribe(update_energy)
+def _setup_fourc(device):
 
-fourc = FourCircleDiffractometer('4iddx:', name='fourc')
-fourc.energy.put(bl_energy.get())
-# fourc.calc.physical_axis_names = {'omega': 'theta',
-#                                   'chi': 'chi',
-#                                   'phi': 'phi',
-#                                   'tth': 'tth'}
-sus = SuspendBoolLow(fourc.th_tth_permit)
-RE.install_suspender(sus)
+    def update_energy(value=None, **kwargs):
+        device.energy.put(value)
 
-# TODO: This is a rough workaround...
-for attr in "x y z baseth basetth ath achi atth tablex tabley".split():
-    getattr(fourc, attr).kind = "normal"
+    # Undo a previous setup that failed.
+    if 'cid' in _fourc_setup:
+        bl_energy.unsubscribe(_fourc_setup.pop('cid'))
+    if 'suspender' in _fourc_setup:
+        RE.remove_suspender(_fourc_setup.pop('suspender'))
 
+    bl_energy.wait_for_connection(timeout=10)
+    _fourc_setup['cid'] = bl_energy.subscribe(update_energy)
+    device.energy.put(bl_energy.get())
+    # device.calc.physical_axis_names = {'omega': 'theta',
+    #                                    'chi': 'chi',
+    #                                    'phi': 'phi',
+    #                                    'tth': 'tth'}
+    sus = SuspendBoolLow(device.th_tth_permit)
+    _fourc_setup['suspender'] = sus
+    RE.install_suspender(sus)
+
+    # TODO: This is a rough workaround...
+    for attr in "x y z baseth basetth ath achi atth tablex tabley".split():
+        getattr(device, attr).kind = "normal"
+
+
+fourc = LazyDevice(
+    FourCircleDiffractometer, '4iddx:', name='fourc', setup=_setup_fourc
+)
+
+# The hkl helpers (wh, pa, ...) use the proxy, so the first one builds fourc.
 select_diffractometer(fourc)
-sd.baseline.append(fourc)
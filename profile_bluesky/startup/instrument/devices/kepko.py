@@ -6,7 +6,7 @@ __all__ = ['kepko']
 
 from ophyd import Component, FormattedComponent, Device, Kind
 from ophyd import EpicsSignal, EpicsSignalRO
-from ..framework import sd
+from ._lazy import LazyDevice
 from apstools.devices import PVPositionerSoftDoneWithStop
 
 from ..session_logs import logger
@@ -63,6 +63,10 @@ class KepkoController(Device):
             self.voltage.readback.kind = Kind.hinted
 
 
-kepko = KepkoController('4idd:BOP:PS1:', name='kepko')
-kepko.mode_change(value=kepko.mode.get())
-sd.baseline.append(kepko)
+def _setup_kepko(device):
+    device.mode_change(value=device.mode.get())
+
+
+kepko = LazyDevice(
+    KepkoController, '4idd:BOP:PS1:', name='kepko', setup=_setup_kepko
+)
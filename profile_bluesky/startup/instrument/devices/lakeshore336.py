@@ -5,23 +5,21 @@ Lakeshore 336 temperature controller EPICS version 1.0
 from ophyd import Component, FormattedComponent
 from apstools.devices import TrackingSignal, LakeShore336Device
 from apstools.devices.lakeshore_controllers import LakeShore336_LoopControl
-from numpy import argsort, array
+from ._heater_ranges import AutoHeaterMixin, OffsetTable
 from ..session_logs import logger
 logger.info(__file__)
 
 
-class LS336_LoopControl(LakeShore336_LoopControl):
+class LS336_LoopControl(AutoHeaterMixin, LakeShore336_LoopControl):
     """
     Setup for loop with heater control.
 
-    The lakeshore 336 accepts up to two heaters.
+    The lakeshore 336 accepts up to two heaters. The heater range follows the
+    setpoint if `auto_heater` is True, see `AutoHeaterMixin`.
     """
 
     auto_heater = Component(TrackingSignal, value=False, kind="config")
 
-    # This must be modified either here, or before using auto_heater.
-    _auto_ranges = None
-
     def __init__(self, *args, loop_number=None, timeout=60*60*10, **kwargs):
         super().__init__(
             *args, loop_number=loop_number, timeout=timeout, **kwargs
@@ -47,39 +45,12 @@ class LS336_LoopControl(LakeShore336_LoopControl):
     @auto_heater.sub_value
     def _subscribe_auto_heater(self, value=None, **kwargs):
         if value:
+            # Writes the range of the first setpoint, whatever it is now.
+            self._heater_range_last = None
             self.setpoint.subscribe(self._switch_heater, event_type='value')
         else:
             self.setpoint.clear_subs(self._switch_heater)
 
-    def _switch_heater(self, value=None, **kwargs):
-        # TODO: Find a better way to do this, perhaps with an array?
-        for _heater_range, _temp_range in self._auto_ranges.items():
-            if _temp_range:
-                if _temp_range[0] < value <= _temp_range[1]:
-                    self.heater_range.put(_heater_range)
-
-    @property
-    def auto_ranges(self):
-        return self._auto_ranges
-
-    @auto_ranges.setter
-    def auto_ranges(self, value):
-        if not isinstance(value, dict):
-            raise TypeError('auto_ranges must be a dictionary.')
-
-        for _heater_range, _temp_range in value.items():
-            if _heater_range not in self.heater_range.enum_strs:
-                raise ValueError("The input dictionary keys must be one of "
-                                 f"these: {self.heater_range.enum_strs}, but "
-                                 f"{_heater_range} was entered.")
-
-            if _temp_range is not None and len(_temp_range) != 2:
-                raise ValueError(f"The value {_temp_range} is invalid! It "
-                                 "must be either None or an iterable with two "
-                                 "items.")
-
-            self._auto_ranges = value
-
     # TODO: This is a workaround from a potential problem in the apstools
     # PVPositionerSoftDone
     def _setup_move(self, position):
@@ -98,6 +69,23 @@ class LoopSample(LS336_LoopControl):
 
         super().__init__(*args, **kwargs)
 
+    @property
+    def vaporizer_ranges(self):
+        """
+        Vaporizer offset used up to each sample temperature limit.
+
+        Dictionary with the "limits" and "offsets" lists. Assign a new
+        dictionary to change it, it is compiled into a lookup table.
+        """
+        return dict(limits=list(self._vaporizer_ranges["limits"]),
+                    offsets=list(self._vaporizer_ranges["offsets"]))
+
+    @vaporizer_ranges.setter
+    def vaporizer_ranges(self, value):
+        self._vaporizer_table = OffsetTable(value["limits"], value["offsets"])
+        self._vaporizer_ranges = dict(limits=list(value["limits"]),
+                                      offsets=list(value["offsets"]))
+
     def move(self, position, **kwargs):
         wait = kwargs.pop("wait", False)
 
@@ -113,18 +101,12 @@ class LoopSample(LS336_LoopControl):
     def _get_vaporizer_position(self, sample_position):
         """ Returns vaporizer setpoint based on the sample setpoint. """
 
-        limits = array(self.vaporizer_ranges["limits"])
-        offsets = array(self.vaporizer_ranges["offsets"])
-        sort = argsort(limits)
+        offset = self._vaporizer_table(sample_position)
 
         # If nothing works, it will just go to 80% of sample position
-        vaporizer_position = sample_position*0.8
-        for limit, offset in zip(limits[sort], offsets[sort]):
-            if sample_position <= limit:
-                vaporizer_position = sample_position - offset
-                break
-
-        return vaporizer_position
+        if offset is None:
+            return sample_position*0.8
+        return sample_position - offset
 
 
 class LS336Device(LakeShore336Device):
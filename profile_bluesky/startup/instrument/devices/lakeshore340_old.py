@@ -5,10 +5,11 @@ Lakeshore 340 temperature controller EPICS version 1.1
 from apstools.synApps.asyn import AsynRecord
 from ophyd import (Component, Device, Signal, EpicsSignal, EpicsSignalRO,
                    FormattedComponent)
+from ophyd.status import StatusBase, SubscriptionStatus
 from .util_components_old import TrackingSignal
-from time import sleep
 from apstools.devices import PVPositionerSoftDone
 
+from ._heater_ranges import AutoHeaterMixin
 from ..session_logs import logger
 logger.info(__file__)
 
@@ -19,31 +20,69 @@ class SetpointSignal(EpicsSignal):
     Signal for the control setpoint
 
     This is implemented because sometimes the setpoint PV is not updated. Here,
-    it will check for the update, and retry.
+    `put` returns a status that finishes when the setpoint monitor matches the
+    value. The value is only put again if that does not happen within
+    `retry_timeout` seconds, so nothing blocks while it is checked.
+
+    If the setpoint is still wrong after `max_iteractions` retries, and the
+    loop is not ramping, the status fails and so does the ongoing move. The
+    `retries` and `failures` counters keep how many puts had to be repeated
+    and how many were never confirmed.
     """
 
-    def __init__(self, *args, max_iteractions=5, sleep_default=0.02,
+    def __init__(self, *args, max_iteractions=5, retry_timeout=0.5,
                  ramp_attr='ramp_on', **kwargs):
         super().__init__(*args, **kwargs)
         self.max_iteractions = max_iteractions
-        self.sleep_default = sleep_default
+        self.retry_timeout = retry_timeout
         self.ramp_attr = ramp_attr
+        self.retries = 0
+        self.failures = 0
+        self.confirmation = None
 
     def put(self, value, **kwargs):
         super().put(value, **kwargs)
         ramp = getattr(self.parent, self.ramp_attr).get()
-        counter = 0
-        while abs(value - self._readback) > self.tolerance:
-            if counter == self.max_iteractions:
-                # Checks that it is not ramping.
-                if ramp == 0:
-                    raise RuntimeError('Setpoint was not updated after '
-                                       f'{self.max_iteractions} attempts.')
-                else:
-                    break
-            sleep(self.sleep_default)
-            super().put(value, **kwargs)
-            counter += 1
+        status = StatusBase()
+        self.confirmation = status
+        self._confirm(value, ramp, 0, status)
+        return status
+
+    def _confirm(self, target, ramp, attempt, status):
+        """ Waits for one attempt, then retries or finishes `status`. """
+
+        def _matches(value=None, **kwargs):
+            return abs(target - value) <= self.tolerance
+
+        def _attempt_done(attempt_status):
+            if status.done:
+                return
+            # Also stops if a newer put took over.
+            if attempt_status.success or self.confirmation is not status:
+                status.set_finished()
+            elif attempt < self.max_iteractions:
+                self.retries += 1
+                EpicsSignal.put(self, target, wait=False)
+                self._confirm(target, ramp, attempt + 1, status)
+            elif ramp != 0:
+                # The setpoint readback follows the ramp.
+                status.set_finished()
+            else:
+                self._confirm_failed(target, status)
+
+        # A ConditionStatus would log and record every attempt.
+        SubscriptionStatus(
+            self, _matches, timeout=self.retry_timeout
+        ).add_callback(_attempt_done)
+
+    def _confirm_failed(self, target, status):
+        self.failures += 1
+        message = (f"Setpoint was not updated to {target} after "
+                   f"{self.max_iteractions} attempts.")
+        logger.error(message)
+        status.set_exception(RuntimeError(message))
+        if getattr(self.parent, 'moving', False):
+            self.parent._done_moving(success=False)
 
 
 class LS340_LoopBase(PVPositionerSoftDone):
@@ -122,8 +161,13 @@ class LS340_LoopSample(LS340_LoopBase):
     sensor = Component(EpicsSignal, "Spl_sel", kind="config")
 
 
-class LS340Device(Device):
-    """ Lakeshore 340 setup EPICS version 1.1 """
+class LS340Device(AutoHeaterMixin, Device):
+    """
+    Lakeshore 340 setup EPICS version 1.1
+
+    The heater range follows the control setpoint if `auto_heater` is True,
+    see `AutoHeaterMixin`.
+    """
 
     control = FormattedComponent(LS340_LoopControl, "{prefix}",
                                  loop_number=1)
@@ -132,7 +176,8 @@ class LS340Device(Device):
 
     heater = Component(EpicsSignalRO, "Heater")
     heater_range = Component(EpicsSignal, "Rg_rdbk", write_pv="HeatRg",
-                             kind="normal", put_complete=True)
+                             kind="normal", put_complete=True,
+                             auto_monitor=True)
 
     auto_heater = Component(TrackingSignal, value=False, kind="config")
 
@@ -144,9 +189,6 @@ class LS340Device(Device):
 
     serial = Component(AsynRecord, "serial", kind="omitted")
 
-    # This must be modified either here, or before using auto_heater.
-    _auto_ranges = None
-
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # TODO: I don't know why this has to be done, otherwise it gets hinted.
@@ -155,36 +197,9 @@ class LS340Device(Device):
     @auto_heater.sub_value
     def _subscribe_auto_heater(self, value=None, **kwargs):
         if value:
+            # Writes the range of the first setpoint, whatever it is now.
+            self._heater_range_last = None
             self.control.setpoint.subscribe(self._switch_heater,
                                             event_type='value')
         else:
             self.control.setpoint.clear_subs(self._switch_heater)
-
-    def _switch_heater(self, value=None, **kwargs):
-        # TODO: Find a better way to do this, perhaps with an array?
-        for _heater_range, _temp_range in self._auto_ranges.items():
-            if _temp_range:
-                if _temp_range[0] < value <= _temp_range[1]:
-                    self.heater_range.put(_heater_range)
-
-    @property
-    def auto_ranges(self):
-        return self._auto_ranges
-
-    @auto_ranges.setter
-    def auto_ranges(self, value):
-        if not isinstance(value, dict):
-            raise TypeError('auto_ranges must be a dictionary.')
-
-        for _heater_range, _temp_range in value.items():
-            if _heater_range not in self.heater_range.enum_strs:
-                raise ValueError("The input dictionary keys must be one of "
-                                 f"these: {self.heater_range.enum_strs}, but "
-                                 f"{_heater_range} was entered.")
-
-            if _temp_range is not None and len(_temp_range) != 2:
-                raise ValueError(f"The value {_temp_range} is invalid! It "
-                                 "must be either None or an iterable with two "
-                                 "items.")
-
-            self._auto_ranges = value
@@ -38,6 +38,10 @@ class KohzuPositioner(PVPositioner):
     stop_y = FormattedComponent(EpicsSignal, "{_y_pv}.STOP",
                                 kind="omitted")
 
+    # Used by the fly scans to set the sweep speed.
+    theta_velocity = FormattedComponent(EpicsSignal, "{_theta_pv}.VELO",
+                                        kind="omitted")
+
     actuate = Component(EpicsSignal, "KohzuPutBO", put_complete=True,
                         kind="omitted")
     actuate_value = 1
@@ -45,6 +49,9 @@ class KohzuPositioner(PVPositioner):
     done = Component(EpicsSignalRO, "KohzuMoving", kind="omitted")
     done_value = 0
 
+    # Theta and y motor PV names, keyed by prefix.
+    _motor_pvs = {}
+
     def __init__(self, prefix, *, limits=None, readback_pv="", setpoint_pv="",
                  name=None, read_attrs=None, configuration_attrs=None,
                  parent=None, egu="", **kwargs):
@@ -52,13 +59,7 @@ class KohzuPositioner(PVPositioner):
         self._setpoint_pv = setpoint_pv
         self._readback_pv = readback_pv
 
-        def get_motor_pv(label):
-            _pv_signal = EpicsSignalRO(f"{prefix}Kohzu{label}PvSI", name="tmp")
-            _pv_signal.wait_for_connection()
-            return _pv_signal.get(as_string=True)
-
-        self._theta_pv = get_motor_pv("Theta")
-        self._y_pv = get_motor_pv("Y")
+        self._theta_pv, self._y_pv = self._get_motor_pvs(prefix)
 
         super().__init__(
             prefix, limits=limits, name=name, read_attrs=read_attrs,
@@ -70,6 +71,26 @@ class KohzuPositioner(PVPositioner):
         # positioner itself as in EpicsMotor.
         self.readback.name = self.name
 
+    @classmethod
+    def _get_motor_pvs(cls, prefix):
+        """
+        Read the theta and y motor PV names from the Kohzu sequencer.
+
+        All the positioners share the same motors, so this is read only once
+        per prefix, and both PVs are connected concurrently.
+        """
+        if prefix not in cls._motor_pvs:
+            signals = [
+                EpicsSignalRO(f"{prefix}Kohzu{label}PvSI", name="tmp")
+                for label in ("Theta", "Y")
+            ]
+            for signal in signals:
+                signal.wait_for_connection()
+            cls._motor_pvs[prefix] = tuple(
+                signal.get(as_string=True) for signal in signals
+            )
+        return cls._motor_pvs[prefix]
+
     def _setup_move(self, position):
         '''Move and do not wait until motion is complete (asynchronous)'''
         self.log.debug('%s.setpoint = %s', self.name, position)
@@ -5,7 +5,7 @@ Nanopositioner motors
 __all__ = ['nanopositioner']
 
 from ophyd import Component, MotorBundle, EpicsMotor
-from ..framework import sd
+from ._lazy import LazyDevice
 from ..session_logs import logger
 logger.info(__file__)
 
@@ -16,5 +16,4 @@ class NanoPositioner(MotorBundle):
     nanoz = Component(EpicsMotor, 'm91', labels=('motor', 'nanopositioner'))
 
 
-nanopositioner = NanoPositioner('4iddx:', name='nanopositioner')
-sd.baseline.append(nanopositioner)
+nanopositioner = LazyDevice(NanoPositioner, '4iddx:', name='nanopositioner')
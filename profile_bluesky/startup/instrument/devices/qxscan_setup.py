@@ -7,13 +7,22 @@ This device will holds the parameters and energy list used in a qxscan plan.
 __all__ = ['qxscan_params']
 
 import json
+import os
+from time import time
 from ophyd import Signal, Device
 from ophyd import Component
-from ..framework import sd, cat
-from numpy import sqrt, arange
+from ..framework import RE, sd, cat
+from functools import lru_cache
+from numpy import sqrt, arange, array, ceil, concatenate, cumsum, repeat
 from ..session_logs import logger
 logger.info(__file__)
 
+# Local copy of the latest qxscan parameters, written at the end of each run
+# and read at startup.
+QXSCAN_CACHE = os.path.join(
+    os.path.expanduser("~"), ".config", "Bluesky_qxscan_params.json"
+)
+
 hbar = 6.582119569E-16  # eV.s
 speed_of_light = 299792458e10  # A/s
 electron_mass = 0.510998950E6/speed_of_light**2  # eV.s**2/A**2
@@ -22,6 +31,82 @@ global constant
 constant = 2*electron_mass/hbar**2  # A^2/eV
 
 
+def _json_default(value):
+    """ Converts numpy arrays and scalars into python objects. """
+    try:
+        return value.tolist()
+    except AttributeError:
+        raise TypeError(f"{type(value)} is not JSON serializable")
+
+
+@lru_cache(maxsize=32)
+def energy_grid(pre_edge, edge, post_edge):
+    """
+    Create the qxscan energy list and time factors.
+
+    All regions are computed together, and the results are cached, so
+    calling it again with the same parameters is free.
+
+    Parameters
+    -----------
+    pre_edge: tuple
+    (Estart, Estep, TimeFactor) of each pre-edge region, in eV.
+    edge: tuple
+    (Estart, Eend, Estep, TimeFactor) of the edge region, in eV.
+    post_edge: tuple
+    (Kend, Kstep, TimeFactor) of each post-edge region, in A^-1. Must have at
+    least one region.
+
+    Returns
+    -----------
+    energies: numpy.array
+    Energies relative to the edge in keV, from high to low energy.
+    factors: numpy.array
+    Counting time factor of each energy.
+
+    Both arrays are read-only.
+    """
+    edge_start, edge_end, edge_step, edge_factor = edge
+
+    # Each region is described by start, end, step, factor and if it is in k
+    starts = [region[0] for region in pre_edge] + [edge_start]
+    ends = starts[1:] + [edge_end]
+    steps = [region[1] for region in pre_edge] + [edge_step]
+    factors = [region[2] for region in pre_edge] + [edge_factor]
+    in_k = [False]*(len(pre_edge) + 1)
+
+    kstart = sqrt(constant*edge_end)
+    for kend, kstep, factor in post_edge:
+        starts.append(kstart)
+        ends.append(kend)
+        steps.append(kstep)
+        factors.append(factor)
+        in_k.append(True)
+        kstart = kend
+
+    starts, ends, steps = array(starts), array(ends), array(steps)
+
+    # Same number of points as numpy.arange
+    num = ceil((ends - starts)/steps).astype(int).clip(min=0)
+    offsets = repeat(cumsum(num) - num, num)
+    index = arange(num.sum()) - offsets
+
+    positions = repeat(starts, num) + index*repeat(steps, num)
+    in_k = repeat(in_k, num)
+    positions[in_k] = positions[in_k]**2/constant
+
+    last_factor = factors[-1] if num.sum() == 0 else repeat(factors, num)[-1]
+    energies = concatenate((positions, [ends[-1]**2/constant]))/1000.
+    time_factors = concatenate((repeat(factors, num), [last_factor]))
+
+    energies = energies[::-1]
+    time_factors = time_factors[::-1]
+    energies.setflags(write=False)
+    time_factors.setflags(write=False)
+
+    return energies, time_factors
+
+
 class EdgeDevice(Device):
     Estart = Component(Signal, value=-10)
     Eend = Component(Signal, value=10)
@@ -215,70 +300,57 @@ class QxscanParams(Device):
 
         self._create_positions_list()
 
-    def _create_positions_list(self):
-        elist = []
-        factorlist = []
-
-        # Pre-edge region
-        for i in range(self.pre_edge.num_regions.get()):
-            region = getattr(self.pre_edge, 'region{}'.format(i+1))
-            start = region.Estart.get()
-            step = region.Estep.get()
-
-            if i != self.pre_edge.num_regions.get()-1:
-                end = getattr(self.pre_edge,
-                              'region{}'.format(i+2)).Estart.get()
-            else:
-                end = self.edge.Estart.get()
-
-            energies = arange(start, end, step)/1000.
-
-            factorlist += [region.TimeFactor.get() for j in
-                           range(energies.size)]
-            elist += list(energies)
-
-        # Edge region
-        start = self.edge.Estart.get()
-        end = self.edge.Eend.get()
-        step = self.edge.Estep.get()
-
-        energies = arange(start, end, step)/1000.
-
-        factorlist += [self.edge.TimeFactor.get() for j in
-                       range(energies.size)]
-        elist += list(energies)
-
-        # Post-edge region
-        for i in range(self.post_edge.num_regions.get()):
-            region = getattr(self.post_edge, 'region{}'.format(i+1))
-            end = region.Kend.get()
-            step = region.Kstep.get()
-
-            if i == 0:
-                start = sqrt(constant*self.edge.Eend.get())
-            else:
-                start = getattr(self.post_edge,
-                                'region{}'.format(i)).Kend.get()
-
-            energies = arange(start, end, step)**2/constant/1000.
-
-            factorlist += [region.TimeFactor.get() for j in
-                           range(energies.size)]
-            elist += list(energies)
+    def _regions_params(self):
+        """
+        Collect the parameters of the active regions as hashable tuples.
 
-        elist += [end**2/constant/1000.]
-        factorlist += [factorlist[-1]]
+        Returns
+        -----------
+        pre_edge: tuple
+        (Estart, Estep, TimeFactor) of each pre-edge region.
+        edge: tuple
+        (Estart, Eend, Estep, TimeFactor) of the edge region.
+        post_edge: tuple
+        (Kend, Kstep, TimeFactor) of each post-edge region.
+        """
+        pre_edge = tuple(
+            tuple(
+                float(getattr(region, attr).get())
+                for attr in ("Estart", "Estep", "TimeFactor")
+            )
+            for region in [
+                getattr(self.pre_edge, f"region{i+1}")
+                for i in range(self.pre_edge.num_regions.get())
+            ]
+        )
+        edge = tuple(
+            float(getattr(self.edge, attr).get())
+            for attr in ("Estart", "Eend", "Estep", "TimeFactor")
+        )
+        post_edge = tuple(
+            tuple(
+                float(getattr(region, attr).get())
+                for attr in ("Kend", "Kstep", "TimeFactor")
+            )
+            for region in [
+                getattr(self.post_edge, f"region{i+1}")
+                for i in range(self.post_edge.num_regions.get())
+            ]
+        )
+        return pre_edge, edge, post_edge
 
-        print('\nNumber of points: {}'.format(len(elist)))
-        print('Final relative energy: {:0.3f} eV'.format(max(elist)*1000.))
+    def _create_positions_list(self):
+        elist, factorlist = energy_grid(*self._regions_params())
 
-        elist.reverse()
-        factorlist.reverse()
+        print('\nNumber of points: {}'.format(elist.size))
+        print('Final relative energy: {:0.3f} eV'.format(elist.max()*1000.))
 
         self.energy_list.put(elist)
         self.factor_list.put(factorlist)
 
-    def _read_params_dict(self, input):
+        self._write_cache()
+
+    def _read_params_dict(self, input, write_cache=True):
         """
         Read an dictionary that contains the qxscan setup parameters.
 
@@ -290,6 +362,8 @@ class QxscanParams(Device):
         post_edge regions!). For instance:
         - input['edge']['Estart'] is passed to self.edge.Estart
         - output['energy_list'] is passed to self.energy_list
+        write_cache: boolean, optional
+        If True, the parameters are also saved in the local cache.
 
         Returns
         -----------
@@ -319,6 +393,9 @@ class QxscanParams(Device):
             region.Kstep.put(input['post_edge'][reg_key]['Kstep'])
             region.TimeFactor.put(input['post_edge'][reg_key]['TimeFactor'])
 
+        if write_cache:
+            self._write_cache()
+
     def _make_params_dict(self):
         """
         Create an dictionary that contains the qxscan setup parameters.
@@ -383,7 +460,7 @@ class QxscanParams(Device):
         """
         output = self._make_params_dict()
         with open(fname, 'w') as f:
-            f.write(json.dumps(output))
+            f.write(json.dumps(output, default=_json_default))
 
     def load_params_json(self, fname):
         """
@@ -404,6 +481,104 @@ class QxscanParams(Device):
         input = json.load(open(fname, 'r'))
         self._read_params_dict(input)
 
+    def _write_cache(self, fname=QXSCAN_CACHE):
+        """ Save the current parameters into the local cache file. """
+        output = dict(time=time(), params=self._make_params_dict())
+        try:
+            with open(fname, 'w') as f:
+                f.write(json.dumps(output, default=_json_default))
+        except OSError as exc:
+            logger.warning(f"Could not write the qxscan cache: {exc}")
+
+    def load_from_cache(self, fname=QXSCAN_CACHE):
+        """
+        Load the parameters saved in the local cache file.
+
+        Parameters
+        -----------
+        fname: string, optional
+        Location of the cache file.
+
+        Returns
+        -----------
+        cache_time: float or None
+        Time (as in time.time()) when the cache was written, None if the cache
+        could not be loaded.
+        """
+        try:
+            with open(fname, 'r') as f:
+                cache = json.load(f)
+            self._read_params_dict(cache['params'], write_cache=False)
+        except (OSError, KeyError, ValueError) as exc:
+            logger.info(f"Could not load the qxscan cache: {exc}")
+            return None
+        return cache['time']
+
+    def _recorded_in(self, run):
+        """ If the baseline of `run` has the qxscan parameters. """
+        try:
+            descriptors = run['baseline'].metadata['descriptors']
+        except KeyError:
+            return False
+        return any(
+            self.energy_list.name in descriptor['data_keys']
+            for descriptor in descriptors
+        )
+
+    def _cache_on_stop(self, name, doc):
+        """ RunEngine callback, saves the parameters used by the run. """
+        self._write_cache()
+
+    def restore_params(self):
+        """
+        Restore the parameters used in the last session from the local cache.
+
+        The cache is written at the end of each run, so it has the parameters
+        of the last run. The catalog is not read here, so that the startup
+        does not wait for it, use `load_from_catalog` if the cache is missing
+        or out of date (for instance after a crash).
+
+        Returns
+        -----------
+        None
+        """
+        if self.load_from_cache() is None:
+            logger.warning(
+                "The qxscan parameters were not restored, use "
+                "qxscan_params.load_from_catalog() to load the last ones."
+            )
+
+    def load_from_catalog(self, cat=cat, lookback=10):
+        """
+        Load the parameters of the last run that recorded them.
+
+        Parameters
+        -----------
+        cat: databroker catalog, optional
+        Catalog to search.
+        lookback: int, optional
+        Maximum number of runs to check, starting from the last one.
+
+        Returns
+        -----------
+        uid: str or None
+        Uid of the run that was loaded, None if none had the parameters.
+        """
+        for index in range(-1, -lookback - 1, -1):
+            try:
+                run = cat[index]
+            except IndexError:
+                break
+            if self._recorded_in(run):
+                self.load_from_scan(index, cat=cat)
+                uid = run.metadata['start']['uid']
+                logger.info(f"qxscan parameters loaded from scan {uid}.")
+                return uid
+        logger.warning(
+            f"None of the last {lookback} runs has the qxscan parameters."
+        )
+        return None
+
     def load_from_scan(self, scan, cat=cat):
 
         baseline = cat[scan].baseline.read()
@@ -427,6 +602,9 @@ class QxscanParams(Device):
                 ).component_names:
                     _update_value(item + f".region{i}.{component}")
 
+        self._write_cache()
+
 
 qxscan_params = QxscanParams(name='qxscan_setup')
 sd.baseline.append(qxscan_params)
+RE.subscribe(qxscan_params._cache_on_stop, 'stop')
@@ -7,7 +7,7 @@ __all__ = ['ruby']
 from ophyd import (
     Component, Device, EpicsMotor, EpicsSignal, FormattedComponent
 )
-from ..framework import sd
+from ._lazy import LazyDevice
 from apstools.devices import PVPositionerSoftDoneWithStop
 from ..session_logs import logger
 logger.info(__file__)
@@ -45,5 +45,4 @@ class RubyDevice(Device):
     laser = FormattedComponent(DAC, '4idd:DAC1_2', labels=('ruby',))
 
 
-ruby = RubyDevice('4iddx:', name='ruby')
-sd.baseline.append(ruby)
+ruby = LazyDevice(RubyDevice, '4iddx:', name='ruby')
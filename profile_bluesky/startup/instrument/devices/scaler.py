@@ -8,6 +8,7 @@ __all__ = ['scalerd', 'scalerb']
 from ophyd.scaler import ScalerCH
 from ophyd.signal import Signal
 from ..framework import sd
+from ._preset_schedule import PresetScheduleMixin
 from ophyd import Kind, Component
 import time
 
@@ -85,7 +86,7 @@ class PresetMonitorSignal(Signal):
                        value=value, **md_for_callback)
 
 
-class LocalScalerCH(ScalerCH):
+class LocalScalerCH(PresetScheduleMixin, ScalerCH):
 
     preset_time = None
     preset_monitor = Component(PresetMonitorSignal, kind=Kind.config)
@@ -5,7 +5,7 @@ SRS 810 Lock-in
 __all__ = ['lockin']
 
 from ophyd import Component, Device, EpicsSignal, EpicsSignalRO
-from ..framework import sd
+from ._lazy import LazyDevice
 from ..session_logs import logger
 logger.info(__file__)
 
@@ -40,5 +40,5 @@ class LockinDevice(Device):
     chan1_q = Component(EpicsSignalRO, 'Th.SVAL', kind='hinted')
 
 
-lockin = LockinDevice('4idd:SRS810:1:', name='lockin', labels=('detectors',))
-sd.baseline.append(lockin)
+lockin = LazyDevice(LockinDevice, '4idd:SRS810:1:', name='lockin',
+                    labels=('detectors',))
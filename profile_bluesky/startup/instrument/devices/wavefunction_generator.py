@@ -5,7 +5,7 @@ Wavefunction generator.
 __all__ = ['wavefunc_gen']
 
 from ophyd import Device, EpicsSignal, Component
-from ..framework import sd
+from ._lazy import LazyDevice
 from ..session_logs import logger
 logger.info(__file__)
 
@@ -25,6 +25,6 @@ class SRS340(Device):
                          kind='config')
 
 
-wavefunc_gen = SRS340('4idd:SRS340:1:', name='wavefunction_generator',
-                      labels=('phase retarders',))
-sd.baseline.append(wavefunc_gen)
+wavefunc_gen = LazyDevice(SRS340, '4idd:SRS340:1:',
+                          name='wavefunction_generator',
+                          labels=('phase retarders',))
@@ -6,6 +6,7 @@ from ophyd.status import AndStatus, Status
 from ophyd.signal import SignalRO
 from collections import OrderedDict
 from ..framework import sd
+from ._preset_schedule import PresetScheduleMixin
 
 from ..session_logs import logger
 logger.info(__file__)
@@ -237,7 +238,7 @@ def _totals(attr_fix, id_range):
     return defn
 
 
-class Xspress3VortexBase(Device):
+class Xspress3VortexBase(PresetScheduleMixin, Device):
 
     # Total corrected counts of each ROI
     corrected_counts = DynamicDeviceComponent(_totals('roi', range(1, 33)))
@@ -258,6 +259,10 @@ class Xspress3VortexBase(Device):
     NumImages = Component(EpicsSignal, 'det1:NumImages', kind='config')
     TriggerMode = Component(EpicsSignal, 'det1:TriggerMode', kind='config')
 
+    # Status of the last acquisition, without the readout of the channels.
+    # Used by pipelined step scans (see `PipelinedStep`).
+    acquisition_status = None
+
     # TriggerMode, 1:internal, 3: TTL veto only
     # AcquireMode = 'step'  #step: trigger once and read roi pvs only, frame:
 
@@ -394,6 +399,7 @@ class Xspress3VortexBase(Device):
 
         # Click the Acquire_button
         button_status = super().trigger()
+        self.acquisition_status = button_status
 
         return AndStatus(state_status, button_status)
 
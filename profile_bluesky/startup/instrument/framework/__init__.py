@@ -7,6 +7,9 @@ from .check_python import *
 from .check_bluesky import *
 
 from .initialize import *
+from .baseline import *
+from .document_sink import *
+from .journal import *
 # from .user_dir import *
 from .metadata import *
 from .callbacks import *
@@ -0,0 +1,190 @@
+"""
+Baseline readings taken concurrently.
+"""
+
+__all__ = ['LocalSupplementalData']
+
+from asyncio import wrap_future
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from bluesky import SupplementalData
+from bluesky.preprocessors import (
+    fly_during_wrapper, monitor_during_wrapper, plan_mutator,
+    rewindable_wrapper
+)
+from bluesky.utils import Msg, all_safe_rewind, separate_devices, short_uid
+from ophyd import Signal
+from ophyd.device import BlueskyInterface
+from ophyd.signal import EpicsSignalBase
+
+from ..session_logs import logger
+logger.info(__file__)
+
+# Number of devices read at the same time.
+MAX_WORKERS = 16
+
+
+def _has_trigger(obj):
+    """ If `obj` does more than the default (no-op) trigger. """
+    trigger = getattr(type(obj), 'trigger', None)
+    return trigger not in (None, BlueskyInterface.trigger, Signal.trigger)
+
+
+def _needs_fetch(obj):
+    """ If reading `obj` makes channel access requests. """
+    if isinstance(obj, Signal):
+        signals = [obj]
+    else:
+        signals = [
+            walk.item for walk in obj.walk_signals(include_lazy=False)
+        ]
+    return any(
+        isinstance(sig, EpicsSignalBase) and not sig._auto_monitor
+        for sig in signals
+    )
+
+
+class _Snapshot:
+    """
+    Stands in for a baseline device, with a reading taken beforehand.
+
+    The RunEngine reads it as it would read the device, so the documents
+    are the same, but the reading comes from the last `update`.
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.parent = None
+        self.fetch = _needs_fetch(device)
+        self.reading = None
+        self.configuration = None
+
+    @property
+    def name(self):
+        return self.device.name
+
+    @property
+    def hints(self):
+        return getattr(self.device, 'hints', {})
+
+    def update(self):
+        self.reading = self.device.read()
+        self.configuration = self.device.read_configuration()
+
+    def read(self):
+        return self.reading
+
+    def describe(self):
+        return self.device.describe()
+
+    def read_configuration(self):
+        return self.configuration
+
+    def describe_configuration(self):
+        return self.device.describe_configuration()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.device!r})"
+
+
+class LocalSupplementalData(SupplementalData):
+    """
+    SupplementalData with faster baseline readings.
+
+    Bluesky triggers and reads the baseline devices one at a time. Here,
+    the devices that are not monitored (`auto_monitor=False`) are read
+    concurrently in a thread pool, and the monitored ones are served from
+    their cache. Only the devices that implement `trigger` are triggered.
+    The `baseline` stream has the same data and configuration as before.
+
+    See `bluesky.SupplementalData` for the parameters.
+    """
+
+    def __init__(self, *args, max_workers=MAX_WORKERS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._snapshots = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='baseline'
+        )
+
+    def _snapshot(self, device):
+        # The same object has to be read at the start and end of a run.
+        if device not in self._snapshots:
+            self._snapshots[device] = _Snapshot(device)
+        return self._snapshots[device]
+
+    def read_baseline(self, devices, name='baseline'):
+        """
+        Read `devices` into one event, like `trigger_and_read`.
+
+        Parameters
+        ----------
+        devices : iterable
+            Devices to read.
+        name : str, optional
+            Stream name, defaults to 'baseline'.
+        """
+        devices = separate_devices(devices)
+
+        def _inner_read():
+            triggered = [obj for obj in devices if _has_trigger(obj)]
+            if len(triggered) > 0:
+                group = short_uid('trigger')
+                for obj in triggered:
+                    yield Msg('trigger', obj, group=group)
+                yield Msg('wait', None, group=group)
+
+            snapshots = [self._snapshot(obj) for obj in devices]
+            futures = [
+                self._executor.submit(snap.update)
+                for snap in snapshots if snap.fetch
+            ]
+            for snap in snapshots:
+                if not snap.fetch:
+                    snap.update()
+            if len(futures) > 0:
+                yield Msg('wait_for', None,
+                          [partial(wrap_future, fut) for fut in futures])
+                for fut in futures:
+                    # Raises the errors of the reads.
+                    fut.result()
+
+            yield Msg('create', name=name)
+            ret = {}
+            for snap in snapshots:
+                reading = yield Msg('read', snap)
+                if reading is not None:
+                    ret.update(reading)
+            yield Msg('save')
+            return ret
+
+        return (yield from rewindable_wrapper(_inner_read(),
+                                              all_safe_rewind(devices)))
+
+    def _baseline_wrapper(self, plan, devices, name='baseline'):
+        """ Same as `bluesky.preprocessors.baseline_wrapper`. """
+        def insert_baseline(msg):
+            if msg.command == 'open_run':
+                return None, self.read_baseline(devices, name=name)
+
+            elif msg.command == 'close_run':
+                def post_baseline():
+                    yield from self.read_baseline(devices, name=name)
+                    return (yield msg)
+
+                return post_baseline(), None
+
+            return None, None
+
+        if not devices:
+            return (yield from plan)
+        else:
+            return (yield from plan_mutator(plan, insert_baseline))
+
+    def __call__(self, plan):
+        plan = fly_during_wrapper(plan, self.flyers)
+        plan = monitor_during_wrapper(plan, self.monitors)
+        # A device added to the baseline during the run would only be in
+        # the closing reading.
+        plan = self._baseline_wrapper(plan, list(self.baseline))
+        return (yield from plan)
@@ -0,0 +1,164 @@
+"""
+Benchmarks of the framework callbacks.
+
+Not imported into the session, use for instance:
+`from instrument.framework.benchmarks import document_sink_benchmark`
+"""
+
+__all__ = ['baseline_benchmark', 'document_sink_benchmark']
+
+from bluesky.utils import separate_devices
+from concurrent.futures import ThreadPoolExecutor
+from event_model import NumpyEncoder, compose_run
+from functools import partial
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import monotonic, sleep
+import json
+from pyRestTable import Table
+from .baseline import MAX_WORKERS, _Snapshot
+from .document_sink import BATCH_SIZE, BufferedDocumentSink
+
+from ..session_logs import logger
+logger.info(__file__)
+
+
+def document_sink_benchmark(num=1000, insert_time=0.002, batch_size=None):
+    """
+    Time inserting `num` events directly and through BufferedDocumentSink.
+
+    The database is replaced by a JSONL file, and every insert call waits
+    `insert_time` seconds to emulate the round trip to the server.
+
+    Parameters
+    ----------
+    num : int, optional
+        Number of event documents.
+    insert_time : float, optional
+        Seconds taken by each insert call.
+    batch_size : int, optional
+        Events per event_page, defaults to `BATCH_SIZE`.
+
+    Returns
+    -------
+    result : dict
+        The "direct" and "buffered" results, each with the time that the
+        RunEngine spends in the callback, the average per document
+        ("callback") and the maximum ("callback_max", the stop document
+        waits for the inserts), and the total time until everything was
+        written ("total"), in seconds.
+    """
+    def _documents():
+        run = compose_run()
+        yield 'start', run.start_doc
+        descriptor = run.compose_descriptor(
+            name='primary',
+            data_keys={'x': dict(source='sim', dtype='number', shape=[])}
+        )
+        yield 'descriptor', descriptor.descriptor_doc
+        for i in range(num):
+            yield 'event', descriptor.compose_event(
+                data={'x': i}, timestamps={'x': 0}, seq_num=i+1
+            )
+        yield 'stop', run.compose_stop()
+
+    def _time(callback):
+        times = []
+        t0 = monotonic()
+        for name, doc in _documents():
+            t1 = monotonic()
+            callback(name, doc)
+            times.append(monotonic() - t1)
+        return dict(callback=sum(times)/len(times),
+                    callback_max=max(times),
+                    total=monotonic() - t0)
+
+    with TemporaryDirectory() as folder:
+        with open(join(folder, "db.jsonl"), "w") as stream:
+            def _insert(name, doc):
+                sleep(insert_time)
+                stream.write(json.dumps([name, doc], cls=NumpyEncoder) + "\n")
+
+            result = dict(direct=_time(_insert))
+            sink = BufferedDocumentSink(
+                _insert, folder, batch_size=batch_size or BATCH_SIZE
+            )
+            result['buffered'] = _time(sink)
+
+    table = Table()
+    table.labels = ("insert", "callback (ms)", "max callback (ms)",
+                    "total (s)")
+    for key, item in result.items():
+        table.addRow((key, f"{item['callback']*1e3:0.3f}",
+                      f"{item['callback_max']*1e3:0.3f}",
+                      f"{item['total']:0.3f}"))
+    print(table)
+
+    return result
+
+
+def baseline_benchmark(devices, repeat=3, max_workers=MAX_WORKERS,
+                       printing=True):
+    """
+    Time the baseline readings, one device at a time and concurrently.
+
+    Runs without the RunEngine, so it only measures the reads. Use it with
+    the simulated IOCs, or the beamline, to check the gain.
+
+    Parameters
+    ----------
+    devices : iterable
+        Devices to read, usually `sd.baseline`.
+    repeat : int, optional
+        Number of times each method is timed, the fastest is kept.
+    max_workers : int, optional
+        Size of the thread pool.
+    printing : boolean, optional
+        If True, prints a table with the results.
+
+    Returns
+    -------
+    result : dict
+        Time in seconds of the "sequential" and "concurrent" reads.
+    """
+    devices = separate_devices(devices)
+    snapshots = [_Snapshot(obj) for obj in devices]
+
+    def _sequential():
+        for snap in snapshots:
+            snap.update()
+
+    def _concurrent(executor):
+        futures = [
+            executor.submit(snap.update) for snap in snapshots if snap.fetch
+        ]
+        for snap in snapshots:
+            if not snap.fetch:
+                snap.update()
+        for fut in futures:
+            fut.result()
+
+    def _best(func):
+        times = []
+        for _ in range(repeat):
+            t0 = monotonic()
+            func()
+            times.append(monotonic() - t0)
+        return min(times)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        result = dict(
+            sequential=_best(_sequential),
+            concurrent=_best(partial(_concurrent, executor)),
+        )
+
+    if printing:
+        table = Table()
+        table.labels = ("baseline read", "time (s)")
+        table.addRow(("one at a time", f"{result['sequential']:0.3f}"))
+        table.addRow(("concurrent", f"{result['concurrent']:0.3f}"))
+        print(table)
+        print(f"{len(devices)} devices, "
+              f"{sum(snap.fetch for snap in snapshots)} not monitored.")
+
+    return result
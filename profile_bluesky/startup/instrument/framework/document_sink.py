@@ -0,0 +1,200 @@
+"""
+Insert the documents into the database from a background thread.
+"""
+
+__all__ = ['BufferedDocumentSink']
+
+from event_model import NumpyEncoder, pack_event_page
+from os import makedirs
+from os.path import join
+from queue import Queue, Empty
+from threading import Event, Thread
+from time import monotonic
+import json
+
+from ..session_logs import logger
+logger.info(__file__)
+
+# Default size of the queue, in documents.
+MAXSIZE = 10000
+
+# Default number of events inserted at once, as one event_page.
+BATCH_SIZE = 100
+
+# Seconds that events wait for more events before being inserted.
+FLUSH_INTERVAL = 0.5
+
+
+class BufferedDocumentSink:
+    """
+    RunEngine callback that inserts the documents from a background thread.
+
+    The RunEngine only puts the documents in a queue, so a slow database does
+    not slow the scan down. The queue is bounded (`maxsize`), so if the
+    database cannot keep up, the RunEngine waits for room in the queue
+    instead of using all the memory.
+
+    The events of each descriptor are packed into one `event_page` every
+    `batch_size` events, or after `flush_interval` seconds. All the pending
+    documents are inserted when the `stop` document arrives, before the
+    RunEngine moves on.
+
+    If an insert fails, that document and all the remaining documents of the
+    run are written to `<spill_dir>/<start uid>.jsonl` instead, and the
+    database is tried again at the next run.
+
+    Parameters
+    ----------
+    insert : callable
+        Called as `insert(name, doc)`, for instance `cat.v1.insert`.
+    spill_dir : str
+        Folder of the spill files.
+    maxsize : int, optional
+        Maximum number of documents in the queue.
+    batch_size : int, optional
+        Maximum number of events in one event_page.
+    flush_interval : float, optional
+        Maximum seconds that an event waits for the rest of its page.
+    stop_timeout : float, optional
+        Maximum seconds that the `stop` document waits for the inserts.
+    pages : boolean, optional
+        If True, the events are inserted as event_page documents, otherwise
+        they are inserted one by one (still from the background thread).
+    """
+
+    def __init__(self, insert, spill_dir, *, maxsize=MAXSIZE,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 stop_timeout=60, pages=True):
+        self.insert = insert
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stop_timeout = stop_timeout
+        self.pages = pages
+
+        self.inserted = 0
+        self.spilled = 0
+        self.max_depth = 0
+
+        self._queue = Queue(maxsize=maxsize)
+        self._pending = {}
+        self._oldest = None
+        self._run_uid = None
+        self._spill_file = None
+        self._flushed = Event()
+        self._flushed.set()
+
+        self._thread = Thread(target=self._worker, daemon=True,
+                              name='document_sink')
+        self._thread.start()
+
+    def __call__(self, name, doc):
+        # Blocks if the queue is full.
+        self._queue.put((name, doc))
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        if name == 'stop':
+            self.flush(self.stop_timeout)
+
+    def flush(self, timeout=None):
+        """
+        Wait until all the queued documents are inserted (or spilled).
+
+        Returns False if it timed out.
+        """
+        self._flushed.clear()
+        self._queue.put(('_flush', None))
+        if not self._flushed.wait(timeout):
+            logger.warning(f"The documents were not inserted in {timeout} s, "
+                           "they are still queued.")
+            return False
+        return True
+
+    @property
+    def depth(self):
+        """ Number of documents in the queue. """
+        return self._queue.qsize()
+
+    def _worker(self):
+        while True:
+            try:
+                self._process()
+            except Exception as exc:
+                # The thread must keep emptying the queue.
+                logger.exception(f"Document sink error: {exc}")
+
+    def _process(self):
+        try:
+            name, doc = self._queue.get(timeout=self.flush_interval)
+        except Empty:
+            self._insert_pending()
+            return
+
+        try:
+            if name == '_flush':
+                self._insert_pending()
+            elif name == 'event':
+                self._add_event(doc)
+            else:
+                if name in ('stop', 'event_page'):
+                    self._insert_pending()
+                self._insert(name, doc)
+
+            if (self._oldest is not None and
+                    monotonic() - self._oldest > self.flush_interval):
+                self._insert_pending()
+        finally:
+            if name == '_flush':
+                self._flushed.set()
+
+    def _add_event(self, doc):
+        if not self.pages:
+            self._insert('event', doc)
+            return
+
+        self._pending.setdefault(doc['descriptor'], []).append(doc)
+        if self._oldest is None:
+            self._oldest = monotonic()
+        if len(self._pending[doc['descriptor']]) >= self.batch_size:
+            self._insert_pending()
+
+    def _insert_pending(self):
+        pending, self._pending = self._pending, {}
+        self._oldest = None
+        for events in pending.values():
+            self._insert('event_page', pack_event_page(*events),
+                         count=len(events))
+
+    def _insert(self, name, doc, count=1):
+        if name == 'start':
+            self._close_spill()
+            self._run_uid = doc['uid']
+
+        if self._spill_file is None:
+            try:
+                self.insert(name, doc)
+                self.inserted += count
+            except Exception as exc:
+                logger.error(f"Could not insert the {name} document ({exc}),"
+                             " the rest of the run goes to the spill file.")
+                self._open_spill()
+
+        if self._spill_file is not None:
+            self._spill_file.write(
+                json.dumps([name, doc], cls=NumpyEncoder) + "\n"
+            )
+            self._spill_file.flush()
+            self.spilled += count
+
+        if name == 'stop':
+            self._close_spill()
+
+    def _open_spill(self):
+        makedirs(self.spill_dir, exist_ok=True)
+        fname = join(self.spill_dir, f"{self._run_uid}.jsonl")
+        self._spill_file = open(fname, "a")
+        logger.warning(f"Writing documents to {fname}.")
+
+    def _close_spill(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
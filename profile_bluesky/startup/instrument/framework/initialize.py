@@ -9,6 +9,8 @@ __all__ = [
     "bps",
     "callback_db",
     "cat",
+    "document_sink",
+    "journal",
     "np",
     "peaks",
     "RE",
@@ -17,7 +19,6 @@ __all__ = [
 ]
 
 from bluesky import RunEngine
-from bluesky import SupplementalData
 from bluesky.callbacks.best_effort import BestEffortCallback
 # from bluesky.callbacks.broker import verify_files_saved
 # Will use local magics now, which have to be loaded in the collections file.
@@ -40,6 +41,9 @@ import numpy as np
 # This already setup the handlers
 from polartools.load_data import load_catalog
 
+from .baseline import LocalSupplementalData
+from .document_sink import BufferedDocumentSink
+from .journal import DocumentJournal
 from ..session_logs import logger
 logger.info(__file__)
 
@@ -56,12 +60,26 @@ callback_db = {}
 # db = databroker.catalog["mongodb_config"]
 cat = load_catalog("4id_polar")
 
+# Keep a local copy of all documents, see replay_journal. The copies are
+# deleted a week after the run is in the catalog.
+journal = DocumentJournal(
+    os.path.join(os.environ["HOME"], ".config", "Bluesky_journal"),
+    catalog=cat
+)
+callback_db["journal"] = RE.subscribe(journal)
+
 # Subscribe metadatastore to documents.
 # If this is removed, data is not saved to metadatastore.
-callback_db["db"] = RE.subscribe(cat.v1.insert)
+# The documents are inserted from a background thread, and go to the spill
+# folder if the database cannot be reached.
+document_sink = BufferedDocumentSink(
+    cat.v1.insert,
+    os.path.join(os.environ["HOME"], ".config", "Bluesky_spill")
+)
+callback_db["db"] = RE.subscribe(document_sink)
 
-# Set up SupplementalData.
-sd = SupplementalData()
+# Set up SupplementalData, reading the baseline concurrently.
+sd = LocalSupplementalData()
 RE.preprocessors.append(sd)
 
 # Add a progress bar.
@@ -0,0 +1,294 @@
+"""
+Local journal of the RunEngine documents, and its replay into the catalog.
+"""
+
+__all__ = ['DocumentJournal', 'replay_journal']
+
+from event_model import NumpyEncoder, unpack_event_page
+from glob import glob
+from os import fsync, makedirs, remove
+from os.path import basename, getmtime, isdir, join, splitext
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from queue import Queue, Empty
+from threading import Event, Thread
+from time import monotonic, time
+import json
+
+from ..session_logs import logger
+logger.info(__file__)
+
+# Documents written between fsync calls.
+FSYNC_EVERY = 100
+
+# Maximum seconds between fsync calls.
+FSYNC_INTERVAL = 1.0
+
+# Default size of the queue, in documents.
+MAXSIZE = 10000
+
+# Days that the journal of a run is kept after it is in the catalog.
+RETENTION = 7
+
+
+class DocumentJournal:
+    """
+    RunEngine callback that appends every document to a local file.
+
+    Each run goes to `<folder>/<start uid>.jsonl`, one `[name, doc]` JSON
+    list per line. The RunEngine only puts the documents in a bounded queue,
+    a background thread writes them and syncs the file to disk every
+    `fsync_every` documents, every `fsync_interval` seconds, and at the end
+    of the run, so that a crash loses at most the last batch. Use
+    `replay_journal` to insert the runs into the catalog.
+
+    After each run, the files older than `retention` days are deleted if
+    their run is in the `catalog` with its stop document (see `prune`). The
+    runs that are not in the catalog are always kept.
+
+    Errors writing the journal are logged, they never stop the scan.
+
+    Parameters
+    ----------
+    folder : str
+        Folder of the journal files.
+    catalog : databroker catalog, optional
+        Catalog used to confirm the runs before deleting their files. If
+        None, the files are never deleted.
+    retention : float, optional
+        Days that a file is kept after its run is in the catalog.
+    fsync_every : int, optional
+        Maximum number of documents between fsync calls.
+    fsync_interval : float, optional
+        Maximum seconds between fsync calls.
+    maxsize : int, optional
+        Maximum number of documents in the queue.
+    """
+
+    def __init__(self, folder, catalog=None, retention=RETENTION,
+                 fsync_every=FSYNC_EVERY, fsync_interval=FSYNC_INTERVAL,
+                 maxsize=MAXSIZE):
+        self.folder = folder
+        self.catalog = catalog
+        self.retention = retention
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = monotonic()
+
+        self._queue = Queue(maxsize=maxsize)
+        self._flushed = Event()
+        self._flushed.set()
+        self._thread = Thread(target=self._worker, daemon=True,
+                              name='document_journal')
+        self._thread.start()
+
+    @property
+    def path(self):
+        """ File of the current run, None between runs. """
+        return self._file.name if self._file is not None else None
+
+    def __call__(self, name, doc):
+        # Blocks if the queue is full.
+        self._queue.put((name, doc))
+
+    def flush(self, timeout=None):
+        """
+        Wait until all the queued documents are written and synced.
+
+        Returns False if it timed out.
+        """
+        self._flushed.clear()
+        self._queue.put(('_flush', None))
+        return self._flushed.wait(timeout)
+
+    def prune(self):
+        """
+        Delete the files older than `retention` days of the runs that are in
+        the catalog, with their stop document.
+
+        Returns
+        -------
+        deleted : list
+            Deleted files.
+        """
+        if self.catalog is None:
+            return []
+
+        deleted = []
+        oldest = time() - self.retention*24*3600
+        for path in sorted(glob(join(self.folder, "*.jsonl"))):
+            if path == self.path or getmtime(path) > oldest:
+                continue
+            uid = splitext(basename(path))[0]
+            if _finished_in(self.catalog, uid):
+                remove(path)
+                deleted.append(path)
+            else:
+                logger.warning(f"{path} is not in the catalog, use "
+                               "replay_journal to insert it.")
+        if len(deleted) > 0:
+            logger.info(f"Deleted {len(deleted)} journal files already in "
+                        "the catalog.")
+        return deleted
+
+    def _worker(self):
+        while True:
+            try:
+                name, doc = self._queue.get(timeout=self.fsync_interval)
+            except Empty:
+                name, doc = None, None
+
+            try:
+                self._process(name, doc)
+            except Exception as exc:
+                logger.error(f"Could not write the {name} document to the "
+                             f"journal: {exc}")
+            finally:
+                if name == '_flush':
+                    self._flushed.set()
+
+    def _process(self, name, doc):
+        if name is None or name == '_flush':
+            if self._file is not None and self._unsynced > 0:
+                self._sync()
+            return
+
+        if name == 'start':
+            self._open(doc['uid'])
+        if self._file is None:
+            return
+        self._file.write(json.dumps([name, doc], cls=NumpyEncoder) + "\n")
+        self._unsynced += 1
+        if name == 'stop':
+            self._close()
+            try:
+                self.prune()
+            except Exception as exc:
+                logger.error(f"Could not prune the journal: {exc}")
+        elif (self._unsynced >= self.fsync_every or
+                monotonic() - self._last_sync > self.fsync_interval):
+            self._sync()
+
+    def _open(self, uid):
+        self._close()
+        makedirs(self.folder, exist_ok=True)
+        self._file = open(join(self.folder, f"{uid}.jsonl"), "a")
+
+    def _sync(self):
+        self._file.flush()
+        fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = monotonic()
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._sync()
+            finally:
+                self._file.close()
+                self._file = None
+
+
+def _read_journal(path):
+    """ Documents of one journal file, ignores a truncated last line. """
+    documents = []
+    with open(path) as fid:
+        lines = fid.readlines()
+    for index, line in enumerate(lines):
+        try:
+            name, doc = json.loads(line)
+        except ValueError:
+            if index == len(lines) - 1:
+                logger.warning(f"{path}: ignoring the incomplete last line.")
+                break
+            raise
+        documents.append((name, doc))
+    return documents
+
+
+def _finished_in(catalog, uid):
+    """ If the run is in the catalog, with its stop document. """
+    try:
+        return catalog[uid].metadata['stop'] is not None
+    except KeyError:
+        return False
+
+
+def _insert_new(insert, name, doc):
+    """
+    Insert the document, skipping it if its uid is already there.
+
+    Returns the number of documents inserted.
+    """
+    try:
+        insert(name, doc)
+        return len(doc['uid']) if name == 'event_page' else 1
+    except (DuplicateKeyError, BulkWriteError):
+        pass
+
+    # Some of the page may be there already.
+    if name == 'event_page':
+        return sum(
+            _insert_new(insert, 'event', event)
+            for event in unpack_event_page(doc)
+        )
+    return 0
+
+
+def replay_journal(paths, catalog=None, insert=None):
+    """
+    Insert the journaled runs into the catalog.
+
+    Runs that are already in the catalog with a stop document are skipped.
+    Otherwise, each document is inserted unless a document with the same
+    uid is there, so a run can be replayed again safely, for instance after
+    it was partially inserted.
+
+    Parameters
+    ----------
+    paths : str or iterable
+        Journal files, glob patterns, or folders (all their `.jsonl` files).
+        Also accepts the `BufferedDocumentSink` spill files.
+    catalog : databroker catalog, optional
+        Defaults to `cat`.
+    insert : callable, optional
+        Called as `insert(name, doc)`, defaults to `catalog.v1.insert`.
+
+    Returns
+    -------
+    result : dict
+        Maps each file to the number of documents inserted, or to None if
+        the run was skipped.
+    """
+    if catalog is None:
+        from .initialize import cat as catalog
+    if insert is None:
+        insert = catalog.v1.insert
+    if isinstance(paths, str):
+        paths = [paths]
+
+    files = []
+    for path in paths:
+        if isdir(path):
+            files.extend(sorted(glob(join(path, "*.jsonl"))))
+        else:
+            files.extend(sorted(glob(path)))
+
+    result = {}
+    for path in files:
+        documents = _read_journal(path)
+        starts = [doc['uid'] for name, doc in documents if name == 'start']
+        if len(starts) > 0 and _finished_in(catalog, starts[0]):
+            logger.info(f"{path}: run {starts[0]} is already in the catalog.")
+            result[path] = None
+            continue
+
+        result[path] = sum(
+            _insert_new(insert, name, doc) for name, doc in documents
+        )
+        logger.info(f"{path}: inserted {result[path]} of {len(documents)} "
+                    "documents.")
+
+    return result
@@ -5,4 +5,10 @@ local, custom Bluesky plans (scans) and other functions
 
 from .local_scans import *
 from .center_maximum import *
+from .fly_scans import *
+from .adaptive_scans import *
+from .adaptive_counting import *
+from .grid_optimizer import *
+from .field_series import *
+from .temperature_ramp import *
 from .open_shutter import shopen, shclose
@@ -0,0 +1,217 @@
+"""
+Scaler counting until a target statistical error is reached.
+"""
+
+__all__ = ['AdaptiveCounting']
+
+from bluesky.plan_stubs import mv, trigger_and_read
+from bluesky.utils import Msg, short_uid
+from ophyd import Signal
+from numbers import Number
+from ..devices import scalerd
+
+from ..session_logs import logger
+logger.info(__file__)
+
+# Maximum number of top-up counts in one reading.
+MAX_COUNTS = 5
+
+
+class AdaptiveCounting:
+    """
+    Counts each reading until detector/monitor has a target relative error.
+
+    With Poisson statistics the relative error of D/M is sqrt(1/D + 1/M), or
+    sqrt(1/D) if there is no monitor. The preset of each count is predicted
+    from the count rates of the previous reading, so most readings need a
+    single count. If the error is still too
+    large, the scaler counts again for the missing time (or monitor counts)
+    and the readings are added.
+
+    It works both when the scaler counts time and when it counts to a monitor
+    channel (see `LocalScalerCH.monitor`). Only the scaler is adapted, other
+    detectors keep their own count time.
+
+    Parameters
+    ----------
+    target_error : float
+        Relative error of detector/monitor, e.g. 0.001.
+    max_time : float, optional
+        Maximum count time of one reading in seconds.
+    min_time : float, optional
+        Minimum count time of one reading in seconds.
+    scaler : LocalScalerCH, optional
+        Defaults to `scalerd`.
+    detector, monitor : str, optional
+        Scaler channel names, they must be read by the scaler. The detector
+        defaults to the first plotted channel that is not the monitor (see
+        `counters`). The monitor defaults to the scaler monitor if it counts
+        to a monitor, and to None (only the detector error) if it counts
+        time.
+    """
+
+    def __init__(self, target_error, max_time=10, min_time=0.1,
+                 scaler=scalerd, detector=None, monitor=None):
+        if target_error <= 0:
+            raise ValueError("target_error has to be > 0.")
+        if not 0 < min_time <= max_time:
+            raise ValueError("The times must be 0 < min_time <= max_time.")
+
+        self.target_error = target_error
+        self.max_time = max_time
+        self.min_time = min_time
+        self.scaler = scaler
+
+        self.time_mode = scaler._monitor is scaler.channels.chan01
+        clock = scaler.channels.chan01.s.name
+        if monitor is None and not self.time_mode:
+            monitor = scaler.monitor
+        if detector is None:
+            detector = next((
+                field for field in scaler.hints['fields']
+                if field not in (clock, monitor)
+            ), None)
+        self._check_channels(scaler, detector, monitor)
+        self.detector = detector
+        self.monitor = monitor
+
+        self._rates = None
+        self._preset = None
+        self._signals = {}
+
+    @staticmethod
+    def _check_channels(scaler, detector, monitor):
+        """ Raises ValueError if the channels cannot be used. """
+        if detector is None:
+            raise ValueError(
+                f"No {scaler.name} channel is plotted, select the detector "
+                "with `counters` or pass detector=..."
+            )
+        if detector == monitor:
+            raise ValueError(
+                f"The detector and the monitor are the same channel "
+                f"({detector})."
+            )
+        fields = scaler.describe()
+        for channel in (detector, monitor):
+            if channel is not None and channel not in fields:
+                raise ValueError(
+                    f"'{channel}' is not read by {scaler.name}, the "
+                    f"channels read are: {list(fields)}."
+                )
+
+    def _signal(self, name):
+        # Reused so that all the events of a run share the same descriptor.
+        if name not in self._signals:
+            self._signals[name] = Signal(name=name, value=0)
+        return self._signals[name]
+
+    def relative_error(self, detector_counts, monitor_counts=None):
+        """ Relative error of detector/monitor, or of detector alone. """
+        if detector_counts <= 0 or (
+                monitor_counts is not None and monitor_counts <= 0):
+            return float("inf")
+        inverse = 1/detector_counts
+        if monitor_counts is not None:
+            inverse += 1/monitor_counts
+        return inverse**0.5
+
+    def _needed(self):
+        """
+        Preset that reaches the target error with the last count rates.
+
+        In time mode the preset is in seconds, otherwise in monitor counts.
+        """
+        det_rate, mon_rate = (
+            None if rate is None else max(rate, 1e-12) for rate in self._rates
+        )
+        eps2 = self.target_error**2
+        if self.time_mode:
+            inverse = 1/det_rate
+            if mon_rate is not None:
+                inverse += 1/mon_rate
+            return inverse/eps2
+        # With D = M*det_rate/mon_rate, 1/D + 1/M = eps2 gives M.
+        return (1 + mon_rate/det_rate)/eps2
+
+    def _clip(self, preset, max_time):
+        if self.time_mode:
+            low, high = self.min_time, max_time
+        else:
+            mon_rate = self._rates[1]
+            low, high = mon_rate*self.min_time, mon_rate*max_time
+        return min(max(preset, low), high)
+
+    def _first_preset(self):
+        """ Preset predicted from the rates of the previous reading. """
+        if self._rates is None:
+            return None
+        return self._clip(self._needed(), self.max_time)
+
+    def _next_preset(self, totals, elapsed):
+        """ Preset of a top-up count, None if no more counting is needed. """
+        det = totals[self.detector]
+        mon = totals[self.monitor] if self.monitor is not None else None
+        remaining = self.max_time - elapsed
+        if (self._rates is None or remaining <= 0 or
+                self.relative_error(det, mon) <= self.target_error):
+            return None
+        acquired = elapsed if self.time_mode else mon
+        return self._clip(self._needed() - acquired, remaining)
+
+    def reset(self):
+        """ Forgets the count rates of the previous scan. """
+        self._rates = None
+        self._preset = None
+
+    def _set_preset(self, value):
+        if value is not None and value != self._preset:
+            yield from mv(self.scaler.preset_monitor, value)
+            self._preset = value
+
+    def _count(self):
+        group = short_uid('adaptive')
+        yield Msg('trigger', self.scaler, group=group)
+        yield Msg('wait', None, group=group)
+        return (yield Msg('read', self.scaler))
+
+    def take_reading(self, devices, name='primary'):
+        """
+        Replacement of `trigger_and_read` that adapts the scaler counting.
+
+        The scaler fields are saved through soft signals with the same names,
+        holding the sum of all the counts of this reading.
+        """
+        devices = list(devices)
+        if self.scaler not in devices:
+            return (yield from trigger_and_read(devices, name=name))
+        others = [dev for dev in devices if dev is not self.scaler]
+
+        time_key = self.scaler.time.name
+        totals = {}
+        yield from self._set_preset(self._first_preset())
+        for _ in range(MAX_COUNTS):
+            reading = yield from self._count()
+            for key, item in reading.items():
+                if isinstance(item['value'], Number):
+                    totals[key] = totals.get(key, 0) + item['value']
+
+            elapsed = totals[time_key]
+            if elapsed > 0:
+                self._rates = (
+                    totals[self.detector]/elapsed,
+                    totals[self.monitor]/elapsed if self.monitor is not None
+                    else None
+                )
+            preset = self._next_preset(totals, elapsed)
+            if preset is None:
+                break
+            yield from self._set_preset(preset)
+
+        signals = []
+        for key, value in totals.items():
+            signal = self._signal(key)
+            signal.put(value)
+            signals.append(signal)
+
+        return (yield from trigger_and_read(others + signals, name=name))
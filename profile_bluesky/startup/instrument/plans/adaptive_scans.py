@@ -0,0 +1,296 @@
+"""
+Energy scans with a step size that follows the measured signal.
+"""
+
+__all__ = ['adaptive_escan', 'adaptive_replay']
+
+from bluesky.plan_stubs import open_run, close_run, trigger_and_read
+from bluesky.preprocessors import stage_decorator
+from collections import defaultdict
+from numpy import (
+    abs as np_abs, asarray, concatenate, interp, log, mean, polyfit
+)
+from .local_preprocessors import (configure_counts_decorator,
+                                  stage_dichro_decorator,
+                                  extra_devices_decorator)
+from .local_scans import one_local_step, _make_context, _collect_extras
+from ..callbacks.dichro_stream import plot_dichro_settings
+from ..devices import energy
+from ..utils import counters
+
+from ..session_logs import logger
+logger.info(__file__)
+
+
+def _absorption(monitor, detector, transmission):
+    """ XAS of each polarization state, as in `DichroStream`. """
+    monitor = asarray(monitor, dtype=float)
+    detector = asarray(detector, dtype=float)
+    return log(monitor/detector) if transmission else detector/monitor
+
+
+def _point_signal(xas, signal):
+    """
+    Reduces the XAS of all polarization states of a point to one number.
+
+    XMCD uses the +, -, -, + sequence.
+    """
+    if signal == "xmcd":
+        if xas.size != 4:
+            raise ValueError("signal='xmcd' needs a dichro scan.")
+        return (xas[0] + xas[3])/2 - (xas[1] + xas[2])/2
+    return mean(xas)
+
+
+def _next_energy_step(energies, values, min_step, max_step, target_delta,
+                      max_growth=2.0):
+    """
+    Chooses the next energy step from the points measured so far.
+
+    The step is the one that would change the signal by `target_delta`. The
+    slope used is the steepest of a linear fit to the last 3 points and the
+    last step alone. The step is clipped to [min_step, max_step], and it
+    cannot grow by more than `max_growth` times the previous step, so that a
+    noisy flat region does not throw the scan across an edge.
+
+    Parameters
+    ----------
+    energies, values : iterable
+        Points measured so far, in scan order.
+    min_step, max_step : float
+        Step limits, positive.
+    target_delta : float
+        Wanted signal change between consecutive points, positive.
+    max_growth : float, optional
+        Maximum ratio between consecutive steps.
+
+    Returns
+    -------
+    step : float
+        Positive step size.
+    """
+    energies = asarray(energies, dtype=float)
+    values = asarray(values, dtype=float)
+
+    if energies.size < 2:
+        return min_step
+
+    last_step = abs(energies[-1] - energies[-2])
+    num = min(energies.size, 3)
+    slope = max(
+        abs(polyfit(energies[-num:], values[-num:], 1)[0]),
+        abs(values[-1] - values[-2])/last_step,
+    )
+
+    step = max_step if slope == 0 else target_delta/slope
+    step = min(step, max_growth*last_step, max_step)
+    return max(step, min_step)
+
+
+def adaptive_escan(start, stop, min_step, max_step, target_delta,
+                   signal="xas", time=None, detectors=None, dichro=False,
+                   burst=False, fixq=False, md=None):
+    """
+    Energy scan that refines the step where the signal changes fastest.
+
+    After each point the next energy step is chosen such that the signal
+    (XANES or XMCD, computed as in the dichro stream) changes by about
+    `target_delta`, within [min_step, max_step]. Flat pre-edge and post-edge
+    regions are then measured with coarse steps, and the edge with fine ones.
+
+    The monitor, detector and transmission settings are taken from
+    `plot_dichro_settings.settings` (see `pr_setup()`).
+
+    Parameters
+    ----------
+    start, stop : float
+        Energy range, the scan can go in either direction.
+    min_step, max_step : float
+        Limits of the energy step.
+    target_delta : float
+        Wanted change of the signal between consecutive points, in the units
+        of the normalized absorption (detector/monitor, or log(monitor/
+        detector) in transmission).
+    signal : str, optional
+        "xas" or "xmcd" (requires dichro=True).
+    time : float, optional
+        If a number is passed, it will modify the counts over time. All
+        detectors need to have a .preset_monitor signal.
+    detectors : list, optional
+        List of detectors to be used in the scan. If None, will use the
+        detectors defined in `counters.detectors`.
+    dichro : boolean, optional
+        Flag to do a dichro scan. Please run pr_setup.config() prior do a
+        dichro scan.
+    burst : boolean, optional
+        Flag for a fast dichro scan, see :func:`ascan`.
+    fixq : boolean, optional
+        Flag for fixQ scans, see :func:`ascan`.
+    md : dictionary, optional
+        Metadata to be added to the run start.
+
+    See Also
+    --------
+    :func:`adaptive_replay`
+    :func:`qxscan`
+    """
+
+    if signal not in ("xas", "xmcd"):
+        raise ValueError("signal must be 'xas' or 'xmcd'.")
+    if signal == "xmcd" and not dichro:
+        raise ValueError("signal='xmcd' needs dichro=True.")
+    if not 0 < min_step <= max_step:
+        raise ValueError("The steps must be 0 < min_step <= max_step.")
+
+    if detectors is None:
+        detectors = counters.detectors
+
+    settings = plot_dichro_settings.settings
+    context = _make_context(dichro, burst, fixq)
+    direction = 1 if stop >= start else -1
+
+    extras = yield from _collect_extras(True, False)
+
+    _md = {
+        'detectors': [det.name for det in detectors],
+        'motors': [energy.name],
+        'plan_args': {
+            'start': start, 'stop': stop, 'min_step': min_step,
+            'max_step': max_step, 'target_delta': target_delta,
+            'signal': signal, 'time': time
+        },
+        'plan_name': 'adaptive_escan',
+        'hints': {
+            'monitor': counters.monitor,
+            'detectors': [],
+            'dimensions': [([energy.name], 'primary')],
+            'scan_type': 'adaptive escan',
+        },
+    }
+    for item in detectors:
+        _md['hints']['detectors'].extend(item.hints['fields'])
+    if dichro:
+        _md['hints']['scan_type'] += " dichro"
+    _md.update(md or {})
+
+    energies = []
+    values = []
+
+    def _measure(position, pos_cache):
+        readings = []
+
+        def take_reading(devices, name='primary'):
+            ret = yield from trigger_and_read(devices, name=name)
+            readings.append(ret)
+            return ret
+
+        yield from one_local_step(
+            detectors + extras, {energy: position}, pos_cache,
+            take_reading=take_reading, context=context
+        )
+
+        monitor = concatenate(
+            [asarray(item[settings.monitor]['value']).ravel()
+             for item in readings]
+        )
+        detector = concatenate(
+            [asarray(item[settings.detector]['value']).ravel()
+             for item in readings]
+        )
+        energies.append(position)
+        values.append(_point_signal(
+            _absorption(monitor, detector, settings.transmission), signal
+        ))
+
+    @configure_counts_decorator(detectors, time)
+    @stage_dichro_decorator(dichro, False, [energy])
+    @extra_devices_decorator(extras)
+    @stage_decorator(detectors + extras)
+    def _inner_adaptive():
+        uid = yield from open_run(md=_md)
+        pos_cache = defaultdict(lambda: None)
+        position = start
+        while True:
+            yield from _measure(position, pos_cache)
+            if position == stop:
+                break
+            step = _next_energy_step(energies, values, min_step, max_step,
+                                     target_delta)
+            position += direction*step
+            # The last point is always at stop.
+            if direction*(position - stop) > 0:
+                position = stop
+        yield from close_run()
+        logger.info(f"adaptive_escan measured {len(energies)} points.")
+        return uid
+
+    return (yield from _inner_adaptive())
+
+
+def adaptive_replay(energies, values, min_step, max_step, target_delta):
+    """
+    Replays `adaptive_escan` on a recorded spectrum.
+
+    The points that the adaptive scan would measure are interpolated from the
+    recorded (dense) data. Use this to choose the step parameters, and to
+    check how many points are saved.
+
+    Parameters
+    ----------
+    energies, values : iterable
+        Recorded spectrum, for instance the energy and normalized XANES of a
+        catalog run. The scan goes from the first to the last energy.
+    min_step, max_step, target_delta : float
+        See `adaptive_escan`.
+
+    Returns
+    -------
+    result : dict
+        With the adaptive "energies" and "values", the number of recorded
+        ("dense_points") and adaptive ("points") points, and the maximum
+        ("max_error") and rms ("rms_error") error of the recorded spectrum
+        interpolated from the adaptive points.
+
+    Example
+    -------
+    .. code-block:: python
+        run = cat[-1].primary.read()
+        xanes = run["Ion Ch 5"]/run["Ion Ch 4"]
+        adaptive_replay(run["energy"], xanes, 0.0005, 0.01, 0.02)
+    """
+    energies = asarray(energies, dtype=float)
+    values = asarray(values, dtype=float)
+    start, stop = energies[0], energies[-1]
+    direction = 1 if stop >= start else -1
+
+    # interp needs increasing x.
+    order = energies.argsort()
+    _x, _y = energies[order], values[order]
+
+    picked_e = []
+    picked_v = []
+    position = start
+    while True:
+        picked_e.append(position)
+        picked_v.append(float(interp(position, _x, _y)))
+        if position == stop:
+            break
+        position += direction*_next_energy_step(
+            picked_e, picked_v, min_step, max_step, target_delta
+        )
+        if direction*(position - stop) > 0:
+            position = stop
+
+    picked_e = asarray(picked_e)
+    picked_v = asarray(picked_v)
+    order = picked_e.argsort()
+    error = interp(_x, picked_e[order], picked_v[order]) - _y
+
+    return dict(
+        energies=picked_e,
+        values=picked_v,
+        dense_points=energies.size,
+        points=picked_e.size,
+        max_error=float(np_abs(error).max()),
+        rms_error=float((error**2).mean()**0.5),
+    )
@@ -0,0 +1,187 @@
+"""
+Benchmarks of the plans, against simulated devices.
+
+Not imported into the session, use for instance:
+`from instrument.plans.benchmarks import energy_fly_scan_benchmark`
+"""
+
+__all__ = ['energy_fly_scan_benchmark']
+
+from bluesky import RunEngine
+from bluesky.plans import list_scan
+from numpy import arange, arctan, concatenate, median, sign
+from ophyd import Component, Device, Signal
+from ophyd.status import DeviceStatus
+from threading import Thread
+from time import monotonic, sleep
+from pyRestTable import Table
+from .fly_scans import energy_fly_scan, rebin_counts
+
+from ..session_logs import logger
+logger.info(__file__)
+
+# Seconds between the updates of the simulated devices.
+SIM_TICK = 0.001
+
+
+class SimSweepAxis(Device):
+    """ Simulated positioner that moves at `velocity`, read while moving. """
+
+    readback = Component(Signal, value=0, kind='hinted')
+    velocity = Component(Signal, value=1, kind='config')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.readback.name = self.name
+        self._stopped = False
+
+    def set(self, value):
+        status = DeviceStatus(self)
+        self._stopped = False
+
+        def _move():
+            start, t0 = self.readback.get(), monotonic()
+            direction = sign(value - start)
+            while not self._stopped:
+                position = (
+                    start + direction*self.velocity.get()*(monotonic() - t0)
+                )
+                if (value - position)*direction <= 0:
+                    position = value
+                self.readback.put(position)
+                if position == value:
+                    break
+                sleep(SIM_TICK)
+            status.set_finished()
+
+        Thread(target=_move, daemon=True).start()
+        return status
+
+    def stop(self, *, success=False):
+        self._stopped = True
+
+
+class SimScaler(Device):
+    """
+    Simulated scaler that counts for `preset_monitor` seconds.
+
+    The count rate is `rate(position)`, with the position of `positioner`
+    during the count.
+    """
+
+    counts = Component(Signal, value=0, kind='hinted')
+    preset_monitor = Component(Signal, value=0.1, kind='config')
+
+    def __init__(self, *args, positioner, rate, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.positioner = positioner
+        self.rate = rate
+
+    def trigger(self):
+        status = DeviceStatus(self)
+
+        def _count():
+            total, t0 = 0.0, monotonic()
+            last = t0
+            while last - t0 < self.preset_monitor.get():
+                sleep(SIM_TICK)
+                now = monotonic()
+                total += self.rate(self.positioner.readback.get())*(now - last)
+                last = now
+            self.counts.put(total)
+            status.set_finished()
+
+        Thread(target=_count, daemon=True).start()
+        return status
+
+
+def energy_fly_scan_benchmark(grid=None, count_time=0.05, velocity=0.05,
+                              readings_per_point=3):
+    """
+    Time `energy_fly_scan` and a step scan against a simulated mono/scaler.
+
+    Both scans count `count_time` per reading, the step scan once per point.
+    The raw readings saved in "fly_raw" are rebinned again, as done offline,
+    and compared to the primary stream.
+
+    Parameters
+    ----------
+    grid : iterable, optional
+        Energy points in keV, defaults to a qxscan-like grid around 7.7 keV,
+        with narrow edge bins.
+    count_time : float, optional
+        Seconds per reading.
+    velocity : float, optional
+        Speed of the simulated mono in keV/s, used by the step scan.
+    readings_per_point : float, optional
+        Passed to `energy_fly_scan`.
+
+    Returns
+    -------
+    result : dict
+        Seconds taken by the "step" and "fly" scans, minimum and median
+        raw readings per bin ("min_readings", "median_readings"), and if
+        the "fly_raw" stream rebins into the primary stream ("rebinned").
+    """
+    if grid is None:
+        grid = 7.7 + concatenate((
+            arange(-30, -5, 5), arange(-5, 5, 0.5), arange(5, 60, 5)
+        ))*1e-3
+
+    mono = SimSweepAxis(name='sim_energy')
+    mono.readback.put(grid[0])
+    scaler = SimScaler(
+        name='sim_scaler', positioner=mono,
+        rate=lambda energy: 1e5*(1.5 + arctan((energy - 7.7)/1e-3)/3.14)
+    )
+    scaler.preset_monitor.put(count_time)
+    RE = RunEngine({})
+
+    def _run(plan):
+        documents = []
+        mono.velocity.put(velocity)
+        t0 = monotonic()
+        RE(plan, lambda name, doc: documents.append((name, doc)))
+        return monotonic() - t0, documents
+
+    step_time, _ = _run(list_scan([scaler], mono, list(grid)))
+    fly_time, documents = _run(energy_fly_scan(
+        [scaler], grid, time=count_time, positioner=mono,
+        readings_per_point=readings_per_point
+    ))
+
+    streams = {
+        doc['uid']: doc['name'] for name, doc in documents
+        if name == 'descriptor'
+    }
+    data = {'fly_raw': [], 'primary': []}
+    for name, doc in documents:
+        if name == 'event':
+            data[streams[doc['descriptor']]].append(doc['data'])
+
+    raw = data['fly_raw']
+    values, npts = rebin_counts(
+        [event[mono.name] for event in raw],
+        {'counts': [event[scaler.counts.name] for event in raw]}, grid
+    )
+    primary = [event[scaler.counts.name] for event in data['primary']]
+    result = dict(
+        step=step_time, fly=fly_time, min_readings=int(npts.min()),
+        median_readings=float(median(npts)),
+        rebinned=all(
+            a == b or (a != a and b != b)
+            for a, b in zip(values['counts'], primary)
+        )
+    )
+
+    table = Table()
+    table.labels = ("scan", "time (s)")
+    table.addRow(("step", f"{step_time:0.2f}"))
+    table.addRow(("fly", f"{fly_time:0.2f}"))
+    print(table)
+    print(f"{len(grid)} points, {len(raw)} raw readings, "
+          f"{result['min_readings']} (min) and {result['median_readings']} "
+          f"(median) per bin, fly_raw rebins into primary: "
+          f"{result['rebinned']}.")
+
+    return result
@@ -0,0 +1,60 @@
+"""
+Series of plans at several magnetic fields of the AMI magnet.
+"""
+
+__all__ = ['field_series']
+
+from bluesky.plan_stubs import mv
+from .local_preprocessors import stage_ami_decorator, keep_switch_heater_on
+from ..devices import mag6t
+
+from ..session_logs import logger
+logger.info(__file__)
+
+
+def field_series(fields, *plans):
+    """
+    Run the same plans at each magnetic field, keeping the switch heater on.
+
+    Every scan or move of `mag6t.field` normally turns the persistent switch
+    heater on before, and off after it, which takes minutes. Here the magnet
+    is staged once, the field is moved through `fields` and all the `plans`
+    run at each field. The heater is only turned off at the end. The scans
+    and moves inside the series find the heater on, and leave it on (as with
+    `turn_off=False`).
+
+    Parameters
+    ----------
+    fields : iterable of float
+        Field setpoints, in the order they are measured.
+    *plans : callable
+        Functions that return a plan, since each plan runs again at every
+        field. For instance `functools.partial(ascan, energy, 7.7, 7.8, 51)`
+        or `lambda: count(num=5)`.
+
+    Example
+    -------
+    .. code-block:: python
+        RE(field_series(
+            [-2, -1, 1, 2],
+            partial(ascan, energy, 7.70, 7.75, 26, 1, dichro=True),
+            partial(count, num=10)
+        ))
+    """
+    for plan in plans:
+        if not callable(plan):
+            raise TypeError("The plans must be functions that return a plan, "
+                            "for instance functools.partial(ascan, ...), "
+                            "since each plan runs at every field.")
+    fields = list(fields)
+
+    @stage_ami_decorator(True)
+    def _inner_series():
+        with keep_switch_heater_on():
+            for field in fields:
+                logger.info(f"field_series: moving to {field}.")
+                yield from mv(mag6t.field, field)
+                for plan in plans:
+                    yield from plan()
+
+    return (yield from _inner_series())
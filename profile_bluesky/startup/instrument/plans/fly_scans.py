@@ -0,0 +1,357 @@
+"""
+Continuous (fly) energy scans
+"""
+
+__all__ = ['energy_fly_scan', 'rebin_counts']
+
+from bluesky.plan_stubs import (
+    open_run, close_run, trigger_and_read, abs_set, mv, rd, wait, null,
+    trigger, create, read, save
+)
+from bluesky.preprocessors import finalize_wrapper
+from ophyd import Signal
+from numbers import Number
+from numpy import (
+    asarray, arcsin, argsort, bincount, concatenate, degrees, diff, empty,
+    full, nan, radians, searchsorted, sin
+)
+from uuid import uuid4
+from .local_preprocessors import configure_counts_decorator
+from ..devices import energy, mono, undulator, pr1, pr2, pr3
+from ..utils import counters
+
+from ..session_logs import logger
+logger.info(__file__)
+
+# Raw readings in each bin of a fly scan, used to set the sweep speed.
+READINGS_PER_POINT = 3
+
+# In each sweep region, the widest bin is at most this times the narrowest.
+REGION_RATIO = 2
+
+
+def _bin_edges(grid):
+    """
+    Sorting order of `grid` and the edges of the bins of the sorted grid.
+
+    The edges are the midpoints between neighboring points, the first and
+    last bins are symmetric around their point.
+    """
+    order = argsort(grid)
+    centers = grid[order]
+    mid = (centers[1:] + centers[:-1])/2
+    edges = concatenate(
+        ([2*centers[0] - mid[0]], mid, [2*centers[-1] - mid[-1]])
+    )
+    return order, edges
+
+
+def rebin_counts(raw_positions, raw_values, grid):
+    """
+    Sums raw readings into the bins centered at the grid points.
+
+    The bin edges are the midpoints between neighboring grid points, the
+    first and last bins are symmetric around their grid point. Readings
+    outside of all bins are dropped.
+
+    Parameters
+    ----------
+    raw_positions : iterable
+        Position of each raw reading.
+    raw_values : dict
+        Maps the field name to an iterable with the raw values, in the same
+        order as `raw_positions`.
+    grid : iterable
+        Monotonic bin centers, at least 2 points.
+
+    Returns
+    -------
+    values : dict
+        Maps the field name to the summed values in each bin (NaN for empty
+        bins), in the order of `grid`.
+    npts : numpy.array
+        Number of raw readings in each bin.
+    """
+    grid = asarray(grid, dtype=float)
+    if grid.size < 2:
+        raise ValueError("The grid needs at least 2 points.")
+    size = grid.size
+
+    order, edges = _bin_edges(grid)
+
+    index = searchsorted(edges, asarray(raw_positions, dtype=float),
+                         side="right") - 1
+    valid = (index >= 0) & (index < size)
+    index = index[valid]
+
+    npts = empty(size, dtype=int)
+    npts[order] = bincount(index, minlength=size)
+
+    values = {}
+    for key, raw in raw_values.items():
+        summed = bincount(
+            index, weights=asarray(raw, dtype=float)[valid], minlength=size
+        )
+        values[key] = full(size, nan)
+        values[key][order] = summed
+        values[key][npts == 0] = nan
+
+    return values, npts
+
+
+def _sweep_regions(widths, ratio=REGION_RATIO):
+    """
+    Splits the bins into contiguous regions, in which the widest bin is at
+    most `ratio` times the narrowest.
+
+    Returns a list with the (first, last + 1) bin indices of each region.
+    """
+    regions = []
+    first = 0
+    low = high = widths[0]
+    for index, width in enumerate(widths[1:], 1):
+        low, high = min(low, width), max(high, width)
+        if high > ratio*low:
+            regions.append((first, index))
+            first = index
+            low = high = width
+    regions.append((first, len(widths)))
+    return regions
+
+
+def _bragg_angle(target, theta, position):
+    """
+    Mono theta (degrees) at the `target` energy.
+
+    Uses the current `theta` and energy `position`, since sin(theta)*energy
+    is constant.
+    """
+    return degrees(arcsin(sin(radians(theta))*position/target))
+
+
+def energy_fly_scan(detectors, grid, *, time=None, positioner=None,
+                    readings_per_point=READINGS_PER_POINT, md=None):
+    """
+    Sweep the energy continuously while counting, then rebin onto `grid`.
+
+    The positioner is moved to the edge of the first bin, and then sent to the
+    edge of the last bin without waiting. While it moves, the detectors are
+    triggered back-to-back and every reading is stored in the "fly_raw"
+    stream, with the average of the positions read before and after the
+    count (saved under the positioner name), so the raw readings can be
+    rebinned again with `rebin_counts`. When the sweep ends, the numeric
+    fields are summed in bins centered at the grid points and emitted as the
+    "primary" stream.
+
+    The sweep is split into regions of similar bin widths (as the qxscan
+    regions), each swept at the speed that puts about `readings_per_point`
+    readings in its narrowest bin: for the beamline `energy`, the velocity
+    of the mono theta motor is changed (theta is not linear in energy, so
+    the speed is only constant in theta), for other positioners their
+    `velocity`, if they have one. The original velocity is restored at the
+    end. The undulator and phase retarders that track the
+    energy are parked at the center of the sweep, and their tracking is
+    turned off until the end of the scan.
+
+    Count time factors (as in `qxscan_params`) are not applied, but note that
+    in a constant speed sweep wider bins already collect more counts.
+
+    Parameters
+    ----------
+    detectors : list
+        Detectors to be triggered. Only their numeric scalar fields are
+        rebinned, which should be counts (as in a scaler).
+    grid : iterable
+        Energy points of the primary stream.
+    time : float, optional
+        Count time of each raw reading. If None, uses the current presets,
+        which must be in seconds.
+    positioner : ophyd object, optional
+        Energy positioner, defaults to `energy`. Any settable device that can
+        be read (like `ophyd.sim.SynAxis`) works.
+    readings_per_point : float, optional
+        Number of raw readings in the narrowest bin of each region, sets
+        the sweep speed.
+    md : dictionary, optional
+        Metadata to be added to the run start.
+    """
+    if positioner is None:
+        positioner = energy
+
+    grid = asarray(grid, dtype=float)
+    if grid.size < 2:
+        raise ValueError("A fly scan needs at least 2 points.")
+    if time is not None and time <= 0:
+        raise ValueError("The fly scan count time must be in seconds (> 0).")
+
+    half_step = (grid[1] - grid[0])/2, (grid[-1] - grid[-2])/2
+    start = grid[0] - half_step[0]
+    end = grid[-1] + half_step[1]
+    edges = _bin_edges(grid)[1]
+    # In the order of the sweep.
+    if grid[0] > grid[-1]:
+        edges = edges[::-1]
+
+    _md = {
+        'detectors': [det.name for det in detectors],
+        'motors': [positioner.name],
+        'num_points': grid.size,
+        'num_intervals': grid.size - 1,
+        'plan_args': {
+            'detectors': list(map(repr, detectors)),
+            'start': grid[0], 'stop': grid[-1], 'num': grid.size,
+            'time': time
+        },
+        'plan_name': 'energy_fly_scan',
+        'hints': {'monitor': counters.monitor, 'detectors': [],
+                  'scan_type': 'energy fly'},
+    }
+    for item in detectors:
+        _md['hints']['detectors'].extend(item.hints['fields'])
+    _md.update(md or {})
+    _md['hints'].setdefault('dimensions', [([positioner.name], 'primary')])
+
+    raw_positions = []
+    raw_values = {}
+    raw_position = Signal(name=positioner.name, value=start)
+
+    sweep_status = []
+
+    # Settings changed for the sweep, and their original values.
+    saved = {}
+
+    def _count_time():
+        if time is not None:
+            return time
+        presets = []
+        for det in detectors:
+            if hasattr(det, 'preset_monitor'):
+                presets.append((yield from rd(det.preset_monitor)))
+        return max(presets, default=None)
+
+    def _park_tracking():
+        """ Moves to start, with the tracked devices at the center. """
+        center = (start + end)/2
+        args = []
+        for pr in (pr1, pr2, pr3):
+            if (yield from rd(pr.tracking)):
+                saved[pr.tracking] = True
+                args += [pr.energy, center]
+        if (yield from rd(undulator.downstream.tracking)):
+            saved[undulator.downstream.tracking] = True
+            offset = yield from rd(undulator.downstream.energy.offset)
+            args += [undulator.downstream.energy, center + offset]
+
+        for signal in saved.keys():
+            yield from mv(signal, False)
+        yield from mv(positioner, start, *args)
+
+    def _regions():
+        """
+        Velocity signal, and the (end, speed) of each sweep region.
+
+        Returns a single region at the current speed if the speed cannot be
+        set.
+        """
+        count_time = yield from _count_time()
+        if count_time is None:
+            logger.warning("Unknown count time, the sweep runs at the "
+                           "current speed.")
+            return None, [(end, None)]
+
+        if positioner is energy:
+            theta = yield from rd(mono.theta.readback)
+            position = yield from rd(mono.energy.readback)
+            widths = abs(diff(_bragg_angle(edges, theta, position)))
+            velocity = mono.energy.theta_velocity
+        elif hasattr(positioner, 'velocity'):
+            widths = abs(diff(edges))
+            velocity = positioner.velocity
+        else:
+            logger.warning(f"{positioner.name} has no velocity, the sweep "
+                           "runs at the current speed.")
+            return None, [(end, None)]
+
+        # The narrowest bin of each region sets its speed.
+        regions = []
+        duration = 0
+        for first, last in _sweep_regions(widths):
+            speed = widths[first:last].min()/(readings_per_point*count_time)
+            regions.append((edges[last], speed))
+            duration += widths[first:last].sum()/speed
+        saved[velocity] = yield from rd(velocity)
+        logger.info(f"Fly scan: {len(regions)} regions, {duration:0.1f} s "
+                    "sweep.")
+        return velocity, regions
+
+    def _sweep(target):
+        group = str(uuid4())
+        status = yield from abs_set(positioner, target, group=group)
+        sweep_status.append(status)
+        while not status.done:
+            before = yield from rd(positioner)
+            count_group = str(uuid4())
+            for det in detectors:
+                yield from trigger(det, group=count_group)
+            yield from wait(group=count_group)
+            after = yield from rd(positioner)
+            raw_positions.append((before + after)/2)
+            raw_position.put(raw_positions[-1])
+
+            # Same as trigger_and_read, with the position of the count.
+            yield from create('fly_raw')
+            for det in detectors:
+                readings = yield from read(det)
+                for key, item in readings.items():
+                    if isinstance(item['value'], Number):
+                        raw_values.setdefault(key, []).append(item['value'])
+            yield from read(raw_position)
+            yield from save()
+        yield from wait(group=group)
+
+    def _emit_primary():
+        values, npts = rebin_counts(raw_positions, raw_values, grid)
+        empty_bins = int((npts == 0).sum())
+        if empty_bins > 0:
+            logger.warning(
+                f"{empty_bins} of {grid.size} fly scan bins are empty, use a "
+                "shorter count time."
+            )
+
+        signals = [Signal(name=positioner.name, value=grid[0])]
+        signals += [Signal(name=key, value=nan) for key in values.keys()]
+        signals.append(Signal(name='fly_npts', value=0))
+
+        for i, position in enumerate(grid):
+            signals[0].put(position)
+            for signal in signals[1:-1]:
+                signal.put(values[signal.name][i])
+            signals[-1].put(int(npts[i]))
+            yield from trigger_and_read(signals)
+
+    @configure_counts_decorator(detectors, time)
+    def _inner_fly():
+        if positioner is energy:
+            yield from _park_tracking()
+        else:
+            yield from mv(positioner, start)
+        velocity, regions = yield from _regions()
+        uid = yield from open_run(md=_md)
+        for target, speed in regions:
+            if speed is not None:
+                yield from mv(velocity, speed)
+            yield from _sweep(target)
+        yield from _emit_primary()
+        yield from close_run()
+        return uid
+
+    def _stop():
+        # Only needed if the sweep is interrupted.
+        if len(sweep_status) > 0 and not sweep_status[-1].done:
+            positioner.stop()
+        # Velocity and tracking back to their original values.
+        for signal, value in saved.items():
+            yield from mv(signal, value)
+        yield from null()
+
+    return (yield from finalize_wrapper(_inner_fly(), _stop()))
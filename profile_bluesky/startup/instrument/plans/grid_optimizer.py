@@ -0,0 +1,158 @@
+"""
+Axis order and snaking of grid scans that minimize the move time.
+"""
+
+__all__ = ['optimize_grid']
+
+from itertools import permutations, product
+from numpy import abs as np_abs, arange, diff, linspace, prod, unique, zeros
+from pyRestTable import Table
+from ..utils.motion_models import motion_models as default_models
+
+try:
+    # cytools is a drop-in replacement for toolz, implemented in Cython
+    from cytools import partition
+except ImportError:
+    from toolz import partition
+
+from ..session_logs import logger
+logger.info(__file__)
+
+
+def _trajectory(axes, snake):
+    """
+    Positions of all the grid points, in the order of the scan.
+
+    Parameters
+    ----------
+    axes : list
+        (motor, start, stop, num) of each axis, the first is the slowest.
+    snake : iterable of booleans
+        Snaking of each axis, as done by `bluesky.plans.grid_scan`.
+
+    Returns
+    -------
+    points : numpy.array
+        One row per point, one column per axis.
+    """
+    nums = [int(num) for _, _, _, num in axes]
+    total = int(prod(nums))
+    index = arange(total)
+    points = zeros((total, len(axes)))
+    for col, ((_, start, stop, num), snaked) in enumerate(zip(axes, snake)):
+        inner = int(prod(nums[col+1:]))
+        digit = (index // inner) % num
+        if snaked:
+            # The direction changes with every point of the outer axes.
+            outer = index // (inner*num)
+            digit = digit + (outer % 2)*(num - 1 - 2*digit)
+        points[:, col] = linspace(start, stop, num)[digit]
+    return points
+
+
+def _grid_move_time(models, axes, snake):
+    """
+    Predicted time spent moving between the grid points.
+
+    The motors of one point move together, so each point takes as long as
+    the slowest of the motors that move.
+    """
+    steps = np_abs(diff(_trajectory(axes, snake), axis=0))
+    times = zeros(steps.shape)
+    for col, (motor, _, _, _) in enumerate(axes):
+        for distance in unique(steps[:, col]):
+            if distance == 0:
+                continue
+            times[steps[:, col] == distance, col] = models.move_time(
+                motor, distance
+            )
+    return float(times.max(axis=1).sum()) if len(times) > 0 else 0.0
+
+
+def _snaked_motors(motors, snake_axes):
+    """ Motors snaked by the `snake_axes` of `bluesky.plans.grid_scan`. """
+    if snake_axes is True:
+        return motors[1:]
+    if not snake_axes:
+        return []
+    return list(snake_axes)
+
+
+def _describe(axes, snake):
+    return " > ".join(
+        motor.name + (" (snake)" if snaked else "")
+        for (motor, _, _, _), snaked in zip(axes, snake)
+    )
+
+
+def optimize_grid(*args, snake_axes=None, models=None, printing=True):
+    """
+    Choose the axis order and snaking that make a grid scan fastest.
+
+    All the axis orders and snaking options are tried, and the predicted
+    move time is computed with the motion models (see `motion_models.fit`).
+    This favors, for instance, putting a slow or long settling positioner
+    (magnetic field, temperature) in the outer loop, and snaking the axes
+    with long return moves. The points are the same, only the order in
+    which they are measured changes. The result is still a regular grid, so
+    the run metadata (shape, extents, snaking) describe it as usual.
+
+    Parameters
+    ----------
+    *args :
+        patterned like (``motor1, start1, stop1, num1,`` ...
+        ``motorN, startN, stopN, numN``), as in :func:`grid_scan`.
+    snake_axes : boolean or iterable, optional
+        Snaking as requested, used as the baseline.
+    models : MotionModels, optional
+        Defaults to the `motion_models` instance.
+    printing : boolean, optional
+        If True, prints the predicted and baseline move times.
+
+    Returns
+    -------
+    result : dict
+        With the reordered "args", the "snake_axes" (list of motors), and
+        the "predicted" and "baseline" move times in seconds.
+    """
+    if len(args) == 0 or len(args) % 4 != 0:
+        raise ValueError("args must be: motor, start, stop, number of points "
+                         "for each axis.")
+    if models is None:
+        models = default_models
+
+    axes = list(partition(4, args))
+    motors = [motor for motor, _, _, _ in axes]
+    snaked = _snaked_motors(motors, snake_axes)
+    baseline_snake = [motor in snaked for motor in motors]
+    baseline = _grid_move_time(models, axes, baseline_snake)
+
+    best_axes, best_snake, best_time = axes, baseline_snake, baseline
+    for order in permutations(axes):
+        for flags in product((False, True), repeat=len(axes) - 1):
+            snake = (False,) + flags
+            time = _grid_move_time(models, order, snake)
+            # Only change the scan if it is worth it.
+            if time < 0.99*best_time:
+                best_axes, best_snake, best_time = list(order), snake, time
+
+    result = dict(
+        args=tuple(item for axis in best_axes for item in axis),
+        snake_axes=[
+            motor for (motor, _, _, _), snaked in zip(best_axes, best_snake)
+            if snaked
+        ],
+        predicted=best_time,
+        baseline=baseline,
+    )
+
+    if printing:
+        table = Table()
+        table.labels = ("trajectory", "axes", "move time (s)")
+        table.addRow(("as given", _describe(axes, baseline_snake),
+                      f"{baseline:0.1f}"))
+        table.addRow(("optimized", _describe(best_axes, best_snake),
+                      f"{best_time:0.1f}"))
+        print(table)
+
+    return result
@@ -1,13 +1,15 @@
 """ Local decorators """
 
-from bluesky.utils import make_decorator
-from bluesky.preprocessors import finalize_wrapper
+from bluesky.utils import make_decorator, single_gen, short_uid
+from contextlib import contextmanager
+from bluesky.preprocessors import finalize_wrapper, plan_mutator, pchain
 from bluesky.plan_stubs import (
-    mv, sleep, abs_set, rd, null, subscribe, unsubscribe
+    mv, abs_set, rd, null, subscribe, unsubscribe, wait
 )
 from ophyd import Signal, Kind
 from ophyd.status import SubscriptionStatus
 from ..devices import scalerd, pr_setup, mag6t
+from ..devices._conditions import ConditionStatus
 from ..callbacks.dichro_stream import plot_dichro_settings, dichro_bec
 from ..framework import bec
 
@@ -56,6 +58,60 @@ class SetSignal(Signal):
         return SubscriptionStatus(device, function, timeout=self._timeout)
 
 
+class ConditionSignal(Signal):
+
+    """ Signal whose set waits for conditions, see `wait_for_condition`. """
+
+    def set(self, conditions, **kwargs):
+        return ConditionStatus(conditions, **kwargs)
+
+
+def wait_for_condition(*conditions, debounce=0, timeout=None, name=None,
+                       group=None, wait=True):
+    """
+    Wait until all the conditions hold at the same time.
+
+    It finishes as soon as the conditions hold, without any polling. The
+    time each wait took is kept in `condition_waits`.
+
+    Parameters
+    ----------
+    *conditions :
+        (signal, check) pairs. The check is a function like the ones made
+        by `_difference_check` or `_status_check`, or a value that the signal
+        must be equal to.
+    debounce : float, optional
+        Seconds that the conditions must keep holding.
+    timeout : float, optional
+        Seconds until the wait fails, defaults to no timeout.
+    name : str, optional
+        Description of the wait, used in `condition_waits`.
+    group : string (or any hashable object), optional
+        identifier used by 'wait'
+    wait : boolean, optional
+        If True, wait for the conditions before processing any more
+        messages. Use False with a `group` to start watching the signals
+        before the action that will change them.
+
+    Yields
+    ------
+    msg : Msg
+
+    Example
+    -------
+    .. code-block:: python
+        yield from wait_for_condition(
+            (mag6t.field.voltage, _difference_check(0, tolerance=0.02)),
+            (mag6t.field.magnet_status, _status_check([2, 3])),
+            debounce=0.5
+        )
+    """
+    signal = ConditionSignal(name='condition')
+    return (yield from abs_set(signal, conditions, debounce=debounce,
+                               timeout=timeout, name=name, group=group,
+                               wait=wait))
+
+
 def _difference_check(target, tolerance):
     """
     Returns a callback function that checks the distance from target.
@@ -98,12 +154,77 @@ def _status_check(target):
     return check_pos
 
 
+def _transition_check(through, target):
+    """
+    Returns a callback function that waits for a status transition.
+
+    The status must first go through one of the `through` values, and then
+    reach one of the `target` values. This avoids accepting the status from
+    before the transition started.
+
+    Parameters
+    ----------
+    through : list
+        Status values that mark the transition.
+    target : list
+        List of acceptable final status.
+
+    Returns
+    -------
+    check_pos : function
+        Function that can be used as a callback of SubscriptionStatus.
+    """
+    seen = []
+
+    def check_pos(value=None, **kwargs):
+        if value in through:
+            seen.append(value)
+        return len(seen) > 0 and value in target
+
+    return check_pos
+
+
+# AMI controller states (magnet_status).
+AMI_HOLDING = 2
+AMI_PAUSED = 3
+AMI_AT_ZERO = 8
+AMI_HEATING_SWITCH = 9
+AMI_COOLING_SWITCH = 10
+
+# Seconds that each AMI wait can take before the plan fails.
+AMI_TIMEOUT = 600
+
+
+# Number of `field_series` running, the AMI wrappers inside them leave the
+# switch heater on.
+_heater_kept_on = [0]
+
+
+@contextmanager
+def keep_switch_heater_on():
+    """
+    The AMI stage wrappers used inside leave the switch heater on at the end,
+    as with `turn_off=False`. Used by `field_series` around its plans.
+    """
+    _heater_kept_on[0] += 1
+    try:
+        yield
+    finally:
+        _heater_kept_on[0] -= 1
+
+
 def stage_ami_wrapper(plan, magnet, turn_off=True):
     """
     Stage the AMI magnet.
 
     Turns on/off the persistence switch heater before/after the magnetic field
-    scan or move.
+    scan or move. The waits follow the transitions of `magnet_status`.
+
+    The heater is only turned on if it is off, and with `turn_off=True` it is
+    always turned off at the end, also if it was left on before (by a move
+    with `turn_off=False`, by hand, or by an aborted scan). Inside of
+    `keep_switch_heater_on` (as in `field_series`) the heater is left on, as
+    with `turn_off=False`.
 
     Parameters
     ----------
@@ -111,6 +232,8 @@ def stage_ami_wrapper(plan, magnet, turn_off=True):
         a generator, list, or similar containing `Msg` objects
     magnet : boolean
         Flag that triggers the stage/unstage.
+    turn_off : boolean, optional
+        If True, the switch heater is turned off at the end.
 
     Yields
     ------
@@ -119,11 +242,7 @@ def stage_ami_wrapper(plan, magnet, turn_off=True):
         inserted and appended
     """
 
-    # This just needs to be set once here.
-    signal = SetSignal(name='tmp')
-
     def _stage():
-
         _update_rate = yield from rd(mag6t.field.update_rate)
         if _update_rate <= 5:
             yield from mv(mag6t.field.update_rate, 6)
@@ -136,45 +255,62 @@ def stage_ami_wrapper(plan, magnet, turn_off=True):
 
             # Wait for the supply current to match the magnet.
             target = yield from rd(mag6t.field.current)
-            function = _difference_check(target, tolerance=0.01)
-            yield from abs_set(signal, mag6t.field.supply_current, function,
-                               wait=True)
+            yield from wait_for_condition(
+                (mag6t.field.supply_current,
+                 _difference_check(target, tolerance=0.01)),
+                name="AMI supply current", timeout=AMI_TIMEOUT
+            )
 
-            # Turn on persistance switch heater.
+            # Turn on persistance switch heater, and wait for it to be on.
+            group = short_uid('ami')
+            yield from wait_for_condition(
+                (mag6t.field.magnet_status,
+                 _transition_check(through=[AMI_HEATING_SWITCH],
+                                   target=[AMI_PAUSED])),
+                name="AMI switch heater on", group=group, wait=False,
+                timeout=AMI_TIMEOUT
+            )
             yield from mv(mag6t.field.switch_heater, 'On')
-            yield from sleep(2)
-
-            # Wait for the heater to be on.
-            function = _status_check(target=[3])
-            yield from abs_set(signal, mag6t.field.magnet_status, function,
-                               wait=True)
+            yield from wait(group)
 
             # Click current ramp button
             yield from mv(mag6t.field.ramp_button, 1)
 
     def _unstage():
+        # A field_series keeps the heater on between its plans.
+        if _heater_kept_on[0] > 0:
+            return
 
         # Wait for the voltage to be zero.
-        function = _difference_check(target=0.0, tolerance=0.02)
-        yield from abs_set(signal, mag6t.field.voltage, function,
-                           wait=True)
-
-        # Turn off persistance switch heater
-        yield from mv(mag6t.field.switch_heater, 'Off')
-        yield from sleep(2)
+        yield from wait_for_condition(
+            (mag6t.field.voltage, _difference_check(0.0, tolerance=0.02)),
+            name="AMI voltage", timeout=AMI_TIMEOUT
+        )
 
-        # Wait for the heater to be off.
-        function = _status_check(target=[2, 3])
-        yield from abs_set(signal, mag6t.field.magnet_status, function,
-                           wait=True)
+        # Turn off persistance switch heater, and wait for it to be off. It
+        # may be off already (quench, or turned off by hand), then the status
+        # never goes through cooling.
+        _heater_status = yield from rd(mag6t.field.switch_heater)
+        if _heater_status != 'Off':
+            group = short_uid('ami')
+            yield from wait_for_condition(
+                (mag6t.field.magnet_status,
+                 _transition_check(through=[AMI_COOLING_SWITCH],
+                                   target=[AMI_HOLDING, AMI_PAUSED])),
+                name="AMI switch heater off", group=group, wait=False,
+                timeout=AMI_TIMEOUT
+            )
+            yield from mv(mag6t.field.switch_heater, 'Off')
+            yield from wait(group)
 
-        # Wait for the current to go to zero.
+        # Wait for the supply current to go to zero.
         yield from mv(mag6t.field.zero_button, 1)
-        function = _status_check(target=[8])
-        yield from abs_set(
-            signal, mag6t.field.magnet_status, function, wait=True
+        yield from wait_for_condition(
+            (mag6t.field.magnet_status, _status_check([AMI_AT_ZERO])),
+            (mag6t.field.supply_current,
+             _difference_check(0.0, tolerance=0.01)),
+            name="AMI at zero", timeout=AMI_TIMEOUT
         )
-        yield from sleep(1)
 
     def _inner_plan():
         yield from _stage()
@@ -249,7 +385,81 @@ def configure_counts_wrapper(plan, detectors, count_time):
         return (yield from finalize_wrapper(_inner_plan(), reset()))
 
 
-def stage_dichro_wrapper(plan, dichro, lockin, positioner):
+def adaptive_counting_wrapper(plan, counting):
+    """
+    Stash the scaler preset used by `AdaptiveCounting` and restore it.
+
+    Parameters
+    ----------
+    plan : iterable or iterator
+        a generator, list, or similar containing `Msg` objects
+    counting : AdaptiveCounting or None
+        If None, the plan passes through unchanged.
+
+    Yields
+    ------
+    msg : Msg
+        messages from plan, with 'set' messages inserted
+    """
+    original_preset = []
+
+    def setup():
+        counting.reset()
+        original_preset.append(
+            (yield from rd(counting.scaler.preset_monitor))
+        )
+
+    def reset():
+        if len(original_preset) == 1:
+            yield from mv(counting.scaler.preset_monitor, original_preset[0])
+
+    def _inner_plan():
+        yield from setup()
+        return (yield from plan)
+
+    if counting is None:
+        return (yield from plan)
+    else:
+        return (yield from finalize_wrapper(_inner_plan(), reset()))
+
+
+def pipelined_step_wrapper(plan, pipeline):
+    """
+    Save the last point of a `PipelinedStep` scan before closing the run.
+
+    Parameters
+    ----------
+    plan : iterable or iterator
+        a generator, list, or similar containing `Msg` objects
+    pipeline : PipelinedStep or None
+        If None, the plan passes through unchanged.
+
+    Yields
+    ------
+    msg : Msg
+        messages from plan, with the last event inserted before 'close_run'
+    """
+
+    def _flush(msg):
+        # A failed run is closed without waiting for its readout.
+        if msg.command == 'close_run' and msg.kwargs.get('exit_status') in (
+                None, 'success'):
+            return pchain(pipeline.flush(), single_gen(msg)), None
+        return None, None
+
+    def _reset():
+        pipeline.reset()
+        yield from null()
+
+    if pipeline is None:
+        return (yield from plan)
+    else:
+        pipeline.reset()
+        return (yield from finalize_wrapper(plan_mutator(plan, _flush),
+                                            _reset()))
+
+
+def stage_dichro_wrapper(plan, dichro, lockin, positioner=None):
     """
     Stage dichoic scans.
 
@@ -261,6 +471,9 @@ def stage_dichro_wrapper(plan, dichro, lockin, positioner):
         Flag that triggers the stage/unstage process of dichro scans.
     lockin : boolean
         Flag that triggers the stage/unstage process of lockin scans.
+    positioner : list, optional
+        Scan arguments, the first item is the motor plotted against. The
+        other motors and the detectors are taken from the run hints.
 
     Yields
     ------
@@ -296,8 +509,9 @@ def stage_dichro_wrapper(plan, dichro, lockin, positioner):
 
         if dichro:
 
-            # TODO: This will only work for 1 motor and 1 detector!
-            plot_dichro_settings.settings.positioner = positioner[0].name
+            plot_dichro_settings.settings.positioner = (
+                positioner[0].name if positioner else None
+            )
             dichro_bec.enable_plots()
             bec.disable_plots()
 
@@ -335,5 +549,7 @@ def stage_dichro_wrapper(plan, dichro, lockin, positioner):
 
 extra_devices_decorator = make_decorator(extra_devices_wrapper)
 configure_counts_decorator = make_decorator(configure_counts_wrapper)
+adaptive_counting_decorator = make_decorator(adaptive_counting_wrapper)
+pipelined_step_decorator = make_decorator(pipelined_step_wrapper)
 stage_dichro_decorator = make_decorator(stage_dichro_wrapper)
 stage_ami_decorator = make_decorator(stage_ami_wrapper)
@@ -11,24 +11,39 @@ from bluesky.plans import (
     scan, list_scan, grid_scan as bp_grid_scan, count as bp_count
 )
 from bluesky.plan_stubs import (
-    trigger_and_read, move_per_step, mv as bps_mv, rd, abs_set as bps_abs_set
+    trigger_and_read, move_per_step, mv as bps_mv, rd, abs_set as bps_abs_set,
+    null, one_nd_step
 )
 from bluesky.preprocessors import (
-    reset_positions_decorator, relative_set_decorator
+    reset_positions_decorator, relative_set_decorator, finalize_wrapper
 )
 from bluesky.plan_patterns import chunk_outer_product_args
+from bluesky.utils import Msg, short_uid
+from dataclasses import dataclass, field
+from functools import partial
+from itertools import count as count_from
+from ophyd import Signal
+from numbers import Number
 from ..devices import (scalerd, pr_setup, mag6t, undulator, fourc,
-                       pr1, pr2, pr3, energy, qxscan_params)
+                       pr1, pr2, pr3, energy, mono, qxscan_params)
+from ..devices._lazy import is_built, resolve_device
+from ..devices._preset_schedule import PresetScheduleMixin
 from .local_preprocessors import (configure_counts_decorator,
                                   stage_dichro_decorator,
                                   stage_ami_decorator,
-                                  extra_devices_decorator)
+                                  extra_devices_decorator,
+                                  adaptive_counting_decorator,
+                                  pipelined_step_decorator)
+from .adaptive_counting import AdaptiveCounting
+from .pipelined_steps import PipelinedStep
+from .fly_scans import energy_fly_scan
+from .grid_optimizer import optimize_grid
 from ..utils import counters
 from ..devices.ad_eiger import (
     EigerDetectorImageTrigger, EigerDetectorTimeTrigger
 )
 from ..framework import RE
-from numpy import array
+from numpy import asarray, linspace
 
 try:
     # cytools is a drop-in replacement for toolz, implemented in Cython
@@ -42,15 +57,84 @@ logger.info(__file__)
 EIGER_DETECTORS = (EigerDetectorImageTrigger, EigerDetectorTimeTrigger)
 
 
-class LocalFlag:
-    """Stores flags that are used to select and run local scans."""
-    dichro = False
-    fixq = False
-    hkl_pos = {}
-    dichro_steps = None
+@dataclass(frozen=True)
+class LocalContext:
+    """
+    Settings of the inner loop of the local scans.
 
+    It is built once, when the plan starts, and passed to `one_local_step` or
+    `one_local_shot`. Each plan has its own context, so plans can be nested or
+    generated ahead of time without changing each other.
 
-flag = LocalFlag()
+    Attributes
+    ----------
+    dichro : boolean
+        Switch the x-ray polarization at every point.
+    burst : boolean
+        Save all the polarizations of a point as one event (see
+        `dichro_burst`).
+    fixq : boolean
+        Move the diffractometer back to `hkl` at every point.
+    hkl : tuple
+        The (h, k, l) position to keep in fixQ scans.
+    dichro_steps : tuple
+        Positions of the phase retarder for each polarization.
+    take_reading : callable
+        Replaces the `take_reading` given by the bluesky plan, for instance
+        `AdaptiveCounting.take_reading`.
+    burst_signals : dict
+        Soft signals that hold the burst dichro readings of this plan, by
+        field name.
+    """
+    dichro: bool = False
+    burst: bool = False
+    fixq: bool = False
+    hkl: tuple = None
+    dichro_steps: tuple = ()
+    take_reading: object = None
+    burst_signals: dict = field(default_factory=dict, compare=False,
+                                repr=False)
+
+    @property
+    def needed(self):
+        """True if the scan needs the local inner loop."""
+        return self.dichro or self.fixq or self.take_reading is not None
+
+
+def _make_context(dichro=False, burst=False, fixq=False, counting=None):
+    """Reads the current dichro and fixQ settings into a `LocalContext`."""
+    if burst and dichro and counting is not None:
+        raise ValueError("Adaptive counting cannot be used in burst dichro "
+                         "scans.")
+
+    dichro_steps = ()
+    if dichro:
+        _offset = pr_setup.offset.get()
+        _center = pr_setup.positioner.parent.center.get()
+        _steps = pr_setup.dichro_steps
+        dichro_steps = tuple(_center + step*_offset for step in _steps)
+
+    hkl = None
+    if fixq:
+        hkl = (
+            fourc.h.get().setpoint,
+            fourc.k.get().setpoint,
+            fourc.l.get().setpoint,
+        )
+
+    take_reading = counting.take_reading if counting is not None else None
+
+    return LocalContext(dichro=dichro, burst=burst, fixq=fixq, hkl=hkl,
+                        dichro_steps=dichro_steps, take_reading=take_reading)
+
+
+def _magnet_in(args):
+    """
+    Check if the magnetic field is one of the positioners in `args`.
+
+    `mag6t` is only built when used, so it cannot be in `args` before that.
+    """
+    return is_built(mag6t) and mag6t.field in args
 
 
 def _collect_extras(escan_flag, fourc_flag):
@@ -67,30 +151,103 @@ def _collect_extras(escan_flag, fourc_flag):
                 extras.append(pr.th)
 
     if fourc_flag:
-        extras.append(fourc)
+        extras.append(resolve_device(fourc))
 
     return extras
 
 
-def dichro_steps(devices_to_read, take_reading):
+def _adaptive_counting(target_error, max_time):
+    """Builds the `AdaptiveCounting` of a scan, if `target_error` is set."""
+    if target_error is None:
+        return None
+    return AdaptiveCounting(target_error, max_time=max_time)
+
+
+def _pipelined_step(per_step, context):
+    """
+    Replaces per_step="pipelined" by a `PipelinedStep`.
+
+    Returns the `per_step` to use and the `PipelinedStep`, or None.
+    """
+    if not isinstance(per_step, str):
+        return per_step, None
+    if per_step != "pipelined":
+        raise ValueError(f"Unknown per_step: {per_step}.")
+    if context.needed:
+        raise ValueError("per_step='pipelined' cannot be used with dichro, "
+                         "fixq or target_error.")
+    pipeline = PipelinedStep()
+    return pipeline, pipeline
+
+
+def dichro_steps(devices_to_read, take_reading, context):
     """
     Switch the x-ray polarization for each scan point.
     This will increase the number of points in a scan by a factor that is equal
     to the length of the `pr_setup.dichro_steps` list.
     """
     devices_to_read += [pr_setup.positioner]
-    for pos in flag.dichro_steps:
+    for pos in context.dichro_steps:
         yield from mv(pr_setup.positioner, pos)
         yield from take_reading(devices_to_read)
 
 
-def one_local_step(detectors, step, pos_cache, take_reading=trigger_and_read):
+def _burst_signal(context, name):
+    # Reused so that all the events of a run share the same descriptor, and
+    # kept in the context so that each plan has its own.
+    if name not in context.burst_signals:
+        context.burst_signals[name] = Signal(name=name, value=[])
+    return context.burst_signals[name]
+
+
+def dichro_burst(devices_to_read, detectors, take_reading, context):
+    """
+    Acquire all the x-ray polarizations and save them as one event.
+
+    The detectors are triggered and read at each polarization state without
+    creating events, and the positioner only moves when the state changes.
+    The numeric readings are then saved in a single event as arrays with one
+    value per state, in the order of `pr_setup.dichro_steps`. Non-numeric
+    fields (like image file references) are not saved.
+    """
+    burst_devices = list(detectors) + [pr_setup.positioner]
+    other_devices = [dev for dev in devices_to_read if dev not in detectors]
+
+    readings = {}
+    position = None
+    for pos in context.dichro_steps:
+        if pos != position:
+            yield from mv(pr_setup.positioner, pos)
+            position = pos
+
+        group = short_uid('burst')
+        for det in detectors:
+            yield Msg('trigger', det, group=group)
+        yield Msg('wait', None, group=group)
+
+        for device in burst_devices:
+            reading = yield Msg('read', device)
+            for key, item in reading.items():
+                if isinstance(item['value'], Number):
+                    readings.setdefault(key, []).append(item['value'])
+
+    signals = []
+    for key, values in readings.items():
+        signal = _burst_signal(context, key)
+        signal.put(asarray(values))
+        signals.append(signal)
+
+    yield from take_reading(other_devices + signals)
+
+
+def one_local_step(detectors, step, pos_cache, take_reading=trigger_and_read,
+                   *, context=None):
     """
     Inner loop for fixQ and dichro scans.
 
     It is always called in the local plans defined here. It is used as a
-    `per_step` kwarg in Bluesky scan plans, such as `bluesky.plans.scan`. But
-    note that it requires the `LocalFlag` class.
+    `per_step` kwarg in Bluesky scan plans, such as `bluesky.plans.scan`, with
+    the context bound using `functools.partial`.
 
     Parameters
     ----------
@@ -106,31 +263,41 @@ def one_local_step(detectors, step, pos_cache, take_reading=trigger_and_read):
                 yield from ...
         Callable[List[OphydObj], Optional[str]] -> Generator[Msg], optional
         Defaults to `trigger_and_read`
+    context : LocalContext, optional
+        Settings of this scan, see `_make_context`. Defaults to a plain step.
     """
 
+    if context is None:
+        context = LocalContext()
+    if context.take_reading is not None:
+        take_reading = context.take_reading
+
     devices_to_read = list(step.keys()) + list(detectors)
     yield from move_per_step(step, pos_cache)
 
-    if flag.fixq:
-        devices_to_read += [fourc]
-        args = (fourc.h, flag.hkl_pos[fourc.h],
-                fourc.k, flag.hkl_pos[fourc.k],
-                fourc.l, flag.hkl_pos[fourc.l])
+    if context.fixq:
+        devices_to_read += [resolve_device(fourc)]
+        args = (fourc.h, context.hkl[0],
+                fourc.k, context.hkl[1],
+                fourc.l, context.hkl[2])
         yield from bps_mv(*args)
 
-    if flag.dichro:
-        yield from dichro_steps(devices_to_read, take_reading)
+    if context.dichro and context.burst:
+        yield from dichro_burst(devices_to_read, detectors, take_reading,
+                                context)
+    elif context.dichro:
+        yield from dichro_steps(devices_to_read, take_reading, context)
     else:
         yield from take_reading(devices_to_read)
 
 
-def one_local_shot(detectors, take_reading=trigger_and_read):
+def one_local_shot(detectors, take_reading=trigger_and_read, *, context=None):
     """
     Inner loop for fixQ and dichro scans.
     To be used as a `per_shot` kwarg in the Bluesky `bluesky.plans.count`.
     It is always called in the local `count` plan defined here. It is used as a
-    `per_shot` kwarg in the Bluesky `bluesky.plans.count`. But note that it
-    requires the `LocalFlag` class.
+    `per_shot` kwarg in the Bluesky `bluesky.plans.count`, with the context
+    bound using `functools.partial`.
     Parameters
     ----------
     detectors : iterable
@@ -141,17 +308,28 @@ def one_local_shot(detectors, take_reading=trigger_and_read):
                 yield from ...
         Callable[List[OphydObj], Optional[str]] -> Generator[Msg], optional
         Defaults to `trigger_and_read`
+    context : LocalContext, optional
+        Settings of this count, see `_make_context`. Defaults to a plain shot.
     """
 
+    if context is None:
+        context = LocalContext()
+    if context.take_reading is not None:
+        take_reading = context.take_reading
+
     devices_to_read = list(detectors)
-    if flag.dichro:
-        yield from dichro_steps(devices_to_read, take_reading)
+    if context.dichro and context.burst:
+        yield from dichro_burst(devices_to_read, detectors, take_reading,
+                                context)
+    elif context.dichro:
+        yield from dichro_steps(devices_to_read, take_reading, context)
     else:
         yield from take_reading(devices_to_read)
 
 
 def count(detectors=None, num=1, time=None, delay=0, lockin=False,
-          dichro=False, md=None):
+          dichro=False, burst=False, target_error=None, max_time=10,
+          md=None):
     """
     Take one or more readings from detectors.
     This is a local version of `bluesky.plans.count`. Note that the `per_shot`
@@ -169,6 +347,18 @@ def count(detectors=None, num=1, time=None, delay=0, lockin=False,
         detectors need to have a .preset_monitor signal.
     delay : iterable or scalar, optional
         Time delay in seconds between successive readings; default is 0.
+    burst : boolean, optional
+        Flag for a fast dichro count. All the polarization states of a shot
+        are acquired in one burst and saved as a single event, in which each
+        detector field holds an array with one value per state. Only used if
+        dichro is True.
+    target_error : float, optional
+        If a number is passed, the scaler counts each reading until the
+        relative error of detector/monitor reaches this value, or until
+        `max_time`. See :class:`AdaptiveCounting`.
+    max_time : float, optional
+        Maximum count time of each reading in seconds when using
+        `target_error`.
     md : dict, optional
         metadata
     Notes
@@ -181,15 +371,11 @@ def count(detectors=None, num=1, time=None, delay=0, lockin=False,
     if detectors is None:
         detectors = counters.detectors
 
-    flag.dichro = dichro
-    if dichro:
-        _offset = pr_setup.offset.get()
-        _center = pr_setup.positioner.parent.center.get()
-        _steps = pr_setup.dichro_steps
-        flag.dichro_steps = [_center + step*_offset for step in _steps]
-
-    flag.fixq = fixq
-    per_shot = one_local_shot if fixq or dichro else None
+    counting = _adaptive_counting(target_error, max_time)
+    context = _make_context(dichro, burst, fixq, counting)
+    per_shot = (
+        partial(one_local_shot, context=context) if context.needed else None
+    )
 
     extras = yield from _collect_extras(False, False)
 
@@ -211,6 +397,7 @@ def count(detectors=None, num=1, time=None, delay=0, lockin=False,
     _md.update(md or {})
 
     @configure_counts_decorator(detectors, time)
+    @adaptive_counting_decorator(counting)
     @stage_ami_decorator(False)
     @stage_dichro_decorator(dichro, lockin)
     @extra_devices_decorator(extras)
@@ -226,7 +413,8 @@ def count(detectors=None, num=1, time=None, delay=0, lockin=False,
 
 
 def ascan(*args, time=None, detectors=None, lockin=False, dichro=False,
-          fixq=False, per_step=None, md=None):
+          burst=False, fixq=False, per_step=None, fly=False,
+          target_error=None, max_time=10, md=None):
     """
     Scan over one multi-motor trajectory.
 
@@ -259,14 +447,34 @@ def ascan(*args, time=None, detectors=None, lockin=False, dichro=False,
         dichro scan. Note that this will switch the x-ray polarization at every
         point using the +, -, -, + sequence, thus increasing the number of
         points by a factor of 4
+    burst : boolean, optional
+        Flag for a fast dichro scan. All the polarization states of a point
+        are acquired in one burst and saved as a single event, in which each
+        detector field holds an array with one value per state. Only used if
+        dichro is True.
     fixq : boolean, optional
         Flag for fixQ scans. If True, it will fix the diffractometer hkl
         position during the scan. This is particularly useful for energy scan.
         Note that hkl is moved ~after~ the other motors!
-    per_step: callable, optional
+    per_step: callable or "pipelined", optional
         hook for customizing action of inner loop (messages per step).
         See docstring of :func:`bluesky.plan_stubs.one_nd_step` (the default)
-        for details.
+        for details. With "pipelined", the motors move to the next point
+        while the detectors of this point are read out, see
+        :class:`PipelinedStep`.
+    fly : boolean, optional
+        Flag for a continuous energy scan, only possible if the only motor is
+        `energy`. The energy is swept from start to stop while the detectors
+        count, and the counts are then rebinned onto the requested points. In
+        this case `time` is the count time of each raw reading. See
+        :func:`energy_fly_scan`.
+    target_error : float, optional
+        If a number is passed, the scaler counts each reading until the
+        relative error of detector/monitor reaches this value, or until
+        `max_time`. See :class:`AdaptiveCounting`.
+    max_time : float, optional
+        Maximum count time of each reading in seconds when using
+        `target_error`.
     md : dictionary, optional
         Metadata to be added to the run start.
 
@@ -275,22 +483,16 @@ def ascan(*args, time=None, detectors=None, lockin=False, dichro=False,
     :func:`bluesky.plans.scan`
     :func:`lup`
     """
-    flag.dichro = dichro
-    if dichro:
-        _offset = pr_setup.offset.get()
-        _center = pr_setup.positioner.parent.center.get()
-        _steps = pr_setup.dichro_steps
-        flag.dichro_steps = [_center + step*_offset for step in _steps]
+    if fly and (dichro or lockin or fixq or per_step is not None or
+                target_error is not None):
+        raise ValueError("fly cannot be used with dichro, lockin, fixq, "
+                         "per_step or target_error.")
 
-    flag.fixq = fixq
-    if per_step is None:
-        per_step = one_local_step if fixq or dichro else None
-    if fixq:
-        flag.hkl_pos = {
-            fourc.h: fourc.h.get().setpoint,
-            fourc.k: fourc.k.get().setpoint,
-            fourc.l: fourc.l.get().setpoint,
-        }
+    counting = _adaptive_counting(target_error, max_time)
+    context = _make_context(dichro, burst, fixq, counting)
+    per_step, pipeline = _pipelined_step(per_step, context)
+    if per_step is None and context.needed:
+        per_step = partial(one_local_step, context=context)
 
     # This allows passing "time" without using the keyword.
     if len(args) % 3 == 2 and time is None:
@@ -317,13 +519,28 @@ def ascan(*args, time=None, detectors=None, lockin=False, dichro=False,
         _md['hints']['scan_type'] += " dichro"
     if lockin:
         _md['hints']['scan_type'] += " lockin"
+    if fly:
+        _md['hints']['scan_type'] += " fly"
 
     _md.update(md or {})
 
+    if fly:
+        if len(args) != 4 or args[0] not in (energy, mono.energy):
+            raise ValueError("fly can only be used to scan the energy, "
+                             "args must be: energy, start, stop, number of "
+                             "points.")
+        _, start, stop, num = args
+        return (yield from energy_fly_scan(
+            detectors, linspace(start, stop, num), time=time,
+            positioner=args[0], md=_md
+        ))
+
     @configure_counts_decorator(detectors, time)
-    @stage_ami_decorator(mag6t.field in args)
+    @adaptive_counting_decorator(counting)
+    @stage_ami_decorator(_magnet_in(args))
     @stage_dichro_decorator(dichro, lockin, args)
     @extra_devices_decorator(extras)
+    @pipelined_step_decorator(pipeline)
     def _inner_ascan():
         yield from scan(
             detectors + extras,
@@ -336,7 +553,8 @@ def ascan(*args, time=None, detectors=None, lockin=False, dichro=False,
 
 
 def lup(*args, time=None, detectors=None, lockin=False, dichro=False,
-        fixq=False, per_step=None, md=None):
+        burst=False, fixq=False, per_step=None, target_error=None,
+        max_time=10, md=None):
     """
     Scan over one multi-motor trajectory relative to current position.
 
@@ -369,14 +587,28 @@ def lup(*args, time=None, detectors=None, lockin=False, dichro=False,
         dichro scan. Note that this will switch the x-ray polarization at every
         point using the +, -, -, + sequence, thus increasing the number of
         points by a factor of 4
+    burst : boolean, optional
+        Flag for a fast dichro scan. All the polarization states of a point
+        are acquired in one burst and saved as a single event, in which each
+        detector field holds an array with one value per state. Only used if
+        dichro is True.
     fixq : boolean, optional
         Flag for fixQ scans. If True, it will fix the diffractometer hkl
         position during the scan. This is particularly useful for energy scan.
         Note that hkl is moved ~after~ the other motors!
-    per_step: callable, optional
+    per_step: callable or "pipelined", optional
         hook for customizing action of inner loop (messages per step).
         See docstring of :func:`bluesky.plan_stubs.one_nd_step` (the default)
-        for details.
+        for details. With "pipelined", the motors move to the next point
+        while the detectors of this point are read out, see
+        :class:`PipelinedStep`.
+    target_error : float, optional
+        If a number is passed, the scaler counts each reading until the
+        relative error of detector/monitor reaches this value, or until
+        `max_time`. See :class:`AdaptiveCounting`.
+    max_time : float, optional
+        Maximum count time of each reading in seconds when using
+        `target_error`.
     md : dictionary, optional
         Metadata to be added to the run start.
 
@@ -400,6 +632,9 @@ def lup(*args, time=None, detectors=None, lockin=False, dichro=False,
             detectors=detectors,
             lockin=lockin,
             dichro=dichro,
+            burst=burst,
+            target_error=target_error,
+            max_time=max_time,
             fixq=fixq,
             per_step=per_step,
             md=_md
@@ -409,7 +644,8 @@ def lup(*args, time=None, detectors=None, lockin=False, dichro=False,
 
 
 def grid_scan(*args, time=None, detectors=None, snake_axes=None, lockin=False,
-              dichro=False, fixq=False, per_step=None, md=None):
+              dichro=False, burst=False, fixq=False, per_step=None,
+              target_error=None, max_time=10, optimize=False, md=None):
     """
     Scan over a mesh; each motor is on an independent trajectory.
     Parameters
@@ -444,14 +680,32 @@ def grid_scan(*args, time=None, detectors=None, snake_axes=None, lockin=False,
         dichro scan. Note that this will switch the x-ray polarization at every
         point using the +, -, -, + sequence, thus increasing the number of
         points by a factor of 4
+    burst : boolean, optional
+        Flag for a fast dichro scan. All the polarization states of a point
+        are acquired in one burst and saved as a single event, in which each
+        detector field holds an array with one value per state. Only used if
+        dichro is True.
     fixq : boolean, optional
         Flag for fixQ scans. If True, it will fix the diffractometer hkl
         position during the scan. This is particularly useful for energy scan.
         Note that hkl is moved ~after~ the other motors!
-    per_step: callable, optional
+    per_step: callable or "pipelined", optional
         hook for customizing action of inner loop (messages per step).
         See docstring of :func:`bluesky.plan_stubs.one_nd_step` (the default)
-        for details.
+        for details. With "pipelined", the motors move to the next point
+        while the detectors of this point are read out, see
+        :class:`PipelinedStep`.
+    target_error : float, optional
+        If a number is passed, the scaler counts each reading until the
+        relative error of detector/monitor reaches this value, or until
+        `max_time`. See :class:`AdaptiveCounting`.
+    max_time : float, optional
+        Maximum count time of each reading in seconds when using
+        `target_error`.
+    optimize : boolean, optional
+        If True, the axis order and snaking are chosen to minimize the
+        predicted move time, see :func:`optimize_grid`. The first motor is
+        then not necessarily the slowest axis.
     md: dict, optional
         metadata
 
@@ -463,29 +717,21 @@ def grid_scan(*args, time=None, detectors=None, snake_axes=None, lockin=False,
     :func:`bluesky.plans.scan_nd`
     """
 
-    flag.dichro = dichro
-    if dichro:
-        _offset = pr_setup.offset.get()
-        _center = pr_setup.positioner.parent.center.get()
-        _steps = pr_setup.dichro_steps
-        flag.dichro_steps = [_center + step*_offset for step in _steps]
-
-    flag.fixq = fixq
-    if per_step is None:
-        per_step = one_local_step if fixq or dichro else None
-
-    if fixq:
-        flag.hkl_pos = {
-            fourc.h: fourc.h.get().setpoint,
-            fourc.k: fourc.k.get().setpoint,
-            fourc.l: fourc.l.get().setpoint,
-        }
+    counting = _adaptive_counting(target_error, max_time)
+    context = _make_context(dichro, burst, fixq, counting)
+    per_step, pipeline = _pipelined_step(per_step, context)
+    if per_step is None and context.needed:
+        per_step = partial(one_local_step, context=context)
 
     # This allows passing "time" without using the keyword.
     if len(args) % 4 == 1 and time is None:
         time = args[-1]
         args = args[:-1]
 
+    if optimize:
+        result = optimize_grid(*args, snake_axes=snake_axes)
+        args, snake_axes = result['args'], result['snake_axes']
+
     if detectors is None:
         detectors = counters.detectors
 
@@ -510,9 +756,11 @@ def grid_scan(*args, time=None, detectors=None, snake_axes=None, lockin=False,
     _md.update(md or {})
 
     @configure_counts_decorator(detectors, time)
-    @stage_ami_decorator(mag6t.field in args)
+    @adaptive_counting_decorator(counting)
+    @stage_ami_decorator(_magnet_in(args))
     @stage_dichro_decorator(dichro, lockin, args)
     @extra_devices_decorator(extras)
+    @pipelined_step_decorator(pipeline)
     def _inner_grid_scan():
         yield from bp_grid_scan(
             detectors + extras,
@@ -525,8 +773,9 @@ def grid_scan(*args, time=None, detectors=None, snake_axes=None, lockin=False,
 
 
 def rel_grid_scan(*args, time=None, detectors=None, snake_axes=None,
-                  lockin=False, dichro=False, fixq=False, per_step=None,
-                  md=None):
+                  lockin=False, dichro=False, burst=False, fixq=False,
+                  per_step=None, target_error=None, max_time=10,
+                  optimize=False, md=None):
     """
     Scan over a mesh relative to current position.
 
@@ -564,14 +813,32 @@ def rel_grid_scan(*args, time=None, detectors=None, snake_axes=None,
         dichro scan. Note that this will switch the x-ray polarization at every
         point using the +, -, -, + sequence, thus increasing the number of
         points by a factor of 4
+    burst : boolean, optional
+        Flag for a fast dichro scan. All the polarization states of a point
+        are acquired in one burst and saved as a single event, in which each
+        detector field holds an array with one value per state. Only used if
+        dichro is True.
     fixq : boolean, optional
         Flag for fixQ scans. If True, it will fix the diffractometer hkl
         position during the scan. This is particularly useful for energy scan.
         Note that hkl is moved ~after~ the other motors!
-    per_step: callable, optional
+    per_step: callable or "pipelined", optional
         hook for customizing action of inner loop (messages per step).
         See docstring of :func:`bluesky.plan_stubs.one_nd_step` (the default)
-        for details.
+        for details. With "pipelined", the motors move to the next point
+        while the detectors of this point are read out, see
+        :class:`PipelinedStep`.
+    target_error : float, optional
+        If a number is passed, the scaler counts each reading until the
+        relative error of detector/monitor reaches this value, or until
+        `max_time`. See :class:`AdaptiveCounting`.
+    max_time : float, optional
+        Maximum count time of each reading in seconds when using
+        `target_error`.
+    optimize : boolean, optional
+        If True, the axis order and snaking are chosen to minimize the
+        predicted move time, see :func:`optimize_grid`. The first motor is
+        then not necessarily the slowest axis.
     md: dict, optional
         metadata
 
@@ -598,8 +865,12 @@ def rel_grid_scan(*args, time=None, detectors=None, snake_axes=None,
             snake_axes=snake_axes,
             lockin=lockin,
             dichro=dichro,
+            burst=burst,
+            target_error=target_error,
+            max_time=max_time,
             fixq=fixq,
             per_step=per_step,
+            optimize=optimize,
             md=_md
         ))
 
@@ -607,7 +878,8 @@ def rel_grid_scan(*args, time=None, detectors=None, snake_axes=None,
 
 
 def qxscan(edge_energy, time=None, detectors=None, lockin=False, dichro=False,
-           fixq=False, md=None):
+           burst=False, fixq=False, fly=False, target_error=None, max_time=10,
+           md=None):
     """
     Energy scan with fixed delta_K steps.
 
@@ -633,10 +905,28 @@ def qxscan(edge_energy, time=None, detectors=None, lockin=False, dichro=False,
         dichro scan. Note that this will switch the x-ray polarization at every
         point using the +, -, -, + sequence, thus increasing the number of
         points by a factor of 4
+    burst : boolean, optional
+        Flag for a fast dichro scan. All the polarization states of a point
+        are acquired in one burst and saved as a single event, in which each
+        detector field holds an array with one value per state. Only used if
+        dichro is True.
     fixq : boolean, optional
         Flag for fixQ scans. If True, it will fix the diffractometer hkl
         position during the scan. Note that hkl is moved ~after~ the other
         motors!
+    fly : boolean, optional
+        Flag for a continuous energy scan. The energy is swept through the
+        qxscan range while the detectors count, and the counts are then
+        rebinned onto the qxscan points. In this case `time` is the count time
+        of each raw reading, and the qxscan_params factors are not used. See
+        :func:`energy_fly_scan`.
+    target_error : float, optional
+        If a number is passed, the scaler counts each reading until the
+        relative error of detector/monitor reaches this value, or until
+        `max_time`. See :class:`AdaptiveCounting`.
+    max_time : float, optional
+        Maximum count time of each reading in seconds when using
+        `target_error`.
     md : dictionary, optional
         Metadata to be added to the run start.
 
@@ -646,28 +936,22 @@ def qxscan(edge_energy, time=None, detectors=None, lockin=False, dichro=False,
     :func:`lup`
     """
 
+    if fly and (dichro or lockin or fixq or target_error is not None):
+        raise ValueError("fly cannot be used with dichro, lockin, fixq or "
+                         "target_error.")
+
     if detectors is None:
         detectors = counters.detectors
 
-    flag.dichro = dichro
-    if dichro:
-        _offset = pr_setup.offset.get()
-        _center = pr_setup.positioner.parent.center.get()
-        _steps = pr_setup.dichro_steps
-        flag.dichro_steps = [_center + step*_offset for step in _steps]
-
-    flag.fixq = fixq
-    per_step = one_local_step if fixq or dichro else None
-    if fixq:
-        flag.hkl_pos = {
-            fourc.h: fourc.h.get().setpoint,
-            fourc.k: fourc.k.get().setpoint,
-            fourc.l: fourc.l.get().setpoint,
-        }
+    counting = _adaptive_counting(target_error, max_time)
+    context = _make_context(dichro, burst, fixq, counting)
+    per_step = (
+        partial(one_local_step, context=context) if context.needed else None
+    )
 
     # Get energy argument and extras
     energy_list = yield from rd(qxscan_params.energy_list)
-    args = (energy, array(energy_list) + edge_energy)
+    args = (energy, asarray(energy_list) + edge_energy)
 
     extras = yield from _collect_extras(energy in args, "fourc" in str(args))
 
@@ -685,9 +969,16 @@ def qxscan(edge_energy, time=None, detectors=None, lockin=False, dichro=False,
         _md['hints']['scan_type'] += " dichro"
     if lockin:
         _md['hints']['scan_type'] += " lockin"
+    if fly:
+        _md['hints']['scan_type'] += " fly"
 
     _md.update(md or {})
 
+    if fly:
+        return (yield from energy_fly_scan(
+            detectors, args[1], time=time, positioner=energy, md=_md
+        ))
+
     _ct = {}
     if time:
         if time < 0 and detectors != [scalerd]:
@@ -695,23 +986,60 @@ def qxscan(edge_energy, time=None, detectors=None, lockin=False, dichro=False,
         else:
             for det in detectors:
                 _ct[det] = abs(time)
-                args += (det.preset_monitor, abs(time)*array(factor_list))
     else:
         for det in detectors:
             _ct[det] = yield from rd(det.preset_monitor)
-            args += (det.preset_monitor, _ct[det]*array(factor_list))
+
+    # Detectors that support it apply the count time themselves at each
+    # trigger, the others need the preset_monitor as an extra scan axis.
+    # The time of an adaptive counting scaler is not scheduled.
+    _scheduled = []
+    for det in detectors:
+        if counting is not None and det is counting.scaler:
+            continue
+        elif isinstance(det, PresetScheduleMixin):
+            _scheduled.append(det)
+        else:
+            args += (det.preset_monitor, _ct[det]*asarray(factor_list))
+
+    def _load_schedules():
+        for det in _scheduled:
+            det.set_preset_schedule(_ct[det]*asarray(factor_list))
+        yield from null()
+
+    # The point is selected right after a checkpoint, so the triggers that
+    # are replayed after a pause or a suspender use the preset of their own
+    # point.
+    _points = count_from(0)
+    _step = per_step if per_step is not None else one_nd_step
+
+    def _scheduled_step(detectors, step, pos_cache, *args, **kwargs):
+        point = next(_points)
+        yield Msg('checkpoint')
+        for det in _scheduled:
+            det.select_preset_point(point)
+        return (yield from _step(detectors, step, pos_cache, *args, **kwargs))
+
+    def _restore_times():
+        for det in _scheduled:
+            det.clear_preset_schedule()
+        # put original times back.
+        for det, preset in _ct.items():
+            yield from mv(det.preset_monitor, preset)
 
     @configure_counts_decorator(detectors, time)
+    @adaptive_counting_decorator(counting)
     @stage_dichro_decorator(dichro, lockin, args)
     @extra_devices_decorator(extras)
     def _inner_qxscan():
-        yield from list_scan(
-            detectors + extras, *args, per_step=per_step, md=_md
-            )
+        def _scan():
+            yield from _load_schedules()
+            yield from list_scan(
+                detectors + extras, *args,
+                per_step=_scheduled_step if _scheduled else per_step, md=_md
+                )
 
-        # put original times back.
-        for det, preset in _ct.items():
-            yield from mv(det.preset_monitor, preset)
+        yield from finalize_wrapper(_scan(), _restore_times())
 
     return (yield from _inner_qxscan())
 
@@ -738,7 +1066,7 @@ def mv(*args, **kwargs):
     --------
     :func:`bluesky.plan_stubs.mv`
     """
-    @stage_ami_decorator(mag6t.field in args)
+    @stage_ami_decorator(_magnet_in(args))
     def _inner_mv():
         yield from bps_mv(*args, **kwargs)
 
@@ -807,7 +1135,7 @@ def abs_set(*args, **kwargs):
     :func:`bluesky.plan_stubs.mv`
     """
 
-    @stage_ami_decorator(mag6t.field in args, turn_off=False)
+    @stage_ami_decorator(_magnet_in(args), turn_off=False)
     def _inner_abs_set():
         yield from bps_abs_set(*args, **kwargs)
 
@@ -3,17 +3,17 @@ Plan to open shutters
 """
 
 from ..devices import ashutter, bshutter, dshutter, status4id
-from .local_preprocessors import _difference_check, SetSignal
+from .local_preprocessors import _difference_check, wait_for_condition
 from .local_scans import mv
-from bluesky.plan_stubs import abs_set, rd
+from bluesky.plan_stubs import rd
 from toolz import partition
 
 __all__ = [
     'shopen',
     'shclose'
 ]
-# 30 sec timeout.
-signal = SetSignal(name='tmp', timeout=30)
+# Seconds to wait for the hutch searches.
+SEARCH_TIMEOUT = 30
 
 
 def shopen(hutch="d"):
@@ -48,11 +48,12 @@ def shopen(hutch="d"):
                     f"{getattr(shutter, permit).name} is not enabled!"
                 )
 
-        # Wait for search to end. Timeout is defined above.
-        function = _difference_check(1, tolerance=0.1)
-        yield from abs_set(
-            signal, getattr(shutter, "searched"), function, wait=True,
-        )
+    # Wait for the searches to end, all hutches at once.
+    yield from wait_for_condition(
+        *[(getattr(shutter, "searched"), _difference_check(1, tolerance=0.1))
+          for shutter, _ in partition(2, args)],
+        timeout=SEARCH_TIMEOUT, name="shutter search"
+    )
 
     yield from mv(*args)
 
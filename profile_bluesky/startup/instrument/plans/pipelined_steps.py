@@ -0,0 +1,150 @@
+"""
+Step scans that move to the next point during the detector readout.
+"""
+
+__all__ = ['PipelinedStep']
+
+import asyncio
+from bluesky.plan_stubs import trigger_and_read
+from bluesky.utils import Msg, short_uid, separate_devices
+from ophyd import Signal
+
+from ..session_logs import logger
+logger.info(__file__)
+
+
+def _is_pipelined(device):
+    """ Devices that report the end of the acquisition before the readout. """
+    return hasattr(device, 'acquisition_status')
+
+
+def _status_done(status):
+    """ Awaitable factory for Msg('wait_for') that finishes with `status`. """
+    def factory():
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        def _set_result():
+            if not future.done():
+                future.set_result(None)
+
+        status.add_callback(lambda st: loop.call_soon_threadsafe(_set_result))
+        return future
+    return factory
+
+
+class PipelinedStep:
+    """
+    `per_step` that overlaps the move to the next point with the readout.
+
+    Some detectors take much longer to finish a trigger than to acquire,
+    because the data still has to be read out or written to file (for
+    instance the Xspress3, or the Eiger with a time trigger). These detectors
+    keep the status of the acquisition alone in `acquisition_status`. At each
+    point, once all the acquisitions are done, the other devices (motors,
+    scaler, extras) are read and the plan returns without waiting for the
+    readout. The next call starts moving the motors, and only then waits for
+    the readout and saves the previous event.
+
+    The readings of the other devices are kept with the point they belong
+    to, and saved through soft signals with the same names, so the event
+    holds the positions where the detectors acquired and not the positions of
+    the move in progress. If no detector has an `acquisition_status`, every
+    point is read with `take_reading` as usual.
+
+    The last point is saved by `flush`, which has to run before the run is
+    closed (see `pipelined_step_wrapper`).
+    """
+
+    def __init__(self):
+        self._pending = None
+        self._signals = {}
+
+    def _signal(self, name):
+        # Reused so that all the events of a run share the same descriptor.
+        if name not in self._signals:
+            self._signals[name] = Signal(name=name, value=0)
+        return self._signals[name]
+
+    def reset(self):
+        """ Forgets a readout that was not saved. """
+        self._pending = None
+
+    @property
+    def pending(self):
+        """ True if a point is waiting for its readout to be saved. """
+        return self._pending is not None
+
+    def flush(self):
+        """ Waits for the pending readout and saves its event. """
+        if self._pending is None:
+            return
+        group, detectors, readings = self._pending
+        self._pending = None
+
+        yield Msg('wait', None, group=group)
+        yield Msg('create', name='primary')
+        for det in detectors:
+            yield Msg('read', det)
+        for key, item in readings.items():
+            signal = self._signal(key)
+            signal.put(item['value'], timestamp=item['timestamp'])
+            yield Msg('read', signal)
+        yield Msg('save')
+
+    def __call__(self, detectors, step, pos_cache,
+                 take_reading=trigger_and_read):
+        """
+        Inner loop of the pipelined step scan.
+
+        Parameters
+        ----------
+        detectors : iterable
+            devices to read
+        step : dict
+            mapping motors to positions in this step
+        pos_cache : dict
+            mapping motors to their last-set positions
+        take_reading : plan, optional
+            Used when no detector can be pipelined. Defaults to
+            `trigger_and_read`.
+        """
+        devices = separate_devices(list(step.keys()) + list(detectors))
+        slow = [dev for dev in devices if _is_pipelined(dev)]
+        fast = [dev for dev in devices if not _is_pipelined(dev)]
+
+        # Nothing can be open here, so pausing is safe.
+        yield Msg('checkpoint')
+        move_group = short_uid('set')
+        for motor, pos in step.items():
+            if pos == pos_cache[motor]:
+                continue
+            yield Msg('set', motor, pos, group=move_group)
+            pos_cache[motor] = pos
+
+        # The previous point is saved while the motors move.
+        yield from self.flush()
+        yield Msg('wait', None, group=move_group)
+
+        if len(slow) == 0:
+            return (yield from take_reading(devices))
+
+        fast_group = short_uid('trigger')
+        slow_group = short_uid('readout')
+        for dev in fast:
+            if hasattr(dev, 'trigger'):
+                yield Msg('trigger', dev, group=fast_group)
+        for dev in slow:
+            yield Msg('trigger', dev, group=slow_group)
+
+        yield Msg('wait', None, group=fast_group)
+        yield Msg(
+            'wait_for', None,
+            [_status_done(dev.acquisition_status) for dev in slow]
+        )
+
+        readings = {}
+        for dev in fast:
+            readings.update((yield Msg('read', dev)))
+
+        self._pending = (slow_group, slow, readings)
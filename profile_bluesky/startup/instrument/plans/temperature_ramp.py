@@ -0,0 +1,171 @@
+"""
+Continuous acquisition during a temperature ramp
+"""
+
+__all__ = ['temperature_ramp']
+
+from bluesky.plan_stubs import (
+    open_run, close_run, abs_set, mv, rd, sleep, wait, null
+)
+from bluesky.preprocessors import finalize_wrapper
+from bluesky.utils import Msg, short_uid, separate_devices
+from ophyd import Signal
+from .local_preprocessors import configure_counts_decorator
+from ..utils import counters
+
+from ..session_logs import logger
+logger.info(__file__)
+
+
+def _heater_device(loop):
+    """
+    Object that holds the heater `_auto_ranges` of a loop.
+
+    It is the loop itself in the Lakeshore 336, and the controller in the
+    Lakeshore 340. Returns None if no auto ranges are configured.
+    """
+    for obj in (loop, loop.parent):
+        if obj is not None and getattr(obj, '_auto_ranges', None):
+            return obj
+    return None
+
+
+def temperature_ramp(loop, stop, rate, start=None, time=None, detectors=None,
+                     delay=0, auto_heater=True, md=None):
+    """
+    Count continuously while the temperature ramps at a constant rate.
+
+    Stepping the temperature waits for the readback to settle at every
+    point, here the controller ramps the setpoint from `start` to `stop`,
+    and the detectors are counted back-to-back until the loop reaches `stop`.
+    Each event is tagged with the average of the readbacks from before and
+    after the count, in the `<loop readback>_average` field.
+
+    During the ramp, the heater range follows the readback using the
+    `auto_ranges` of the controller, and the setpoint based `auto_heater` is
+    paused (it would switch to the range of `stop` right away). The ramp
+    rate and the ramp and auto_heater settings are restored at the end.
+
+    Parameters
+    ----------
+    loop : Lakeshore loop
+        For instance `lakeshore336.loop2` or `lakeshore340.control`. Needs
+        `ramp_rate` and `ramp_on` signals.
+    stop : float
+        Final temperature.
+    rate : float
+        Ramp rate in the units of the controller (K/min in Lakeshores).
+    start : float, optional
+        If set, the loop is first moved (and settled) here, using the
+        current ramp settings. Otherwise the ramp starts from the current
+        temperature.
+    time : float, optional
+        If a number is passed, it will modify the counts over time. All
+        detectors need to have a .preset_monitor signal.
+    detectors : list, optional
+        List of detectors to be used in the scan. If None, will use the
+        detectors defined in `counters.detectors`.
+    delay : float, optional
+        Time in seconds between the end of a count and the next one.
+    auto_heater : boolean, optional
+        If True, switch the heater ranges during the ramp.
+    md : dictionary, optional
+        Metadata to be added to the run start.
+
+    See Also
+    --------
+    :func:`energy_fly_scan`
+    """
+
+    if rate <= 0:
+        raise ValueError("rate has to be > 0.")
+
+    if detectors is None:
+        detectors = counters.detectors
+
+    average = Signal(name=f"{loop.readback.name}_average", value=0.0)
+    heater = _heater_device(loop) if auto_heater else None
+
+    _md = {
+        'detectors': [det.name for det in detectors],
+        'motors': [loop.name],
+        'plan_args': {
+            'detectors': list(map(repr, detectors)),
+            'loop': repr(loop), 'start': start, 'stop': stop, 'rate': rate,
+            'time': time, 'delay': delay
+        },
+        'plan_name': 'temperature_ramp',
+        'hints': {'monitor': counters.monitor, 'detectors': [],
+                  'dimensions': [([average.name], 'primary')],
+                  'scan_type': 'temperature ramp'},
+    }
+    for item in detectors:
+        _md['hints']['detectors'].extend(item.hints['fields'])
+    _md.update(md or {})
+
+    stash = {}
+    ramp_status = []
+    subscription = []
+
+    def _setup():
+        stash['ramp_rate'] = yield from rd(loop.ramp_rate)
+        stash['ramp_on'] = yield from rd(loop.ramp_on)
+        if heater is not None:
+            stash['auto_heater'] = yield from rd(heater.auto_heater)
+            yield from mv(heater.auto_heater, False)
+            # Only puts when the readback enters another range.
+            subscription.append(loop.readback.subscribe(
+                heater._switch_heater, event_type='value'
+            ))
+        yield from mv(loop.ramp_rate, rate)
+        yield from mv(loop.ramp_on, 1)
+
+    def _reading():
+        before = yield from rd(loop.readback)
+        group = short_uid('trigger')
+        for det in detectors:
+            if hasattr(det, 'trigger'):
+                yield Msg('trigger', det, group=group)
+        yield Msg('wait', None, group=group)
+        after = yield from rd(loop.readback)
+        average.put((before + after)/2)
+
+        yield Msg('create', name='primary')
+        for obj in separate_devices(list(detectors) + [loop, average]):
+            yield Msg('read', obj)
+        yield Msg('save')
+
+    def _ramp():
+        group = short_uid('ramp')
+        status = yield from abs_set(loop, stop, group=group)
+        ramp_status.append(status)
+        while not status.done:
+            yield from _reading()
+            if delay > 0:
+                yield from sleep(delay)
+        yield from wait(group=group)
+
+    @configure_counts_decorator(detectors, time)
+    def _inner_ramp():
+        if start is not None:
+            yield from mv(loop, start)
+        yield from _setup()
+        uid = yield from open_run(md=_md)
+        yield from _ramp()
+        yield from close_run()
+        return uid
+
+    def _restore():
+        # The loop is only stopped if the ramp was interrupted.
+        if len(ramp_status) > 0 and not ramp_status[0].done:
+            loop.stop()
+        if len(subscription) > 0:
+            loop.readback.unsubscribe(subscription[0])
+        if 'auto_heater' in stash:
+            yield from mv(heater.auto_heater, stash['auto_heater'])
+        if 'ramp_on' in stash:
+            yield from mv(loop.ramp_on, stash['ramp_on'],
+                          loop.ramp_rate, stash['ramp_rate'])
+        yield from null()
+
+    return (yield from finalize_wrapper(_inner_ramp(), _restore()))
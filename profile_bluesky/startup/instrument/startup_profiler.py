@@ -0,0 +1,207 @@
+"""
+Opt-in profiler of the ipython startup.
+
+Set the environment variable POLAR_STARTUP_PROFILE=1 before starting the
+session to record the import time of every module, the time of the main
+startup stages and the connection time of each device. The results are
+printed as a sorted report, and saved in the .logs folder as text and json.
+
+This module must not import anything from the instrument package, it is
+loaded before everything else.
+"""
+
+__all__ = ['startup_profiler']
+
+import builtins
+import json
+import importlib.util
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from time import monotonic
+
+ENVIRONMENT_VARIABLE = "POLAR_STARTUP_PROFILE"
+
+
+class StartupProfiler:
+    """
+    Records the time spent in imports, startup stages and device connections.
+
+    Attributes
+    ----------
+    active : boolean
+        True between `start` and `stop`.
+    imports : dict
+        Maps module name to a dictionary with the total (inclusive) and self
+        (exclusive) import times in seconds.
+    stages : dict
+        Maps stage name to wall time in seconds.
+    connections : dict
+        Maps device name to connection time in seconds (None if it did not
+        connect).
+    """
+
+    def __init__(self):
+        self.active = False
+        self._original_import = None
+        self._stack = []
+        self._t0 = None
+        self.wall_time = None
+        self.imports = {}
+        self.stages = {}
+        self.connections = {}
+
+    def start(self):
+        """ Starts recording, replaces the builtin __import__. """
+        if self.active:
+            return
+        self.active = True
+        self._t0 = monotonic()
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def stop(self, path=None, printing=True):
+        """
+        Stops recording and saves the results.
+
+        Parameters
+        ----------
+        path : str, optional
+            Folder for the output files. Defaults to `./.logs`.
+        printing : boolean, optional
+            If True, prints the report.
+
+        Returns
+        -------
+        files : tuple of str
+            Paths of the text report and json file. None if not active.
+        """
+        if not self.active:
+            return None
+        builtins.__import__ = self._original_import
+        self.active = False
+        self.wall_time = monotonic() - self._t0
+
+        report = self.report()
+        if printing:
+            print(report)
+        return self.save(report, path=path)
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(),
+                      level=0):
+        fullname = name
+        if level > 0:
+            package = (globals or {}).get("__package__") or ""
+            try:
+                fullname = importlib.util.resolve_name(
+                    "." * level + name, package
+                )
+            except (ImportError, ValueError):
+                pass
+
+        # Only new modules are timed, the cached ones are essentially free.
+        if fullname in sys.modules:
+            return self._original_import(name, globals, locals, fromlist,
+                                         level)
+
+        self._stack.append(0.0)
+        t0 = monotonic()
+        try:
+            return self._original_import(name, globals, locals, fromlist,
+                                         level)
+        finally:
+            total = monotonic() - t0
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += total
+            item = self.imports.setdefault(
+                fullname, dict(total=0.0, self=0.0)
+            )
+            item["total"] += total
+            item["self"] += total - children
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager that records the wall time of a startup stage.
+
+        It does nothing if the profiler is not active.
+        """
+        if not self.active:
+            yield
+            return
+        t0 = monotonic()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + monotonic() - t0
+
+    def record_connection(self, name, seconds):
+        """ Records the connection time of a device, if active. """
+        if self.active:
+            self.connections[name] = seconds
+
+    def as_dict(self):
+        return dict(
+            date=datetime.now().isoformat(),
+            wall_time=self.wall_time,
+            stages=self.stages,
+            connections=self.connections,
+            imports=self.imports,
+        )
+
+    def report(self, max_rows=30):
+        """ Returns a text report, sorted from the slowest item. """
+
+        def _fmt(value):
+            return f"{'timeout':>10}" if value is None else f"{value:10.3f}"
+
+        lines = ["Startup profile"]
+        if self.wall_time is not None:
+            lines.append(f"  Total wall time = {self.wall_time:0.3f} s")
+
+        lines.append("\n-- Stages (s) --")
+        for name, value in sorted(self.stages.items(), key=lambda x: -x[1]):
+            lines.append(f"  {_fmt(value)}  {name}")
+
+        lines.append("\n-- Device connections (s) --")
+        for name, value in sorted(
+            self.connections.items(), key=lambda x: -(x[1] or float("inf"))
+        ):
+            lines.append(f"  {_fmt(value)}  {name}")
+
+        lines.append(
+            f"\n-- Imports, self time (s), slowest {max_rows} --"
+        )
+        imports = sorted(self.imports.items(), key=lambda x: -x[1]["self"])
+        for name, value in imports[:max_rows]:
+            lines.append(
+                f"  {_fmt(value['self'])}  {name} "
+                f"(total {value['total']:0.3f})"
+            )
+
+        return "\n".join(lines)
+
+    def save(self, report=None, path=None):
+        """ Saves the text report and the json file. """
+        if path is None:
+            path = os.path.join(os.getcwd(), ".logs")
+        if not os.path.exists(path):
+            os.mkdir(path)
+
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        text_file = os.path.join(path, f"startup_profile_{stamp}.txt")
+        json_file = os.path.join(path, f"startup_profile_{stamp}.json")
+
+        with open(text_file, "w") as f:
+            f.write(report if report is not None else self.report())
+        with open(json_file, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+        return text_file, json_file
+
+
+startup_profiler = StartupProfiler()
+if os.environ.get(ENVIRONMENT_VARIABLE, "0") not in ("", "0"):
+    startup_profiler.start()
@@ -8,3 +8,6 @@ from .load_eiger import *
 from .counters_class import *
 from .plot_funcs import *
 from .load_lambda import *
+from .connect_devices import *
+from .motion_models import *
+from .plan_estimator import *
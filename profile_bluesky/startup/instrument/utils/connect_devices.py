@@ -0,0 +1,129 @@
+"""
+Connect many devices at once, with a single timeout budget.
+"""
+
+from ophyd import Signal
+from ophyd.signal import EpicsSignalBase
+from pyRestTable import Table
+from time import monotonic, sleep
+from ..framework import sd
+from ..session_logs import logger
+from ..startup_profiler import startup_profiler
+logger.info(__file__)
+
+__all__ = ['connect_devices']
+
+
+def _epics_signals(device):
+    """ Returns the already instantiated EPICS signals of a device. """
+    if isinstance(device, Signal):
+        signals = [device]
+    else:
+        signals = [
+            walk.item for walk in device.walk_signals(include_lazy=False)
+        ]
+    return [sig for sig in signals if isinstance(sig, EpicsSignalBase)]
+
+
+def _pvnames(signal):
+    """ Returns the PV names used by a signal. """
+    names = [signal.pvname]
+    write_pv = getattr(signal, "setpoint_pvname", signal.pvname)
+    if write_pv != signal.pvname:
+        names.append(write_pv)
+    return names
+
+
+def connect_devices(devices=None, timeout=30, printing=True,
+                    poll_time=0.01):
+    """
+    Wait for all the PVs of many devices to connect.
+
+    The channel access connections are all established concurrently, so the
+    total time is set by the slowest IOC, not by the number of PVs.
+
+    Parameters
+    ----------
+    devices : iterable, optional
+        Devices and/or signals to connect. Defaults to `sd.baseline`.
+    timeout : float, optional
+        Time budget in seconds shared by all devices.
+    printing : boolean, optional
+        If True, prints a table with the connection time of each device and
+        the list of PVs that did not connect.
+    poll_time : float, optional
+        Time in seconds between connection checks.
+
+    Returns
+    -------
+    report : dict
+        Maps the device name to a dictionary with the number of PVs
+        ("pvs"), the connection time in seconds ("latency", None if it did
+        not connect) and the PVs that did not connect ("missing").
+    """
+    if devices is None:
+        devices = sd.baseline
+
+    t0 = monotonic()
+    deadline = t0 + timeout
+
+    report = {}
+    pending = {}
+    for device in devices:
+        signals = _epics_signals(device)
+        report[device.name] = dict(pvs=len(signals), latency=None,
+                                   missing=[])
+        pending[device.name] = signals
+
+    while True:
+        for name in list(pending.keys()):
+            pending[name] = [sig for sig in pending[name] if not sig.connected]
+            if len(pending[name]) == 0:
+                report[name]["latency"] = monotonic() - t0
+                del pending[name]
+
+        if len(pending) == 0 or monotonic() > deadline:
+            break
+        sleep(poll_time)
+
+    for name, item in report.items():
+        startup_profiler.record_connection(name, item["latency"])
+
+    for name, signals in pending.items():
+        for sig in signals:
+            report[name]["missing"].extend(_pvnames(sig))
+        logger.warning(
+            f"{name}: {len(signals)} signal(s) did not connect in {timeout} s"
+        )
+
+    if printing:
+        table = Table()
+        table.labels = ("device", "PVs", "connect time (s)", "missing PVs")
+        # Devices that did not connect first, then the slowest ones.
+        for name, item in sorted(
+            report.items(),
+            key=lambda x: (
+                x[1]["latency"] is not None, -(x[1]["latency"] or 0)
+            )
+        ):
+            latency = item["latency"]
+            table.addRow((
+                name,
+                item["pvs"],
+                "timeout" if latency is None else f"{latency:0.3f}",
+                len(item["missing"]),
+            ))
+        print(table)
+
+        missing = [pv for item in report.values() for pv in item["missing"]]
+        if len(missing) > 0:
+            print("PVs that did not connect:")
+            for pv in missing:
+                print(f"  {pv}")
+
+    logger.info(
+        f"Connected {len(report) - len(pending)} of {len(report)} devices "
+        f"in {monotonic() - t0:0.3f} s"
+    )
+
+    return report
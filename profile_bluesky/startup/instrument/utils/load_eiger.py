@@ -3,6 +3,7 @@
 from ..devices.ad_eiger import (
     EigerDetectorTimeTrigger, EigerDetectorImageTrigger
 )
+from .connect_devices import connect_devices
 from ..session_logs import logger
 logger.info(__file__)
 
@@ -38,15 +39,28 @@ def load_eiger(
     # This is needed otherwise .get may fail!!!
 
     logger.info("Setting up ROI and STATS defaults ...", end=" ")
-    for name in eiger.component_names:
-        if "roi" in name:
-            roi = getattr(eiger, name)
-            roi.wait_for_connection(timeout=10)
-            roi.nd_array_port.put("EIG")
-        if "stats" in name:
-            stat = getattr(eiger, name)
-            stat.wait_for_connection(timeout=10)
-            stat.nd_array_port.put(f"ROI{stat.port_name.get()[-1]}")
+    rois = [
+        getattr(eiger, name) for name in eiger.component_names
+        if "roi" in name
+    ]
+    stats = [
+        getattr(eiger, name) for name in eiger.component_names
+        if "stats" in name
+    ]
+    # Instantiate all the needed signals first so that they connect together.
+    signals = [roi.nd_array_port for roi in rois]
+    for stat in stats:
+        signals.extend([stat.nd_array_port, stat.port_name])
+    report = connect_devices(rois + stats + signals, timeout=10,
+                             printing=False)
+    missing = [pv for item in report.values() for pv in item["missing"]]
+    if len(missing) > 0:
+        raise TimeoutError(f"These PVs did not connect: {missing}")
+
+    for roi in rois:
+        roi.nd_array_port.put("EIG")
+    for stat in stats:
+        stat.nd_array_port.put(f"ROI{stat.port_name.get()[-1]}")
     logger.info("Done!")
 
     logger.info("Setting up defaults kinds ...", end=" ")
@@ -1,6 +1,7 @@
 """ Loads a new lambda device """
 
 from ..devices.ad_lambda import Lambda250kDetector
+from .connect_devices import connect_devices
 from ..session_logs import logger
 logger.info(__file__)
 
@@ -15,15 +16,28 @@ def load_lambda(pv="DP_LAMBDA250K_1:"):
     lambda250k.wait_for_connection(timeout=10)
 
     logger.info("Setting up ROI and STATS defaults ...", end=" ")
-    for name in lambda250k.component_names:
-        if "roi" in name:
-            roi = getattr(lambda250k, name)
-            roi.wait_for_connection(timeout=10)
-            roi.nd_array_port.put("PROC1")
-        if "stats" in name:
-            stat = getattr(lambda250k, name)
-            stat.wait_for_connection(timeout=10)
-            stat.nd_array_port.put(f"ROI{stat.port_name.get()[-1]}")
+    rois = [
+        getattr(lambda250k, name) for name in lambda250k.component_names
+        if "roi" in name
+    ]
+    stats = [
+        getattr(lambda250k, name) for name in lambda250k.component_names
+        if "stats" in name
+    ]
+    # Instantiate all the needed signals first so that they connect together.
+    signals = [roi.nd_array_port for roi in rois]
+    for stat in stats:
+        signals.extend([stat.nd_array_port, stat.port_name])
+    report = connect_devices(rois + stats + signals, timeout=10,
+                             printing=False)
+    missing = [pv for item in report.values() for pv in item["missing"]]
+    if len(missing) > 0:
+        raise TimeoutError(f"These PVs did not connect: {missing}")
+
+    for roi in rois:
+        roi.nd_array_port.put("PROC1")
+    for stat in stats:
+        stat.nd_array_port.put(f"ROI{stat.port_name.get()[-1]}")
     logger.info("Done!")
 
     logger.info("Setting up defaults kinds ...", end=" ")
@@ -0,0 +1,229 @@
+"""
+Simple motion models of the beamline positioners.
+
+Used to predict how long a plan takes before running it.
+"""
+
+__all__ = ['motion_models']
+
+import json
+import os
+from numpy import (
+    abs as np_abs, asarray, diff, isfinite, polyfit, zeros
+)
+from pyRestTable import Table
+from ..framework import cat
+from ..session_logs import logger
+logger.info(__file__)
+
+MOTION_MODELS_FILE = os.path.join(
+    os.environ["HOME"], ".config", "Bluesky_motion_models.json"
+)
+
+# Elapsed counting time of the scalers (.T, in seconds).
+TIME_FIELDS = ("scalerd_time", "scalerb_time")
+
+# Scaler clock channel, it counts ticks of CLOCK_FREQUENCY.
+CLOCK_FIELD = "Time"
+CLOCK_FREQUENCY = 1e7
+
+
+def _count_time(data, size):
+    """ Count time in seconds of each event, 0 if it was not recorded. """
+    for field in TIME_FIELDS:
+        if field in data:
+            return asarray(data[field], dtype=float)
+    if CLOCK_FIELD in data:
+        return asarray(data[CLOCK_FIELD], dtype=float)/CLOCK_FREQUENCY
+    return zeros(size)
+
+
+class MotionModels:
+    """
+    Move time of each positioner, as `settle + distance/speed`.
+
+    The models are keyed by the positioner name. Positioners without a model
+    use the EPICS motor velocity and acceleration if available, or only the
+    default settle time otherwise.
+
+    The models saved in `fname` are loaded the first time they are used.
+
+    Attributes
+    ----------
+    models : dict
+        Maps the positioner name to a dictionary with the "settle" time (s),
+        the "speed" (units/s, None if the move time does not depend on the
+        distance) and the number of "points" used in the fit.
+    default_settle : float
+        Settle time in seconds of positioners without a model.
+    """
+
+    def __init__(self, default_settle=0.5, fname=MOTION_MODELS_FILE):
+        self._models = {}
+        self._fname = fname
+        self.default_settle = default_settle
+
+    @property
+    def models(self):
+        if self._fname is not None:
+            self.load(self._fname)
+        return self._models
+
+    def __repr__(self):
+        table = Table()
+        table.labels = ("positioner", "settle (s)", "speed (units/s)",
+                        "points")
+        for name, model in sorted(self.models.items()):
+            speed = model["speed"]
+            table.addRow((
+                name,
+                f"{model['settle']:0.3f}",
+                "-" if speed is None else f"{speed:0.4g}",
+                model["points"],
+            ))
+        return str(table)
+
+    def __str__(self):
+        return self.__repr__()
+
+    def move_time(self, positioner, distance):
+        """
+        Predicted time to move `positioner` by `distance`.
+
+        Parameters
+        ----------
+        positioner : ophyd object
+            Any settable object.
+        distance : float or None
+            Size of the move, None if unknown (only the settle time is used).
+
+        Returns
+        -------
+        seconds : float
+        """
+        if distance is not None:
+            distance = abs(distance)
+
+        model = self.models.get(getattr(positioner, "name", None))
+        if model is not None:
+            settle, speed = model["settle"], model["speed"]
+        else:
+            settle, speed = self._motor_model(positioner)
+
+        if distance is None or speed is None:
+            return settle
+        return settle + distance/speed
+
+    def _motor_model(self, positioner):
+        """ Uses the motor record speed, if this is an EpicsMotor. """
+        try:
+            speed = positioner.velocity.get()
+            accel = positioner.acceleration.get()
+        except Exception:
+            return self.default_settle, None
+        if not speed:
+            return self.default_settle, None
+        return accel + self.default_settle, speed
+
+    def fit(self, catalog=cat, num_runs=100, min_points=5):
+        """
+        Learn the models from the last runs in the catalog.
+
+        Only one motor step scans are used. For each pair of consecutive
+        events, the time between them minus the scaler count time is taken as
+        the move time, and a line is fitted to move time vs. distance.
+
+        Raises ValueError if the runs have events, but none of them gives a
+        positive move time (for instance, the count time is wrong).
+
+        Parameters
+        ----------
+        catalog : databroker catalog, optional
+            Defaults to the `cat` used by the RunEngine.
+        num_runs : int, optional
+            Number of runs to look back.
+        min_points : int, optional
+            Minimum number of moves needed to fit a positioner.
+
+        Returns
+        -------
+        models : dict
+            The updated models, see the `models` attribute.
+        """
+        distances = {}
+        times = {}
+        num_moves = 0
+
+        for index in range(-1, -num_runs - 1, -1):
+            try:
+                run = catalog[index]
+                start = run.metadata["start"]
+            except (IndexError, KeyError, ValueError):
+                break
+
+            motors = start.get("motors", [])
+            scan_type = start.get("hints", {}).get("scan_type", "")
+            if len(motors) != 1 or "dichro" in scan_type:
+                continue
+
+            try:
+                data = run.primary.read()
+                position = asarray(data[motors[0]], dtype=float)
+                timestamps = asarray(data["time"], dtype=float)
+                count_time = _count_time(data, position.size)
+            except Exception as exc:
+                logger.debug(f"Skipping run {start.get('uid')}: {exc}")
+                continue
+
+            if position.size < 2:
+                continue
+
+            move = diff(timestamps) - count_time[1:]
+            step = np_abs(diff(position))
+            good = isfinite(move) & isfinite(step) & (move > 0)
+            distances.setdefault(motors[0], []).extend(step[good])
+            times.setdefault(motors[0], []).extend(move[good])
+            num_moves += move.size
+
+        if num_moves > 0 and sum(map(len, times.values())) == 0:
+            raise ValueError(
+                f"None of the {num_moves} moves found has a positive move "
+                "time, check the scaler count time fields."
+            )
+
+        for name in distances.keys():
+            step = asarray(distances[name])
+            move = asarray(times[name])
+            if step.size < min_points:
+                continue
+
+            if step.max() - step.min() > 0:
+                slope, settle = polyfit(step, move, 1)
+            else:
+                slope, settle = 0.0, move.mean()
+
+            self.models[name] = dict(
+                settle=max(float(settle), 0.0),
+                speed=1/slope if slope > 0 else None,
+                points=int(step.size),
+            )
+
+        return self.models
+
+    def save(self, fname=MOTION_MODELS_FILE):
+        """ Saves the models into a json file. """
+        with open(fname, "w") as f:
+            json.dump(self.models, f, indent=2)
+
+    def load(self, fname=MOTION_MODELS_FILE):
+        """ Loads the models saved with `save`, if the file exists. """
+        # Replaces the load on first use.
+        self._fname = None
+        try:
+            with open(fname, "r") as f:
+                self._models.update(json.load(f))
+        except (OSError, ValueError) as exc:
+            logger.info(f"Could not load the motion models: {exc}")
+
+
+motion_models = MotionModels()
@@ -0,0 +1,301 @@
+"""
+Dry-run cost estimate of a plan.
+"""
+
+__all__ = ['estimate_plan']
+
+from bluesky.utils import ensure_generator
+from ophyd import Signal
+from ophyd.signal import EpicsSignalBase
+from ophyd.status import Status
+from numbers import Number
+from numpy import asarray, zeros
+from pyRestTable import Table
+from .motion_models import motion_models as default_models
+from ..session_logs import logger
+logger.info(__file__)
+
+# Time added to every trigger (readout, CA round trips).
+TRIGGER_OVERHEAD = 0.05
+
+# Bytes used to store each timestamp.
+TIMESTAMP_BYTES = 8
+
+
+def _is_soft(obj):
+    """ True for signals that are not EPICS PVs. """
+    return isinstance(obj, Signal) and not isinstance(obj, EpicsSignalBase)
+
+
+class _PlanSimulator:
+    """
+    Runs the messages of a plan without touching the hardware.
+
+    Keeps a clock that is advanced by the predicted time of moves, counts and
+    sleeps. Moves or triggers in the same group run in parallel, so a group
+    takes as long as its slowest member. Sets of soft signals (for instance
+    the `ConditionSignal` of `wait_for_condition`) take no time and are not
+    counted as moves or puts.
+    """
+
+    def __init__(self, models, count_time=None,
+                 trigger_overhead=TRIGGER_OVERHEAD, values=None):
+        self.models = models
+        self.count_time = count_time
+        self.trigger_overhead = trigger_overhead
+        self.values = values if values is not None else {}
+
+        self.duration = 0.0
+        self.moves = 0
+        self.puts = 0
+        self.triggers = 0
+        self.events = 0
+        self.runs = 0
+        self.bytes = 0
+
+        self._positions = {}
+        self._descriptions = {}
+        self._groups = {}
+        self._bundle = {}
+        self._token = 0
+
+    def _add_to_group(self, group, seconds):
+        self._groups[group] = max(self._groups.get(group, 0.0), seconds)
+
+    def _describe(self, obj):
+        """ Description of obj, only asked once per object. """
+        if obj not in self._descriptions:
+            try:
+                self._descriptions[obj] = dict(obj.describe())
+            except Exception:
+                self._descriptions[obj] = {
+                    obj.name: dict(dtype="number", shape=[])
+                }
+        return self._descriptions[obj]
+
+    def _reading(self, obj):
+        """
+        Simulated reading of obj, without reading the hardware.
+
+        Uses the simulated position, the `values` given, or a placeholder
+        with the type and shape of the description.
+        """
+        reading = {}
+        for key, desc in self._describe(obj).items():
+            if key in self.values:
+                value = self.values[key]
+            elif desc.get("dtype") == "string":
+                value = ""
+            elif desc.get("dtype") == "array":
+                value = zeros(desc.get("shape") or [0])
+            else:
+                value = 0
+            reading[key] = dict(value=value, timestamp=self.duration)
+
+        if obj in self._positions and len(reading) > 0:
+            key = obj.name if obj.name in reading else list(reading)[0]
+            reading[key] = dict(reading[key], value=self._positions[obj])
+        return reading
+
+    def _position(self, obj):
+        """ Simulated position, the current one is only read once. """
+        if obj in self._positions:
+            return self._positions[obj]
+        for attr in ("position", "get"):
+            try:
+                value = getattr(obj, attr)
+                value = value() if callable(value) else value
+                if isinstance(value, Number):
+                    self._positions[obj] = value
+                    return value
+            except Exception:
+                pass
+        return None
+
+    def _count_time(self, obj):
+        if self.count_time is not None:
+            return self.count_time
+        preset = getattr(obj, "preset_monitor", None)
+        if preset is None:
+            return 0.0
+        value = self._position(preset)
+        return value if isinstance(value, Number) else 0.0
+
+    def _size(self, reading):
+        size = 0
+        for item in reading.values():
+            value = item.get("value")
+            if isinstance(value, str):
+                size += len(value)
+            else:
+                try:
+                    size += asarray(value).nbytes
+                except Exception:
+                    size += TIMESTAMP_BYTES
+            size += TIMESTAMP_BYTES
+        return size
+
+    def process(self, msg):
+        """ Returns the response that the RunEngine would give to `msg`. """
+        command = msg.command
+
+        if command == "set" and _is_soft(msg.obj):
+            self._positions[msg.obj] = msg.args[0]
+            status = Status()
+            status.set_finished()
+            return status
+
+        elif command == "set":
+            target = msg.args[0]
+            start = self._position(msg.obj)
+            distance = None
+            if isinstance(start, Number) and isinstance(target, Number):
+                distance = target - start
+            self._add_to_group(
+                msg.kwargs.get("group"),
+                self.models.move_time(msg.obj, distance)
+            )
+            self._positions[msg.obj] = target
+            self.moves += 1
+            self.puts += 1
+            status = Status()
+            status.set_finished()
+            return status
+
+        elif command == "trigger":
+            self._add_to_group(
+                msg.kwargs.get("group"),
+                self._count_time(msg.obj) + self.trigger_overhead
+            )
+            self.triggers += 1
+            self.puts += 1
+            status = Status()
+            status.set_finished()
+            return status
+
+        elif command == "wait":
+            self.duration += self._groups.pop(msg.kwargs.get("group"), 0.0)
+
+        elif command == "sleep":
+            self.duration += msg.args[0]
+
+        elif command == "read":
+            reading = self._reading(msg.obj)
+            self._bundle.update(reading)
+            return reading
+
+        elif command == "locate":
+            locations = []
+            for obj in (msg.obj,) + msg.args:
+                position = self._position(obj)
+                locations.append(dict(setpoint=position, readback=position))
+            if len(locations) == 1 and msg.kwargs.get("squeeze", True):
+                return locations[0]
+            return locations
+
+        elif command == "create":
+            self._bundle = {}
+
+        elif command == "save":
+            self.events += 1
+            self.bytes += self._size(self._bundle)
+            self._bundle = {}
+
+        elif command == "open_run":
+            self.runs += 1
+            return f"simulated-run-{self.runs}"
+
+        elif command in ("subscribe", "monitor"):
+            self._token += 1
+            return self._token
+
+        elif command in ("stage", "unstage"):
+            return []
+
+        return None
+
+    def run(self, plan):
+        plan = ensure_generator(plan)
+        response = None
+        while True:
+            try:
+                msg = plan.send(response)
+            except StopIteration:
+                break
+            response = self.process(msg)
+
+        # Anything not waited for still has to finish.
+        self.duration += max(self._groups.values(), default=0.0)
+        self._groups = {}
+
+
+def _last_values(run):
+    """ Values of the last event in the primary stream of `run`. """
+    data = run.primary.read()
+    return {key: data[key].values[-1] for key in data.data_vars}
+
+
+def estimate_plan(plan, count_time=None, models=None, run=None,
+                  printing=True):
+    """
+    Predict how long a plan takes, without moving or counting.
+
+    The plan messages are processed offline, like in
+    `bluesky.simulators.summarize_plan`. Moves use the motion models (see
+    `motion_models.fit`), counts use the `preset_monitor` of each detector.
+    The readings are built from the `describe` of each object, so nothing is
+    read from the hardware: the values are the simulated positions, the last
+    values of `run`, or zeros. Note that python code inside of the plan still
+    runs, for instance to read the current dichro and fixQ settings.
+
+    Parameters
+    ----------
+    plan : iterable or iterator
+        For example: `grid_scan(x, 0, 1, 11, y, 0, 1, 11, dichro=True)`.
+    count_time : float, optional
+        Count time in seconds of every trigger. Use this if the scaler counts
+        to a monitor, since the preset is then in counts. If None, uses the
+        `preset_monitor` of each detector.
+    models : MotionModels, optional
+        Defaults to the `motion_models` instance.
+    run : BlueskyRun, optional
+        The readings use the last values of its primary stream, for instance
+        `cat[-1]`. Useful for plans that decide what to do from the readings.
+    printing : boolean, optional
+        If True, prints the estimate as a table.
+
+    Returns
+    -------
+    estimate : dict
+        With the predicted "duration" in seconds, and the number of "moves",
+        "puts" (channel access puts sent by moves and triggers), "triggers",
+        "events", "runs" and "bytes" of event data.
+    """
+    simulator = _PlanSimulator(
+        models if models is not None else default_models,
+        count_time=count_time,
+        values=_last_values(run) if run is not None else None
+    )
+    simulator.run(plan)
+
+    estimate = dict(
+        duration=simulator.duration,
+        moves=simulator.moves,
+        puts=simulator.puts,
+        triggers=simulator.triggers,
+        events=simulator.events,
+        runs=simulator.runs,
+        bytes=simulator.bytes,
+    )
+
+    if printing:
+        table = Table()
+        table.labels = ("item", "estimate")
+        minutes, seconds = divmod(estimate["duration"], 60)
+        table.addRow(("duration", f"{int(minutes)} min {seconds:0.1f} s"))
+        for key in ("moves", "puts", "triggers", "events", "runs"):
+            table.addRow((key, estimate[key]))
+        table.addRow(("data", f"{estimate['bytes']/1024:0.1f} kB"))
+        print(table)
+
+    return estimate